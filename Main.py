@@ -1,115 +1,35 @@
-import io
-import re
-import zipfile
-import requests
+import json
 import streamlit as st
 import pandas as pd
 
-try:
-    import fitz  # PyMuPDF
-except ImportError:
-    fitz = None
+from api_client import POST_BATCH_ROWS, post_in_batches, post_to_endpoint
+from engine import (
+    CODE_DESC, ENDPOINT, ESTADO, MOTIVO_OPTIONS, OUT_COLS, OUT_DTYPES, SOURCE_COL, SUBSET_COLS,
+    EngineError, NoRecords, default_code_bbva, motivo_column, split_motivo,
+    process_bbva, process_bcp, process_ibk, process_pre_bcp_xlsx, process_pre_bcp_txt,
+    process_sco, process_total, sco_audit,
+)
+from batch import BATCH_MAX_WORKERS, BATCH_WORKERS, FLOW_BANK, FLOW_ROLES, pair_files, run_batch
+from editing import (
+    EDITOR_FULL_MAX_ROWS, EDITOR_PAGE_OPTIONS, EDITOR_PAGE_ROWS,
+    EditDeltas, filter_labels, page_count,
+)
+from io_utils import EXPORT_FORMATS, excel_bytes_cached, export_bytes_cached, frame_fingerprint
+from ledger import SubmissionInProgress, SubmissionLedger
+from timing import end_run, stage, start_run
 
 # -------------- Configuración --------------
 st.set_page_config(layout="centered", page_title="Rechazos MASIVOS Unificado")
 
-ENDPOINT = "https://q6caqnpy09.execute-api.us-east-1.amazonaws.com/OPS/kpayout/v1/payout_process/reject_invoices_batch"
-
-TXT_POS = {
-    "dni": (25, 33),
-    "nombre": (40, 85),
-    "referencia": (115, 126),
-    "importe": (186, 195),
-}
-
-ESTADO = "rechazada"
-MULT = 2
-
-# Tipos globales
-CODE_DESC = {
-    "R001": "DOCUMENTO ERRADO",
-    "R002": "CUENTA INVALIDA",
-    "R007": "RECHAZO POR CCI",
-    "R016": "CLIENTE NO TITULAR DE LA CUENTA",
-    "R017": "CUENTA DE AFP / CTS",
-    "R020": "CUENTA BANCARIA INOPERATIVA",
-}
-
-SCO_TXT_POS = {
-    "dni": (2, 9),
-    "nombre": (14, 73),
-    "importe": (105, 115),
-    "referencia": (116, 127),
-}
-
-KEYWORDS_NO_TIT = [
-    "no es titular",
-    "beneficiario no",
-    "cliente no titular",
-    "no titular",
-    "continuar",
-    "puedes continuar",
-    "si deseas, puedes continuar",
-]
-
-OUT_COLS = [
-    "dni/cex",
-    "nombre",
-    "importe",
-    "Referencia",
-    "Estado",
-    "Codigo de Rechazo",
-    "Descripcion de Rechazo",
-]
-
-SUBSET_COLS = [
-    "Referencia",
-    "Estado",
-    "Codigo de Rechazo",
-    "Descripcion de Rechazo",
-]
+TIMING_HISTORY = 20  # corridas que se guardan en la sesión para exportar
+TABLE_TYPES = ["xlsx", "xls", "csv", "parquet", "arrow", "feather"]  # planillas que pasan por read_table
 
-# -------------- Utilidades --------------
-def parse_amount(raw) -> float:
-    if pd.isna(raw) or raw is None: return 0.0
-    s = str(raw).strip()
-    # Mantiene solo números, comas, puntos y el signo negativo
-    s = re.sub(r"[^\d,.-]", "", s)
-    if not s: return 0.0
-    
-    last_comma = s.rfind(',')
-    last_dot = s.rfind('.')
-    
-    if last_comma > last_dot:
-        # La coma está al final: formato europeo (ej. 1.234,56 o 1234,56)
-        # Excepción: si hay exactamente 3 dígitos después de la coma y no hay punto (ej. 1,000)
-        if last_dot == -1 and len(s) - last_comma - 1 == 3:
-            s = s.replace(',', '') # Es un separador de miles
-        else:
-            s = s.replace('.', '').replace(',', '.')
-    else:
-        # El punto está al final: formato estándar/US (ej. 1,234.56 o 1234.56)
-        s = s.replace(',', '')
-        
-    try: return float(s)
-    except ValueError: return 0.0
-
-def slice_fixed(line: str, start: int, end: int) -> str:
-    if not line: return ""
-    idx = max(0, start - 1)
-    return line[idx:end].strip() if idx < len(line) else ""
-
-def df_to_excel_bytes(df: pd.DataFrame) -> bytes:
-    buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="Rechazos")
-    return buf.getvalue()
-
-def post_to_endpoint(excel_bytes: bytes) -> tuple[int, str]:
-    files = {"edt": ("rechazos.xlsx", excel_bytes, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
-    resp = requests.post(ENDPOINT, files=files)
-    return resp.status_code, resp.text
+# Panel de tiempos opcional: sin activarlo, las etapas no registran nada
+timing_on = st.sidebar.toggle("⏱️ Tiempos por etapa", key="timing_on")
+end_run()  # descarta una corrida que no llegó al final (excepción en una pestaña)
+timing_run = start_run() if timing_on else None
 
+# -------------- Utilidades --------------
 def select_code(key: str, default: str) -> tuple[str, str]:
     if key not in st.session_state:
         st.session_state[key] = default
@@ -126,193 +46,276 @@ def select_code(key: str, default: str) -> tuple[str, str]:
     st.write("Código de rechazo seleccionado:", f"**{code} – {desc}**")
     return code, desc
 
-def _validate_and_post(df: pd.DataFrame, button_key: str):
-    if list(df.columns) != OUT_COLS:
-        st.error(f"Encabezados inválidos. Se requieren: {OUT_COLS}")
-        return
+def _validate_and_post(build_df, n_rows: int, button_key: str, bank: str = ""):
+    """`build_df` arma la tabla final; solo se llama al pulsar el botón."""
+    # Envío por lotes: un único xlsx con 100k+ referencias vence el timeout del endpoint
+    batched = st.checkbox("Enviar por lotes", value=n_rows > POST_BATCH_ROWS, key=f"{button_key}_batched")
+    batch_rows = st.number_input("Filas por lote", min_value=100, value=POST_BATCH_ROWS, step=500,
+                                 key=f"{button_key}_batch_rows", disabled=not batched)
+    skip_sent = st.checkbox("Omitir referencias ya enviadas", value=True, key=f"{button_key}_skip_sent")
     if st.button("RECH-POSTMAN", key=button_key, width='stretch'):
+        df = build_df()
+        if list(df.columns) != OUT_COLS:
+            st.error(f"Encabezados inválidos. Se requieren: {OUT_COLS}")
+            return
         payload = df[SUBSET_COLS]
-        excel_bytes = df_to_excel_bytes(payload)
-        status, resp = post_to_endpoint(excel_bytes)
-        st.success(f"{status}: {resp}")
-
-def _count_and_sum(df: pd.DataFrame) -> tuple[int, float]:
-    return len(df), df["importe"].sum() if "importe" in df.columns else 0.0
-
-def extract_text_from_pdf(pdf_file) -> str:
-    """Extrae texto de un archivo PDF usando PyMuPDF."""
-    pdf_bytes = pdf_file.read()
-    return "".join(p.get_text() or "" for p in fitz.open(stream=io.BytesIO(pdf_bytes), filetype="pdf"))
+        # Doble envío (doble clic, otra pestaña u otra sesión): se busca todo el payload de una vez en el registro
+        ledger = SubmissionLedger()
+        with stage("registro_envios", rows=len(payload)):
+            dup = ledger.submitted(payload["Referencia"])
+        if dup.any():
+            st.warning(f"{int(dup.sum())} referencias ya se enviaron antes" + (" y se omiten." if skip_sent else "; se reenvían."))
+            st.dataframe(ledger.details(payload["Referencia"][dup]), hide_index=True, width='stretch')
+            if skip_sent: payload = payload[~dup]
+        if payload.empty: return st.info("No hay referencias nuevas para enviar.")
+        # Reserva antes del POST: otra sesión con las mismas referencias pierde aquí, sin enviar
+        try:
+            ledger.reserve(payload, bank, resend=not skip_sent)
+        except SubmissionInProgress as e:
+            return st.error(str(e))
+        # Se registra apenas vuelve el POST, antes de cualquier st.*: un rerun / stop en la
+        # UI no puede cortar entre el envío y su registro
+        if not batched:
+            status, resp = post_to_endpoint(excel_bytes_cached(payload), ENDPOINT)
+            ledger.record(payload, bank, status)
+            (st.success if status and 200 <= status < 300 else st.error)(f"{status}: {resp}")
+            return
+        with st.spinner("Enviando lotes..."):
+            report = post_in_batches(payload, ENDPOINT, batch_rows=int(batch_rows))
+            ledger.record_batches(payload, report, bank)
+        report = pd.DataFrame(report)
+        failed = report[~report["ok"]]
+        if failed.empty:
+            st.success(f"{len(report)} lotes enviados ({len(payload)} filas).")
+        else:
+            st.error(f"{len(failed)} de {len(report)} lotes fallaron (filas {', '.join(f'{a}-{b}' for a, b in zip(failed['desde'], failed['hasta']))}).")
+        st.dataframe(report, hide_index=True, width='stretch')
+
+def render_timing_panel(run):
+    """Tabla de etapas de esta ejecución (por pestaña) y exportación JSON de las últimas corridas."""
+    history = st.session_state.setdefault("timing_runs", [])
+    if any(r["nivel"] > 0 for r in run.records):
+        history.append(run.to_dict())
+        del history[:-TIMING_HISTORY]
+    with st.sidebar:
+        st.subheader("Tiempos por etapa")
+        if len(run.records):
+            df_t = pd.DataFrame(run.records)
+            df_t["etapa"] = ["    " * n + e for n, e in zip(df_t["nivel"], df_t["etapa"])]
+            st.dataframe(df_t.drop(columns=["nivel"]), hide_index=True, width='stretch')
+        st.caption(f"Corridas guardadas: {len(history)}")
+        st.download_button("Exportar JSON", json.dumps(history, ensure_ascii=False, indent=2),
+                           file_name="tiempos_etapas.json", mime="application/json", width='stretch', disabled=not history)
+
+def show_engine_error(e: EngineError):
+    """Sin registros -> aviso; entrada inválida -> error."""
+    (st.warning if isinstance(e, NoRecords) else st.error)(str(e))
+
+def _editor_view(work: pd.DataFrame, editor_key: str) -> tuple:
+    """Filtros (del lado del servidor) y tamaño de página para tablas grandes."""
+    with st.expander("Filtrar y paginar", expanded=False):
+        c1, c2, c3 = st.columns([2, 1, 1])
+        motivos = c1.multiselect("Motivo", MOTIVO_OPTIONS, key=f"{editor_key}_f_motivo") if "Motivo de Rechazo" in work.columns else []
+        dni = c2.text_input("DNI contiene", key=f"{editor_key}_f_dni")
+        ref = c3.text_input("Referencia contiene", key=f"{editor_key}_f_ref")
+        page_rows = st.selectbox("Filas por página", EDITOR_PAGE_OPTIONS, index=EDITOR_PAGE_OPTIONS.index(EDITOR_PAGE_ROWS), key=f"{editor_key}_page_rows")
+    return tuple(motivos), dni, ref, page_rows
+
+def _editor_page(n_rows: int, page_rows: int, editor_key: str, reset: bool) -> int:
+    pages = page_count(n_rows, page_rows)
+    page_key = f"{editor_key}_page"
+    # Al cambiar filtros se vuelve a la primera página; nunca se queda fuera del rango
+    if reset or st.session_state.get(page_key, 1) > pages: st.session_state[page_key] = 1
+    if pages == 1: return 1
+    return int(st.number_input(f"Página (de {pages})", min_value=1, max_value=pages, step=1, key=page_key))
+
+def _to_out_cols(df: pd.DataFrame) -> pd.DataFrame:
+    # Reconstruir columnas finales
+    if "Motivo de Rechazo" in df.columns:
+        df["Codigo de Rechazo"], df["Descripcion de Rechazo"] = split_motivo(df["Motivo de Rechazo"])
+        df = df.drop(columns=["Motivo de Rechazo"])
+    for col in OUT_COLS:
+        if col not in df.columns: df[col] = ""
+    return df[OUT_COLS].astype(OUT_DTYPES)
 
-def load_dataframe(uploaded_file, **kwargs) -> pd.DataFrame:
-    """Detecta si es CSV o Excel y carga el dataframe."""
-    if uploaded_file.name.lower().endswith(".csv"):
-        return pd.read_csv(uploaded_file, dtype=str, **kwargs)
-    return pd.read_excel(uploaded_file, dtype=str, **kwargs)
+def batch_toggle(key: str) -> bool:
+    return st.toggle("Varios archivos (lote)", key=f"{key}_lote", help="Sube muchos archivos a la vez: se emparejan por nombre y se procesan en paralelo.")
 
-def render_final_output(df: pd.DataFrame, file_name: str, post_key: str, editor_key: str, default_code: str = None):
+def built_frame(key: str, inputs: list, build) -> tuple[pd.DataFrame, str]:
+    """
+    Tabla de un flujo y su huella, calculadas una vez por juego de archivos subidos (y opciones)
+    y guardadas en la sesión: los reruns no reprocesan ni vuelven a hashear la tabla.
+    """
+    sig = tuple(getattr(x, "file_id", x) for x in inputs)
+    cached = st.session_state.get(f"{key}_frame")
+    if cached is None or cached[0] != sig:
+        df = build()
+        cached = st.session_state[f"{key}_frame"] = (sig, df, frame_fingerprint(df))
+    return cached[1], cached[2]
+
+def render_batch(flow: str, key: str, types: list, file_name: str, code: str = None):
+    """Modo lote de una pestaña: empareja los archivos, los procesa (en serie o con procesos) y arma una sola tabla editable."""
+    files = st.file_uploader(f"Archivos del lote ({' + '.join(FLOW_ROLES[flow])} por juego)", type=types, accept_multiple_files=True, key=f"{key}_lote_files")
+    if not files: return
+    jobs, unpaired = pair_files(flow, [f.name for f in files])
+    if unpaired: st.warning("Sin pareja, no se procesan: " + ", ".join(unpaired))
+    if not jobs: return
+    workers = st.number_input("Procesos en paralelo", min_value=1, max_value=max(BATCH_MAX_WORKERS, BATCH_WORKERS),
+                              value=BATCH_WORKERS, key=f"{key}_lote_workers",
+                              help="1 = en serie dentro de la app; más procesos solo compensan con muchos juegos grandes.")
+
+    # Se reprocesa solo si cambian los archivos subidos o el código
+    sig = (tuple((f.name, f.file_id) for f in files), code)
+    cached = st.session_state.get(f"{key}_lote_result")
+    if cached is None or cached[0] != sig:
+        with st.spinner(f"Procesando {len(jobs)} juegos de archivos…"):
+            df_out, report = run_batch(flow, jobs, {f.name: f.getvalue() for f in files}, code, workers=int(workers))
+        cached = st.session_state[f"{key}_lote_result"] = (sig, df_out, report, frame_fingerprint(df_out))
+    _, df_out, report, fp = cached
+
+    st.dataframe(pd.DataFrame(report), hide_index=True, width='stretch')
+    if df_out.empty: return st.info("Ningún juego de archivos generó rechazos.")
+    render_final_output(df_out, fp, file_name, f"post_{key}_lote", f"editor_{key}_lote", bank=FLOW_BANK[flow])
+
+def render_final_output(df: pd.DataFrame, base_fp: str, file_name: str, post_key: str, editor_key: str, default_code: str = None, bank: str = ""):
     """
     Centraliza formateo del df, cálculo de totales, tabla editable y botones.
+    `base_fp` es la huella de `df` (built_frame / render_batch la calculan una vez por tabla).
+    La tabla base se guarda una vez en la sesión y el editor solo aporta deltas (EditDeltas);
+    con más de EDITOR_FULL_MAX_ROWS filas recibe solo la página visible (con filtros).
+    La tabla final se arma recién al descargar o enviar.
     """
     st.subheader("Registros a procesar (Editables)")
     st.caption("Puedes modificar los datos, cambiar el 'Motivo de Rechazo' o añadir/eliminar filas usando las casillas de la izquierda.")
 
-    df_ui = df.copy()
-    df_ui["Estado"] = ESTADO
-    
-    # Asignar código por defecto si la lógica previa no lo hizo
-    if default_code and "Codigo de Rechazo" not in df_ui.columns:
-        df_ui["Codigo de Rechazo"] = default_code
-        
-    if "Codigo de Rechazo" in df_ui.columns:
-        df_ui["Descripcion de Rechazo"] = df_ui["Codigo de Rechazo"].map(CODE_DESC)
-        df_ui["Motivo de Rechazo"] = df_ui["Codigo de Rechazo"] + " - " + df_ui["Descripcion de Rechazo"]
-        df_ui = df_ui.drop(columns=["Codigo de Rechazo", "Descripcion de Rechazo"])
-
-    valid_options = [f"{k} - {v}" for k, v in CODE_DESC.items()]
-
-    edited_df = st.data_editor(
-        df_ui,
-        column_config={
-            "Motivo de Rechazo": st.column_config.SelectboxColumn("Código y Descripción", options=valid_options, required=True),
-            "dni/cex": st.column_config.TextColumn("DNI/CEX"), 
-            "nombre": st.column_config.TextColumn("Nombre"),   
-            "importe": st.column_config.NumberColumn("Importe", format="%.2f"), 
-            "Referencia": st.column_config.TextColumn("Referencia"), 
-            "Estado": st.column_config.TextColumn("Estado", disabled=True),
-        },
-        width='stretch',
-        num_rows="dynamic",
-        key=editor_key
-    )
-    
-    # Reconstruir columnas finales
-    df_final = edited_df.copy()
-    if "Motivo de Rechazo" in df_final.columns:
-        df_final["Codigo de Rechazo"] = df_final["Motivo de Rechazo"].apply(lambda v: str(v).split(" - ")[0].strip() if pd.notna(v) else "")
-        df_final["Descripcion de Rechazo"] = df_final["Motivo de Rechazo"].apply(
-            lambda v: str(v).split(" - ", 1)[1].strip() if pd.notna(v) and " - " in str(v) else CODE_DESC.get(str(v).split(" - ")[0], "")
+    # Estado por editor: base + deltas confirmados, y la vista (filtros + página) en edición
+    state_key = f"{editor_key}_state"
+    sig = (base_fp, default_code)
+    ed = st.session_state.get(state_key)
+    if ed is None or ed["sig"] != sig:
+        df_ui = df.reset_index(drop=True)
+        df_ui["Estado"] = ESTADO
+
+        # Asignar código por defecto si la lógica previa no lo hizo
+        if default_code and "Codigo de Rechazo" not in df_ui.columns:
+            df_ui["Codigo de Rechazo"] = default_code
+
+        if "Codigo de Rechazo" in df_ui.columns:
+            df_ui["Motivo de Rechazo"] = motivo_column(df_ui["Codigo de Rechazo"])
+            df_ui = df_ui.drop(columns=["Codigo de Rechazo"])
+        deltas = EditDeltas(df_ui)
+        # La versión cambia la key del editor: los cambios pendientes no pasan a otra tabla
+        ed = {"sig": sig, "deltas": deltas, "pending": deltas, "version": ed["version"] + 1 if ed else 0,
+              "view": None, "labels": deltas.labels()}
+        st.session_state[state_key] = ed
+
+    def fold():
+        # Confirma los cambios de la página y abre un editor nuevo para la vista siguiente
+        ed["deltas"] = ed["pending"]
+        ed["version"] += 1
+
+    paged = len(ed["deltas"]) > EDITOR_FULL_MAX_ROWS
+    if paged:
+        filters = _editor_view(ed["deltas"].base, editor_key)
+        changed = ed["view"] is not None and ed["view"] != (*filters, st.session_state.get(f"{editor_key}_page", 1))
+        if changed: fold()
+        if changed or ed["view"] is None:
+            # Los filtros se evalúan sobre las columnas vigentes (base + deltas), solo al cambiar de vista
+            d = ed["deltas"]
+            cols = [c for c in ("Motivo de Rechazo", "dni/cex", "Referencia") if c in d.base.columns]
+            ed["filter_labels"] = filter_labels(d.frame(cols=cols), *filters[:3])
+        labels = ed["filter_labels"]
+        page = _editor_page(len(labels), filters[3], editor_key, changed and ed["view"][:4] != filters)
+        view = (*filters, page)
+        if ed["view"] != view:
+            ed["view"], ed["labels"] = view, labels[(page - 1) * filters[3]:page * filters[3]]
+        st.caption(f"Mostrando {len(ed['labels'])} de {len(labels)} filas filtradas ({len(ed['pending'])} en total).")
+    elif ed["view"] is not None:
+        # La tabla bajó del umbral (se borraron filas): se vuelve al editor completo
+        fold()
+        ed["view"], ed["labels"] = None, ed["deltas"].labels()
+
+    ekey = f"{editor_key}_v{ed['version']}"
+    with stage("editor", rows=len(ed["labels"])):
+        edited_df = st.data_editor(
+            ed["deltas"].page(ed["labels"]),
+            column_config={
+                "Motivo de Rechazo": st.column_config.SelectboxColumn("Código y Descripción", options=MOTIVO_OPTIONS, required=True),
+                "dni/cex": st.column_config.TextColumn("DNI/CEX"), 
+                "nombre": st.column_config.TextColumn("Nombre"),   
+                "importe": st.column_config.NumberColumn("Importe", format="%.2f"), 
+                "Referencia": st.column_config.TextColumn("Referencia"), 
+                "Estado": st.column_config.TextColumn("Estado", disabled=True),
+                SOURCE_COL: st.column_config.TextColumn("Archivo", disabled=True),
+            },
+            width='stretch',
+            num_rows="dynamic",
+            key=ekey
         )
-        df_final = df_final.drop(columns=["Motivo de Rechazo"])
-        
-    for col in OUT_COLS:
-        if col not in df_final.columns: df_final[col] = ""
-    df_final = df_final[OUT_COLS]
-    
-    cnt, total = _count_and_sum(df_final)
-    st.write(f"**Total transacciones:** {cnt}   |   **Suma de importes:** {total:,.2f}")
-        
-    eb = df_to_excel_bytes(df_final)
-    col1, col2 = st.columns(2)
-    with col1: st.download_button("Descargar excel de registros", eb, file_name=file_name, mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", width='stretch')
-    with col2: _validate_and_post(df_final, post_key)
+    deltas = ed["pending"] = ed["deltas"].with_page(ed["labels"], st.session_state.get(ekey), edited_df)
 
-# Lógica de Scotiabank
-def parse_sco_importe(raw: str) -> float:
-    try: return float(raw) / 100.0
-    except ValueError: return 0.0
+    # Totales sin armar la tabla: base + diferencias
+    st.write(f"**Total transacciones:** {len(deltas)}   |   **Suma de importes:** {deltas.total():,.2f}")
 
-def map_sco_xls_error_to_code(observation: str) -> tuple[str, str]:
-    obs = str(observation).strip()
-    if "Verificar cuenta y/o documento" in obs: return "R001", "DOCUMENTO ERRADO"
-    if obs in ("Cancelada", "Verificar cuenta."): return "R002", "CUENTA INVALIDA"
-    if "Abono AFP" in obs: return "R017", "CUENTA DE AFP / CTS"
-    return "R002", "CUENTA INVALIDA"
+    audit = deltas.audit()
+    if len(audit):
+        with st.expander(f"Cambios sobre el resultado original ({len(audit)})"):
+            st.dataframe(audit, hide_index=True, width='stretch')
+            st.download_button("Descargar cambios (CSV)", audit.to_csv(index=False).encode("utf-8"), file_name=f"cambios_{file_name.rsplit('.', 1)[0]}.csv", mime="text/csv", key=f"{editor_key}_audit")
+
+    # El Excel se arma recién al pulsar "Descargar" y se reutiliza mientras base y deltas no cambien:
+    # con la huella en caché no se vuelve a armar ni la tabla final
+    fp = f"{base_fp}:{deltas.fingerprint()}"
+    final = lambda: _to_out_cols(deltas.frame())
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("Descargar excel de registros", lambda: excel_bytes_cached(final, fp), file_name=file_name, mime=EXPORT_FORMATS["xlsx"][1], width='stretch')
+        # Parquet: mismas columnas OUT_COLS con tipos, para conciliaciones que no parsean XLSX
+        st.download_button("Descargar Parquet", lambda: export_bytes_cached(final, "parquet", fp), file_name=f"{file_name.rsplit('.', 1)[0]}.parquet", mime=EXPORT_FORMATS["parquet"][1], width='stretch', key=f"{editor_key}_parquet")
+    with col2: _validate_and_post(final, len(deltas), post_key, bank)
 
 # -------------- Flujos --------------
 def tab_pre_bcp_xlsx():
     st.header("Antigua manera de rechazar con PDF")
     code, desc = select_code("pre_xlsx_code", "R002")
+    if batch_toggle("pre_xlsx"): return render_batch("pre-bcp-xlsx", "pre_xlsx", ["pdf", "xlsx"], "pre_bcp_xlsx.xlsx", code)
 
     pdf_file = st.file_uploader("PDF con filas", type="pdf", key="pre_xlsx_pdf")
     ex_file = st.file_uploader("Excel masivo", type="xlsx", key="pre_xlsx_xls")
-    
+
     if pdf_file and ex_file:
         with st.spinner("Procesando PRE BCP-xlsx…"):
-            text = extract_text_from_pdf(pdf_file)
-            filas = sorted({int(n) + 1 for n in re.findall(r"Registro\s+(\d+)", text)})
-            df_raw = load_dataframe(ex_file)
-            
-            if not filas:
-                st.warning("No se detectaron filas en el PDF.")
-                return
-            filas_valid = [i for i in filas if 0 <= i - 1 < len(df_raw)]
-            df_temp = df_raw.iloc[[i - 1 for i in filas_valid]].reset_index(drop=True)
-
-            ref_out = df_temp.iloc[:, 7] if df_temp.shape[1] > 7 else pd.Series([""] * len(df_temp))
-            nombre_out = df_temp.iloc[:, 3] if df_temp.shape[1] > 3 else (df_temp.iloc[:, 1] if df_temp.shape[1] > 1 else pd.Series([""] * len(df_temp)))
-
-            df_out = pd.DataFrame({
-                "dni/cex": df_temp.iloc[:, 0],
-                "nombre": nombre_out,
-                "importe": df_temp.iloc[:, 12].apply(parse_amount) if df_temp.shape[1] > 12 else pd.Series([0.0] * len(df_temp)),
-                "Referencia": ref_out,
-            })
-            render_final_output(df_out, "pre_bcp_xlsx.xlsx", "post_pre_xlsx", "editor_pre_xlsx", default_code=code)
+            try: df_out, fp = built_frame("pre_xlsx", [pdf_file, ex_file], lambda: process_pre_bcp_xlsx(pdf_file.getvalue(), ex_file.getvalue(), ex_file.name))
+            except EngineError as e: return show_engine_error(e)
+            render_final_output(df_out, fp, "pre_bcp_xlsx.xlsx", "post_pre_xlsx", "editor_pre_xlsx", default_code=code, bank="BCP")
 
 def tab_pre_bcp_txt():
     st.subheader("PRE RECHAZO BCP")
     code, desc = select_code("pre_txt_code", "R002")
+    if batch_toggle("pre_txt"): return render_batch("pre-bcp-txt", "pre_txt", ["pdf", "txt"], "pre_bcp_txt.xlsx", code)
 
     pdf_file = st.file_uploader("PDF", type="pdf", key="pre_txt_pdf")
     txt_file = st.file_uploader("TXT", type="txt", key="pre_txt_txt")
-    
+
     if pdf_file and txt_file:
         with st.spinner("Procesando PRE BCP-txt…"):
-            text = extract_text_from_pdf(pdf_file)
-            regs = sorted({int(m) for m in re.findall(r"Registro\s+(\d{1,5})", text)})
-            lines = txt_file.read().decode("utf-8", errors="ignore").splitlines()
-            indices = sorted({r * MULT for r in regs})
-
-            rows = []
-            for i in indices:
-                if 1 <= i <= len(lines):
-                    ln = lines[i - 1]
-                    rows.append({
-                        "dni/cex": slice_fixed(ln, *TXT_POS["dni"]),
-                        "nombre": slice_fixed(ln, *TXT_POS["nombre"]),
-                        "importe": parse_amount(slice_fixed(ln, *TXT_POS["importe"])),
-                        "Referencia": slice_fixed(ln, *TXT_POS["referencia"]),
-                    })
-                else:
-                    rows.append({"dni/cex": "", "nombre": "", "importe": 0.0, "Referencia": ""})
-
-            df_out = pd.DataFrame(rows) if rows else pd.DataFrame(columns=["dni/cex", "nombre", "importe", "Referencia"])
-            render_final_output(df_out, "pre_bcp_txt.xlsx", "post_pre_txt", "editor_pre_txt", default_code=code)
+            try: df_out, fp = built_frame("pre_txt", [pdf_file, txt_file], lambda: process_pre_bcp_txt(pdf_file.getvalue(), txt_file))
+            except EngineError as e: return show_engine_error(e)
+            render_final_output(df_out, fp, "pre_bcp_txt.xlsx", "post_pre_txt", "editor_pre_txt", default_code=code, bank="BCP")
 
 def tab_bcp_prueba():
     st.subheader("POST RECHAZO BCP")
     st.info("Módulo para procesar rechazos desde Excel BCP basado en la columna 'Observación'.")
-    
+
     code, desc = select_code("bcp_prueba_code", "R001")
-    ex_file = st.file_uploader("Cargar Excel BCP (.xlsx o .csv)", type=["xlsx", "xls", "csv"], key="bcp_prueba_file")
-    
+    if batch_toggle("bcp_prueba"): return render_batch("bcp", "bcp_prueba", TABLE_TYPES, "rechazo_bcp_prueba.xlsx", code)
+    ex_file = st.file_uploader("Cargar Excel BCP (.xlsx o .csv)", type=TABLE_TYPES, key="bcp_prueba_file")
+
     if ex_file:
         with st.spinner("Procesando POST RECHAZO BCP…"):
-            df_raw = load_dataframe(ex_file)
-            if "Observación" not in df_raw.columns:
-                st.error("No se encontró la columna 'Observación' en el archivo.")
-                return
-            
-            mask = df_raw["Observación"].notna() & (df_raw["Observación"].str.strip().str.lower() != "ninguna")
-            df_valid = df_raw.loc[mask].reset_index(drop=True)
-            
-            if df_valid.empty:
-                st.warning("No se encontraron registros.")
-                return
-            
-            nombre_out = df_valid["Beneficiario - Nombre"] if "Beneficiario - Nombre" in df_valid.columns else pd.Series([""] * len(df_valid))
-            dni_out = df_valid.iloc[:, 3] if df_valid.shape[1] > 3 else pd.Series([""] * len(df_valid))
-            ref_out = df_valid.iloc[:, 5] if df_valid.shape[1] > 5 else pd.Series([""] * len(df_valid))
-            importe_out = df_valid["Monto"].apply(parse_amount) if "Monto" in df_valid.columns else pd.Series([0.0] * len(df_valid))
-
-            df_out = pd.DataFrame({
-                "dni/cex": dni_out,
-                "nombre": nombre_out,
-                "importe": importe_out,
-                "Referencia": ref_out.astype(str).apply(lambda x: x[3:] if x.startswith("000") else x),
-            })
-            render_final_output(df_out, "rechazo_bcp_prueba.xlsx", "post_bcp_prueba", "editor_bcp_prueba", default_code=code)
+            try: df_out, fp = built_frame("bcp_prueba", [ex_file], lambda: process_bcp(ex_file.getvalue(), ex_file.name))
+            except EngineError as e: return show_engine_error(e)
+            render_final_output(df_out, fp, "rechazo_bcp_prueba.xlsx", "post_bcp_prueba", "editor_bcp_prueba", default_code=code, bank="BCP")
 
 def tab_bcp():
     st.header("BCP")
@@ -322,157 +325,105 @@ def tab_bcp():
 
 def tab_rechazo_ibk():
     st.header("IBK")
+    if batch_toggle("ibk"): return render_batch("ibk", "ibk", ["zip"], "rechazo_ibk.xlsx")
 
     zip_file = st.file_uploader("ZIP con Excel", type="zip", key="ibk_zip")
     if zip_file:
         with st.spinner("Procesando rechazo IBK…"):
-            buf = io.BytesIO(zip_file.read())
-            zf = zipfile.ZipFile(buf)
-            fname = next(n for n in zf.namelist() if n.lower().endswith((".xlsx", ".xls")))
-            df_raw = pd.read_excel(zf.open(fname), dtype=str)
-            df2 = df_raw.iloc[11:].reset_index(drop=True)
-
-            col_o = df2.iloc[:, 14]
-            mask = col_o.notna() & (col_o.astype(str).str.strip() != "")
-            df_valid = df2.loc[mask].reset_index(drop=True)
-
-            df_out = pd.DataFrame({
-                "dni/cex": df_valid.iloc[:, 4],
-                "nombre": df_valid.iloc[:, 5],
-                "importe": df_valid.iloc[:, 13].apply(parse_amount),
-                "Referencia": df_valid.iloc[:, 7],
-            })
-            
-            # Lógica propia de IBK para código de rechazo por palabras clave
-            df_out["Codigo de Rechazo"] = ["R016" if any(k in str(o).lower() for k in KEYWORDS_NO_TIT) else "R002" for o in df_valid.iloc[:, 14]]
-            
-            render_final_output(df_out, "rechazo_ibk.xlsx", "post_ibk", "editor_ibk")
+            try: df_out, fp = built_frame("ibk", [zip_file], lambda: process_ibk(zip_file.getvalue()))
+            except EngineError as e: return show_engine_error(e)
+            per_file = df_out.groupby(SOURCE_COL, sort=False).size()
+            if len(per_file) > 1: st.info(" | ".join(f"{k}: {v} rechazos" for k, v in per_file.items()))
+            render_final_output(df_out, fp, "rechazo_ibk.xlsx", "post_ibk", "editor_ibk", bank="IBK")
 
 def tab_post_bcp_xlsx():
     st.header("BBVA")
-    
+
     # Lógica para pre-seleccionar R007 si el archivo de Excel cargado contiene "OTROS"
     uploaded_excel = st.session_state.get("post_xlsx_xls")
     if uploaded_excel:
         if st.session_state.get("last_bbva_file") != uploaded_excel.name:
             st.session_state["last_bbva_file"] = uploaded_excel.name
-            if "OTROS" in uploaded_excel.name.upper():
-                st.session_state["post_xlsx_code"] = "R007"
-            else:
-                st.session_state["post_xlsx_code"] = "R001"
-                
+            st.session_state["post_xlsx_code"] = default_code_bbva(uploaded_excel.name)
+
     code, desc = select_code("post_xlsx_code", "R001")
     st.info("Elige un código por defecto. Podrás editar cada fila individualmente en la tabla de resultados.")
-    
+    if batch_toggle("bbva"):
+        st.caption("En lote, el código por defecto sale del nombre de cada Excel (R007 si contiene 'OTROS').")
+        return render_batch("bbva", "bbva", ["pdf", "xlsx"], "rechazos_bbva.xlsx")
+
     pdf_file = st.file_uploader("PDF de DNIs", type="pdf", key="post_xlsx_pdf")
     ex_file = st.file_uploader("Excel masivo", type="xlsx", key="post_xlsx_xls")
-    
+
     if pdf_file and ex_file:
         with st.spinner("Procesando BBVA…"):
-            text = extract_text_from_pdf(pdf_file)
-            docs = set(re.findall(r"\b\d{6,}\b", text))
-            df_raw = load_dataframe(ex_file)
-            
-            if docs:
-                mask = df_raw.astype(str).apply(lambda col: col.isin(docs)).any(axis=1)
-                df_temp = df_raw.loc[mask].reset_index(drop=True)
-            else:
-                st.error("No se detectaron identificadores en el PDF.")
-                return
-
-            ref_out = df_temp.iloc[:, 7] if df_temp.shape[1] > 7 else pd.Series([""] * len(df_temp))
-            nombre_out = df_temp.iloc[:, 3] if df_temp.shape[1] > 3 else (df_temp.iloc[:, 1] if df_temp.shape[1] > 1 else pd.Series([""] * len(df_temp)))
-            
-            df_out = pd.DataFrame({
-                "dni/cex": df_temp.iloc[:, 0],
-                "nombre": nombre_out,
-                "importe": df_temp.iloc[:, 12].apply(parse_amount) if df_temp.shape[1] > 12 else pd.Series([0.0] * len(df_temp)),
-                "Referencia": ref_out,
-            })
-            render_final_output(df_out, "rechazos_bbva.xlsx", "post_post_xlsx", "editor_post_bcp", default_code=code)
-            
+            try: df_out, fp = built_frame("bbva", [pdf_file, ex_file], lambda: process_bbva(pdf_file.getvalue(), ex_file.getvalue(), ex_file.name))
+            except EngineError as e: return show_engine_error(e)
+            render_final_output(df_out, fp, "rechazos_bbva.xlsx", "post_post_xlsx", "editor_post_bcp", default_code=code, bank="BBVA")
+
 def tab_sco_processor():
     st.header("SCO")
     st.info("Auditoría de cantidades y Procesamiento de errores por Excel.")
+    if batch_toggle("sco"): return render_batch("sco", "sco", ["pdf", "txt", *TABLE_TYPES], "rechazos_sco.xlsx")
 
     col_up1, col_up2, col_up3 = st.columns(3)
     with col_up1: pdf_file = st.file_uploader("1. PDF Detalle", type="pdf", key="sco_pdf")
     with col_up2: txt_file = st.file_uploader("2. TXT Masivo", type="txt", key="sco_txt")
-    with col_up3: xls_file = st.file_uploader("3. XLS Errores", type=["xls", "xlsx", "csv"], key="sco_xls")
+    with col_up3: xls_file = st.file_uploader("3. XLS Errores", type=TABLE_TYPES, key="sco_xls")
+
+    txt_count = 0
 
-    txt_lines = []
-    
     if pdf_file and txt_file:
         st.divider()
         st.subheader("📊 Sección 1: Auditoría de Cantidades")
-        txt_content = txt_file.read().decode("utf-8", errors="ignore")
-        txt_lines = [line for line in txt_content.splitlines() if line.strip()]
-        
-        pdf_text = extract_text_from_pdf(pdf_file)
-        
-        # --- Extracción de datos específicos del PDF ---
-        # Busca "Detalle de orden No." seguido de espacios/saltos de línea y 4 dígitos
-        match_orden = re.search(r"Detalle de orden No\.?[\s\r\n]*(\d{4})", pdf_text, re.IGNORECASE)
-        num_op = f"Número de operación: '9242{match_orden.group(1)}'" if match_orden else "Número de operación: 'No encontrado'"
-        
-        # Busca "Total de la orden" y captura todo lo que le sigue hasta el final del documento
-        match_total = re.search(r"Total de la orden[\s\r\n:]*(.*)", pdf_text, re.IGNORECASE | re.DOTALL)
-        imp_total = match_total.group(1).strip() if match_total else "No encontrado"
-        
-        # Mostrar la información extraída en la interfaz
-        st.info(f"🔹 **{num_op}** &nbsp; | &nbsp; 💰 **Importe total:** {imp_total}")
-        # -----------------------------------------------
+        audit = sco_audit(pdf_file.getvalue(), txt_file)
+        txt_count = audit["txt_count"]
 
-        count_ok_pdf = pdf_text.upper().replace("Ο", "O").replace("Κ", "K").count("O.K.")
+        # Mostrar la información extraída del PDF en la interfaz
+        num_op = f"Número de operación: '{audit['num_op']}'" if audit["num_op"] else "Número de operación: 'No encontrado'"
+        imp_total = audit["total"] or "No encontrado"
+        st.info(f"🔹 **{num_op}** &nbsp; | &nbsp; 💰 **Importe total:** {imp_total}")
 
         c1, c2, c3 = st.columns(3)
-        c1.metric("Registros en TXT", len(txt_lines))
-        c2.metric("Confirmaciones 'O.K.' en PDF", count_ok_pdf)
-        
-        diff = len(txt_lines) - count_ok_pdf
+        c1.metric("Registros en TXT", txt_count)
+        c2.metric("Confirmaciones 'O.K.' en PDF", audit["ok_count"])
+
+        diff = audit["diff"]
         c3.metric("Diferencia", diff, delta_color="inverse")
 
         if diff == 0: st.success("✅ ¡Cuadratura Perfecta!")
         elif diff > 0: st.warning(f"⚠️ Hay {diff} posibles rechazos.")
         else: st.error("🚨 Extraño: Más 'O.K.' que líneas en el TXT.")
 
-    if xls_file and txt_lines:
+        # Detalle por línea: cada "O.K." se cruzó con su línea del TXT (referencia, DNI + importe, DNI)
+        missing, unmatched = audit["sin_confirmar"], audit["ok_sin_linea"]
+        if len(missing):
+            with st.expander(f"Líneas del TXT sin confirmación ({len(missing)})", expanded=len(missing) <= 100):
+                st.dataframe(missing, hide_index=True, width='stretch')
+                st.download_button("Descargar líneas sin confirmación (CSV)", missing.to_csv(index=False).encode("utf-8"),
+                                   file_name="sco_sin_confirmacion.csv", mime="text/csv", key="sco_sin_confirmar")
+        if len(unmatched):
+            with st.expander(f"Confirmaciones 'O.K.' sin línea en el TXT ({len(unmatched)})"):
+                st.dataframe(unmatched, hide_index=True, width='stretch')
+        with st.expander("Confirmaciones por página"):
+            st.bar_chart(pd.DataFrame({"O.K.": audit["ok_por_pagina"]}, index=pd.RangeIndex(1, len(audit["ok_por_pagina"]) + 1, name="página")))
+
+    if xls_file and txt_count:
         st.divider()
         st.subheader("🚫 Sección 2: Generar Rechazos")
-        
-        rows_to_reject = []
+
+        df_out = None
         try:
-            df_xls = pd.read_excel(xls_file, header=6, dtype=str)
-            if "Linea" not in df_xls.columns:
-                st.error("El Excel no tiene la columna 'Linea'. Verifique el formato (header=6).")
-            else:
-                for _, row in df_xls.iterrows():
-                    linea_val = row.get("Linea")
-                    obs_val = row.get("Observación:")
-                    if pd.isna(linea_val): continue
-                    
-                    try: line_idx = int(float(linea_val))
-                    except ValueError: continue
-
-                    idx_array = line_idx - 1
-                    if 0 <= idx_array < len(txt_lines):
-                        raw_line = txt_lines[idx_array]
-                        code, desc = map_sco_xls_error_to_code(obs_val)
-                        rows_to_reject.append({
-                            "dni/cex": slice_fixed(raw_line, *SCO_TXT_POS["dni"]),
-                            "nombre": slice_fixed(raw_line, *SCO_TXT_POS["nombre"]),
-                            "importe": parse_sco_importe(slice_fixed(raw_line, *SCO_TXT_POS["importe"])),
-                            "Referencia": slice_fixed(raw_line, 116, 127),
-                            "Codigo de Rechazo": code
-                        })
+            df_out, fp = built_frame("sco", [txt_file, xls_file, txt_count], lambda: process_sco(txt_file, xls_file.getvalue(), xls_file.name, txt_count))
+        except NoRecords as e:
+            st.info(str(e))
+        except EngineError as e:
+            st.error(str(e))
         except Exception as e:
             st.error(f"Error leyendo XLS: {e}")
 
-        if rows_to_reject:
-            df_out = pd.DataFrame(rows_to_reject)
-            render_final_output(df_out, "rechazos_sco.xlsx", "post_sco_simple", "editor_sco_simple")
-        elif xls_file:
-            st.info("El XLS no contenía líneas válidas.")
+        if df_out is not None:
+            render_final_output(df_out, fp, "rechazos_sco.xlsx", "post_sco_simple", "editor_sco_simple", bank="SCO")
 
     elif not pdf_file and not txt_file:
         st.info("👆 Carga los archivos arriba para comenzar.")
@@ -482,41 +433,25 @@ def tab_rechazo_total_txt():
     st.warning("⚠️ ESTA OPCIÓN RECHAZARÁ TODO EL ARCHIVO EXCEL CON EL CÓDIGO SELECCIONADO.")
 
     code, desc = select_code("total_excel_code", "R020")
-    ex_file = st.file_uploader("Cargar Excel Masivo para rechazar totalmente", type=["xlsx", "xls", "csv"], key="total_excel")
-    
+    if batch_toggle("total_excel"): return render_batch("total", "total_excel", TABLE_TYPES, "rechazo_total_inoperativo.xlsx", code)
+    ex_file = st.file_uploader("Cargar Excel Masivo para rechazar totalmente", type=TABLE_TYPES, key="total_excel")
+
     if ex_file:
         with st.spinner("Procesando rechazo total..."):
-            df_raw = load_dataframe(ex_file)
-            
-            if df_raw.shape[1] <= 7:
-                st.error("El archivo no tiene las columnas necesarias (se espera el formato POST BCP-xlsx).")
-                return
-            
-            col_ref_name = df_raw.columns[7]
-            df_valid = df_raw.dropna(subset=[col_ref_name]).copy()
-            df_valid[col_ref_name] = df_valid[col_ref_name].astype(str).str.strip()
-            df_valid = df_valid[df_valid[col_ref_name] != ""]
-            df_valid = df_valid[df_valid[col_ref_name].str.lower() != "nan"]
-            df_valid = df_valid.reset_index(drop=True)
-
-            if df_valid.empty:
-                st.error("No se detectaron registros válidos en la columna de Referencia (columna 8).")
-                return
-
-            df_out = pd.DataFrame({
-                "dni/cex": df_valid.iloc[:, 0],
-                "nombre": df_valid.iloc[:, 3] if df_valid.shape[1] > 3 else (df_valid.iloc[:, 1] if df_valid.shape[1] > 1 else pd.Series([""] * len(df_valid))),
-                "importe": df_valid.iloc[:, 12].apply(parse_amount) if df_valid.shape[1] > 12 else pd.Series([0.0] * len(df_valid)),
-                "Referencia": df_valid.iloc[:, 7],
-            })
-            render_final_output(df_out, "rechazo_total_inoperativo.xlsx", "post_total_excel", "editor_total_excel", default_code=code)
+            try: df_out, fp = built_frame("total_excel", [ex_file], lambda: process_total(ex_file.getvalue(), ex_file.name))
+            except EngineError as e: return st.error(str(e))
+            render_final_output(df_out, fp, "rechazo_total_inoperativo.xlsx", "post_total_excel", "editor_total_excel", default_code=code, bank="TOTAL")
 
 
 # -------------- Render pestañas --------------
 tabs = st.tabs(["BCP", "IBK", "BBVA", "SCO", "Rechazo TOTAL"])
 
-with tabs[0]: tab_bcp()
-with tabs[1]: tab_rechazo_ibk()
-with tabs[2]: tab_post_bcp_xlsx()
-with tabs[3]: tab_sco_processor()
-with tabs[4]: tab_rechazo_total_txt()
+with tabs[0], stage("BCP"): tab_bcp()
+with tabs[1], stage("IBK"): tab_rechazo_ibk()
+with tabs[2], stage("BBVA"): tab_post_bcp_xlsx()
+with tabs[3], stage("SCO"): tab_sco_processor()
+with tabs[4], stage("Rechazo TOTAL"): tab_rechazo_total_txt()
+
+if timing_run is not None:
+    end_run()
+    render_timing_panel(timing_run)
@@ -0,0 +1,131 @@
+"""Envío de rechazos al endpoint de conciliación: sesión reutilizable, timeout, reintentos y lotes."""
+import email.utils
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from io_utils import df_to_excel_bytes
+from timing import stage
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+POST_TIMEOUT = (10, 300)  # (conexión, lectura) en segundos
+POST_RETRIES = 3
+POST_BACKOFF = 1.0  # segundos; se duplica en cada reintento
+POST_RETRY_AFTER_MAX = 120  # espera máxima aceptada de un Retry-After; si pide más, no se reintenta
+# El POST no es idempotente: solo se reintenta si el endpoint no llegó a recibirlo (sin
+# conexión) o pidió esperar con Retry-After. Un 500/502/504 o un timeout de lectura pudo haber
+# procesado el archivo y se devuelve al llamador, salvo que pida retry_unsafe=True.
+RETRY_AFTER_STATUS = {429, 503}
+UNSAFE_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+POST_BATCH_ROWS = 5_000
+POST_MAX_WORKERS = 4
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def make_session(pool_size: int = POST_MAX_WORKERS) -> requests.Session:
+    """Sesión keep-alive con un pool de conexiones del tamaño del paralelismo."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _shared_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+
+def _not_sent(e: requests.RequestException) -> bool:
+    """El error ocurrió al abrir la conexión: el endpoint no recibió nada y reintentar no duplica."""
+    if isinstance(e, requests.ConnectTimeout): return True
+    reason = getattr(e.args[0], "reason", None) if isinstance(e, requests.ConnectionError) and e.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _retry_after(resp: requests.Response):
+    """Segundos pedidos por Retry-After (número o fecha HTTP); None si no vino o no se entiende."""
+    value = resp.headers.get("Retry-After", "").strip()
+    if value.isdigit(): return float(value)
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _post_with_retry(session, endpoint: str, excel_bytes: bytes, retries: int, backoff: float, timeout,
+                     retry_unsafe: bool = False) -> dict:
+    files = {"edt": ("rechazos.xlsx", excel_bytes, XLSX_MIME)}
+    attempt = 0
+    while True:
+        attempt += 1
+        wait = backoff * 2 ** (attempt - 1)
+        try:
+            resp = session.post(endpoint, files=files, timeout=timeout)
+            status, text, error = resp.status_code, resp.text, ""
+            after = _retry_after(resp) if status in RETRY_AFTER_STATUS else None
+            if after is not None and after <= POST_RETRY_AFTER_MAX:
+                retry, wait = True, after
+            else:
+                retry = retry_unsafe and status in UNSAFE_RETRY_STATUS
+        except requests.RequestException as e:
+            status, text, error = None, "", str(e)
+            retry = retry_unsafe or _not_sent(e)
+        if not retry or attempt > retries:
+            return {"status": status, "respuesta": text, "error": error, "intentos": attempt}
+        time.sleep(wait)
+
+
+def post_to_endpoint(excel_bytes: bytes, endpoint: str, retries: int = POST_RETRIES,
+                     backoff: float = POST_BACKOFF, timeout=POST_TIMEOUT, retry_unsafe: bool = False) -> tuple[int, str]:
+    with stage("envio", nbytes=len(excel_bytes)) as s:
+        r = _post_with_retry(_shared_session(), endpoint, excel_bytes, retries, backoff, timeout, retry_unsafe)
+        s.note = f"HTTP {r['status']}, {r['intentos']} intento(s)"
+    return r["status"], r["respuesta"] or r["error"]
+
+
+def _send_batch(session, endpoint: str, n: int, start: int, batch: pd.DataFrame, retries, backoff, timeout,
+                retry_unsafe: bool = False) -> dict:
+    t = time.perf_counter()
+    r = _post_with_retry(session, endpoint, df_to_excel_bytes(batch), retries, backoff, timeout, retry_unsafe)
+    return {
+        "lote": n,
+        "desde": start + 1,
+        "hasta": start + len(batch),
+        "filas": len(batch),
+        "status": r["status"],
+        "ok": r["status"] is not None and 200 <= r["status"] < 300,
+        "intentos": r["intentos"],
+        "segundos": round(time.perf_counter() - t, 2),
+        "respuesta": (r["respuesta"] or r["error"])[:500],
+    }
+
+
+def post_in_batches(df: pd.DataFrame, endpoint: str, batch_rows: int = POST_BATCH_ROWS,
+                    max_workers: int = POST_MAX_WORKERS, retries: int = POST_RETRIES,
+                    backoff: float = POST_BACKOFF, timeout=POST_TIMEOUT, retry_unsafe: bool = False) -> list[dict]:
+    """
+    Parte el payload en lotes de `batch_rows` filas y los envía en paralelo (como máximo
+    `max_workers` a la vez) sobre una sesión keep-alive. Devuelve un reporte por lote.
+    Con `retry_unsafe` también reintenta 500/502/504 y timeouts (el lote puede quedar duplicado).
+    """
+    starts = range(0, len(df), batch_rows)
+    with stage("envio_lotes", rows=len(df), note=f"{len(starts)} lotes"), \
+            make_session(max_workers) as session, ThreadPoolExecutor(max_workers=max_workers) as ex:
+        futures = [
+            ex.submit(_send_batch, session, endpoint, n, s, df.iloc[s:s + batch_rows], retries, backoff, timeout, retry_unsafe)
+            for n, s in enumerate(starts, 1)
+        ]
+        return [f.result() for f in futures]
@@ -0,0 +1,217 @@
+"""Procesamiento por lotes: muchos archivos de un mismo flujo, emparejados por nombre y procesados
+en serie o en un pool de procesos (`workers`; el pool arranca con pdf_utils.mp_context()).
+
+    jobs, sin_pareja = pair_files("pre-bcp-txt", ["0412.pdf", "0412.txt", "0413.pdf", "0413.txt"])
+    df, reporte = run_batch("pre-bcp-txt", jobs, {nombre: bytes, ...})
+
+Cada job pasa por process_files, el mismo despacho que usa cli.run_flow; el resultado une las
+filas de todos los jobs con la columna SOURCE_COL indicando de qué archivo sale cada una.
+"""
+import io
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+from pathlib import Path
+
+import pandas as pd
+
+from engine import (
+    DEFAULT_CODES, SOURCE_COL, EngineError, NoRecords, default_code_bbva,
+    process_bbva, process_bcp, process_ibk, process_pre_bcp_xlsx, process_pre_bcp_txt,
+    process_sco, process_total, sco_audit,
+)
+from pdf_utils import mp_context
+from timing import stage
+
+# En serie por defecto (la app corre dentro del servidor de Streamlit); la UI y el entorno pueden subirlo
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", 0)) or 1
+BATCH_MAX_WORKERS = os.cpu_count() or 1
+
+# flujo -> roles de archivo que forman un job
+FLOW_ROLES = {
+    "pre-bcp-xlsx": ("pdf", "excel"),
+    "pre-bcp-txt": ("pdf", "txt"),
+    "bcp": ("excel",),
+    "ibk": ("zip",),
+    "bbva": ("pdf", "excel"),
+    "sco": ("pdf", "txt", "xls"),
+    "total": ("excel",),
+}
+
+# flujo -> banco con el que queda cada envío en el registro (ledger.py)
+FLOW_BANK = {"pre-bcp-xlsx": "BCP", "pre-bcp-txt": "BCP", "bcp": "BCP", "ibk": "IBK", "bbva": "BBVA", "sco": "SCO", "total": "TOTAL"}
+
+# rol -> extensiones aceptadas; en SCO el Excel es el "XLS de errores"
+ROLE_EXTS = {
+    "pdf": (".pdf",),
+    "txt": (".txt",),
+    "zip": (".zip",),
+    "excel": (".xlsx", ".xls", ".csv", ".parquet", ".arrow", ".feather"),
+    "xls": (".xls", ".xlsx", ".csv", ".parquet", ".arrow", ".feather"),
+}
+
+
+# -------------- Despacho por flujo --------------
+def _read(src) -> bytes:
+    return src if isinstance(src, (bytes, bytearray)) else Path(src).read_bytes()
+
+
+def _open(src):
+    # El TXT se recorre como archivo: desde disco no se carga completo en memoria
+    return nullcontext(io.BytesIO(src)) if isinstance(src, (bytes, bytearray)) else open(src, "rb")
+
+
+def process_files(flow: str, files: dict) -> tuple:
+    """
+    Ejecuta un flujo con {rol: (nombre, bytes o ruta)}; devuelve (df del motor, código por
+    defecto del flujo, info extra para el resumen).
+    """
+    data = lambda k: _read(files[k][1])
+    name = lambda k: files[k][0]
+    info = {}
+    if flow == "pre-bcp-xlsx":
+        df, default = process_pre_bcp_xlsx(data("pdf"), data("excel"), name("excel")), DEFAULT_CODES["pre_bcp_xlsx"]
+    elif flow == "pre-bcp-txt":
+        with _open(files["txt"][1]) as txt:
+            df, default = process_pre_bcp_txt(data("pdf"), txt), DEFAULT_CODES["pre_bcp_txt"]
+    elif flow == "bcp":
+        df, default = process_bcp(data("excel"), name("excel")), DEFAULT_CODES["bcp"]
+    elif flow == "ibk":
+        df, default = process_ibk(data("zip")), None
+        info = {"miembros": df.groupby(SOURCE_COL, sort=False).size().to_dict()}
+    elif flow == "bbva":
+        df, default = process_bbva(data("pdf"), data("excel"), name("excel")), default_code_bbva(name("excel"))
+    elif flow == "sco":
+        with _open(files["txt"][1]) as txt:
+            audit = sco_audit(data("pdf"), txt)
+            df, default = process_sco(txt, data("xls"), name("xls"), audit["txt_count"]), None
+        # Para el resumen: conteos, no las tablas de líneas sin confirmar
+        info = {k: v for k, v in audit.items() if k in ("txt_count", "ok_count", "diff", "num_op", "total")}
+        info.update(sin_confirmar=len(audit["sin_confirmar"]), ok_sin_linea=len(audit["ok_sin_linea"]))
+    elif flow == "total":
+        df, default = process_total(data("excel"), name("excel")), DEFAULT_CODES["total"]
+    else:
+        raise ValueError(f"Flujo desconocido: {flow}")
+    return df, default, info
+
+
+# -------------- Emparejado --------------
+def file_role(flow: str, name: str) -> str:
+    ext = os.path.splitext(name.lower())[1]
+    return next((r for r in FLOW_ROLES[flow] if ext in ROLE_EXTS[r]), None)
+
+
+def _norm(stem: str) -> str:
+    return re.sub(r"[^0-9a-z]", "", stem.casefold())
+
+
+def _prefix_related(a: str, b: str) -> bool:
+    """Un nombre normalizado es prefijo del otro; uno vacío ('___.txt') no empareja con nada."""
+    return bool(a and b) and (a.startswith(b) or b.startswith(a))
+
+
+def pair_files(flow: str, names: list) -> tuple[list, list]:
+    """
+    Agrupa los archivos en jobs {"name": ..., "files": {rol: nombre}}; devuelve (jobs, sin pareja).
+    Se empareja por nombre base igual (sin distinguir mayúsculas); luego, entre los que quedan,
+    cuando un nombre normalizado es prefijo de otro de forma única (lote_0412.pdf con
+    LOTE-0412_masivo.txt); y si al final queda exactamente un archivo por rol, se emparejan entre sí.
+    """
+    roles = FLOW_ROLES[flow]
+    left = {r: [] for r in roles}
+    unknown = []
+    for n in names:
+        role = file_role(flow, n)
+        (left[role] if role else unknown).append(n)
+    stem = lambda n: Path(n).stem
+    jobs = []
+
+    def take(anchor: str, group: dict):
+        for r, n in group.items(): left[r].remove(n)
+        jobs.append({"name": stem(anchor), "files": group})
+
+    first, others = roles[0], roles[1:]
+    # 1) mismo nombre base
+    for n in list(left[first]):
+        key = stem(n).casefold()
+        group = {first: n}
+        for r in others:
+            found = [m for m in left[r] if stem(m).casefold() == key]
+            if len(found) == 1: group[r] = found[0]
+        if len(group) == len(roles): take(n, group)
+    # 2) prefijo único sobre el nombre normalizado
+    for n in list(left[first]):
+        key = _norm(stem(n))
+        group = {first: n}
+        for r in others:
+            found = [m for m in left[r] if _prefix_related(key, _norm(stem(m)))]
+            if len(found) == 1: group[r] = found[0]
+        if len(group) == len(roles): take(n, group)
+    # 3) un único archivo por rol
+    if others and all(len(left[r]) == 1 for r in roles):
+        take(left[first][0], {r: left[r][0] for r in roles})
+    return jobs, sorted(unknown + [n for r in roles for n in left[r]])
+
+
+# -------------- Ejecución --------------
+def init_worker():
+    # El paralelismo va por jobs: dentro de cada worker los PDFs se extraen en serie
+    import pdf_utils
+    pdf_utils.PDF_WORKERS = 1
+
+
+def _run_job(flow: str, files: dict) -> dict:
+    t = time.perf_counter()
+    out = {"df": None, "default": None, "info": {}}
+    try:
+        out["df"], out["default"], out["info"] = process_files(flow, files)
+        out["estado"] = "ok"
+    except NoRecords as e:
+        out.update(estado="sin_registros", mensaje=str(e))
+    except EngineError as e:
+        out.update(estado="error", mensaje=str(e))
+    except Exception as e:  # archivo corrupto, formato inesperado: el resto del lote sigue
+        out.update(estado="error", mensaje=f"{type(e).__name__}: {e}")
+    out["segundos"] = round(time.perf_counter() - t, 2)
+    return out
+
+
+def _run_all(flow: str, payloads: list, workers: int) -> list:
+    workers = max(1, min(workers, len(payloads)))
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context(), initializer=init_worker) as ex:
+                return list(ex.map(_run_job, [flow] * len(payloads), payloads))
+        except (OSError, BrokenProcessPool):
+            pass  # sin procesos disponibles: se sigue en serie
+    return [_run_job(flow, p) for p in payloads]
+
+
+def run_batch(flow: str, jobs: list, data: dict, code: str = None, workers: int = BATCH_WORKERS) -> tuple:
+    """
+    Procesa los jobs de pair_files con el contenido {nombre: bytes}. Devuelve (df unido, reporte):
+    el df trae "Codigo de Rechazo" (el `code` dado o el del flujo/archivo) y SOURCE_COL; el
+    reporte tiene una fila por job con estado, filas, segundos, mensaje e info del flujo.
+    """
+    payloads = [{r: (n, data[n]) for r, n in job["files"].items()} for job in jobs]
+    with stage("lote", note=f"{len(jobs)} jobs") as s:
+        results = _run_all(flow, payloads, workers)
+        parts, report = [], []
+        for job, res in zip(jobs, results):
+            df = res["df"]
+            rows = 0 if df is None else len(df)
+            report.append({"archivo": job["name"], "estado": res["estado"], "filas": rows, "segundos": res["segundos"],
+                           "mensaje": res.get("mensaje", ""),
+                           **{k: v if isinstance(v, (int, float, str)) or v is None else str(v) for k, v in res["info"].items()}})
+            if not rows: continue
+            df = df.copy()
+            if "Codigo de Rechazo" not in df.columns: df["Codigo de Rechazo"] = code or res["default"] or ""
+            # En IBK la fila ya trae el miembro del ZIP: queda como zip/miembro
+            df[SOURCE_COL] = job["name"] + "/" + df[SOURCE_COL].astype(str) if SOURCE_COL in df.columns else job["name"]
+            parts.append(df)
+        out = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+        s.rows = len(out)
+    return out, report
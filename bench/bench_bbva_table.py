@@ -0,0 +1,73 @@
+"""Benchmark: tabla BBVA por coordenadas vs heurística de texto (precisión, recall y páginas/segundo).
+
+Sobre PDFs sintéticos (generators.gen_bbva_table) con Titular y Situación partidos en varias
+líneas se compara el mapa DNI -> Situación que cada método entrega al flujo, y el importe
+de cada fila reconstruida.
+
+Uso: python bench/bench_bbva_table.py --rows 1000 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import pdf_tables  # noqa: E402
+import pdf_utils  # noqa: E402
+from generators import gen_bbva_table  # noqa: E402
+
+
+def heuristic(pdf_bytes: bytes) -> list:
+    """Camino anterior: texto plano -> filas por heurística, con el respaldo de líneas vecinas."""
+    text = pdf_utils.extract_pdf_text(pdf_bytes)
+    rows = pdf_tables.rows_from_text(text)
+    if not any(r.get("docident") for r in rows):
+        rows = [{"docident": i, "situacion": s, "importe": ""} for i, s in pdf_tables.id_situ_pairs_from_text(text).items()]
+    return rows
+
+
+def coordinates(pdf_bytes: bytes) -> list:
+    return pdf_tables.bbva_table_rows(pdf_bytes)
+
+
+def score(rows: list, truth: list, field: str) -> tuple[float, float]:
+    """Precisión y recall de los pares (docident, campo) contra lo esperado."""
+    got = {(r["docident"], " ".join(str(r.get(field, "")).split())) for r in rows if r.get("docident")}
+    want = {(t["docident"], t[field]) for t in truth}
+    hit = len(got & want)
+    return hit / len(got) if got else 0.0, hit / len(want) if want else 0.0
+
+
+def _timed(fn, pdf_bytes: bytes, repeat: int) -> tuple[float, list]:
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        pdf_utils.clear_pdf_cache()
+        t = time.perf_counter()
+        out = fn(pdf_bytes)
+        best = min(best, time.perf_counter() - t)
+    return best, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, nargs="+", default=[1_000, 20_000])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    pdf_utils.use_processes()
+
+    print(f"{'filas':>7} {'págs':>5} {'método':<12} {'P situación':>11} {'R situación':>11} {'P importe':>9} {'R importe':>9} {'pág/s':>8}")
+    for n in args.rows:
+        pdf_bytes, truth = gen_bbva_table(n)
+        for name, fn in (("heurística", heuristic), ("coordenadas", coordinates)):
+            secs, rows = _timed(fn, pdf_bytes, args.repeat)
+            pages = pdf_utils.fitz.open(stream=pdf_bytes, filetype="pdf").page_count
+            ps, rs = score(rows, truth, "situacion")
+            pi, ri = score(rows, truth, "importe")
+            print(f"{n:>7} {pages:>5} {name:<12} {ps:>11.3f} {rs:>11.3f} {pi:>9.3f} {ri:>9.3f} {pages / secs:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
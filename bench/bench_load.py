@@ -0,0 +1,103 @@
+"""Benchmark: backends de lectura de load_dataframe por formato (xlsx / csv / parquet / arrow).
+
+Uso: python bench/bench_load.py --rows 50000 100000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from openpyxl import Workbook  # noqa: E402
+
+import io_utils  # noqa: E402
+
+HEADERS = ["DNI", "Tipo", "Cuenta", "Nombre", "Moneda", "Banco", "Fecha", "Referencia",
+           "Concepto", "Estado", "Canal", "Lote", "Importe", "Observación"]
+BLANK_EVERY = 997  # filas en blanco intercaladas en el xlsx (planillas editadas a mano)
+
+
+def make_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Excel masivo sintético: 14 columnas, importes repetidos, algunas celdas vacías."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "DNI": rng.integers(10_000_000, 99_999_999, rows),
+        "Tipo": rng.choice(["DNI", "CE"], rows),
+        "Cuenta": [f"0011-0814-{i % 100:02d}-{i:010d}" for i in range(rows)],
+        "Nombre": rng.choice(["PEREZ GOMEZ JUAN", "QUISPE MAMANI ROSA", "TORRES DIAZ LUIS"], rows),
+        "Moneda": "PEN",
+        "Banco": rng.choice(["BCP", "BBVA", "IBK", "SCO"], rows),
+        "Fecha": "2026-10-01",
+        "Referencia": rng.integers(10**10, 10**11, rows),
+        "Concepto": rng.choice(["PAGO", "ABONO", None], rows),
+        "Estado": "pendiente",
+        "Canal": rng.choice(["web", "app"], rows),
+        "Lote": rng.integers(1, 50, rows),
+        "Importe": rng.choice(np.round(rng.uniform(10, 5000, 2000), 2), rows),
+        "Observación": rng.choice(["Ninguna", "Cuenta inválida", None], rows),
+    })
+
+
+def to_xlsx(df: pd.DataFrame, blank_every: int = BLANK_EVERY) -> bytes:
+    """Con una fila en blanco cada `blank_every` filas: los lectores deben conservarlas como NaN."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Hoja1")
+    ws.append(list(df.columns))
+    for i, row in enumerate(df.itertuples(index=False), 1):
+        if blank_every and i % blank_every == 0: ws.append([])
+        ws.append([None if (isinstance(v, float) and np.isnan(v)) else (v.item() if hasattr(v, "item") else v) for v in row])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def to_csv(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False).encode()
+
+
+def to_parquet(df: pd.DataFrame) -> bytes:
+    return io_utils.df_to_parquet_bytes(df)
+
+
+def to_arrow(df: pd.DataFrame) -> bytes:
+    return io_utils.df_to_arrow_bytes(df)
+
+
+def bench(data: bytes, name: str, backends: list, reference: str):
+    expected = io_utils.BACKENDS[reference](data)
+    print(f"\n{name}: {len(data) / 1e6:.1f} MB (auto -> {io_utils.pick_backend(name, len(data))})")
+    for b in backends:
+        t = time.perf_counter()
+        df = io_utils.BACKENDS[b](data)
+        dt = time.perf_counter() - t
+        same = df.shape == expected.shape and list(df.columns) == list(expected.columns) and df.fillna("<NA>").astype(object).equals(expected.fillna("<NA>").astype(object))
+        print(f"  {b:<16} {dt:>7.2f}s  {'igual' if same else 'DIFIERE'} a {reference}")
+    io_utils.clear_load_cache()
+    t = time.perf_counter()
+    io_utils.read_table(data, name)
+    cold = time.perf_counter() - t
+    t = time.perf_counter()
+    io_utils.read_table(data, name)
+    print(f"  read_table: frío {cold:.2f}s, con caché {time.perf_counter() - t:.4f}s")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--rows", type=int, nargs="+", default=[50_000])
+    args = ap.parse_args()
+    avail = io_utils.available_backends()
+    for rows in args.rows:
+        df = make_frame(rows)
+        bench(to_xlsx(df), f"masivo_{rows}.xlsx", [b for b in ("openpyxl", "openpyxl_stream", "calamine") if b in avail], "openpyxl")
+        bench(to_csv(df), f"masivo_{rows}.csv", [b for b in ("csv", "csv_pyarrow") if b in avail], "csv")
+        if "parquet" in avail:
+            bench(to_parquet(df), f"masivo_{rows}.parquet", ["parquet"], "parquet")
+            bench(to_arrow(df), f"masivo_{rows}.arrow", ["arrow"], "arrow")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark: páginas/segundo de extracción de texto PDF, serie vs procesos.
+
+Uso: python bench/bench_pdf_extract.py --pages 2000 --workers 2 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+import pdf_utils  # noqa: E402
+
+
+def make_pdf(pages: int, rows_per_page: int = 40) -> bytes:
+    """PDF sintético tipo reporte de rechazos: una línea 'Registro N' por fila."""
+    doc = fitz.open()
+    n = 0
+    for _ in range(pages):
+        page = doc.new_page()
+        y = 40
+        for _ in range(rows_per_page):
+            n += 1
+            page.insert_text((36, y), f"Registro {n:>6}  DNI {40000000 + n}  S/ {n % 9000 + 10:,.2f}  O.K.", fontsize=8)
+            y += 18
+    return doc.tobytes()
+
+
+def serial_baseline(pdf_bytes: bytes) -> str:
+    """Camino original: un solo núcleo, página a página."""
+    return "".join(p.get_text() or "" for p in fitz.open(stream=pdf_bytes, filetype="pdf"))
+
+
+def _timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        pdf_utils.clear_pdf_cache()
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--pages", type=int, default=2000)
+    ap.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    pdf_utils.use_processes()
+
+    pdf_bytes = make_pdf(args.pages)
+    expected = serial_baseline(pdf_bytes)
+    print(f"PDF: {args.pages} páginas, {len(pdf_bytes) / 1e6:.1f} MB, cpu_count={os.cpu_count()}")
+
+    t = _timed(lambda: serial_baseline(pdf_bytes), args.repeat)
+    print(f"{'serie (actual)':<16} {args.pages / t:>10.0f} pág/s  {t:.2f}s")
+    for w in args.workers:
+        assert "".join(pdf_utils.extract_pdf_pages(pdf_bytes, workers=w, min_pages=0)) == expected
+        t = _timed(lambda: pdf_utils.extract_pdf_pages(pdf_bytes, workers=w, min_pages=0), args.repeat)
+        print(f"{f'{w} procesos':<16} {args.pages / t:>10.0f} pág/s  {t:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Generadores de archivos bancarios sintéticos con el formato que espera cada flujo.
+
+Cada generador recibe el número de registros del masivo y devuelve {rol: bytes}, con los
+mismos roles que usa cli.py / daemon.py. Los rechazos son una fracción (REJECT_RATE) de los
+registros, como en los archivos reales.
+
+Uso: python bench/generators.py --sizes 1000 100000 --out bench/data
+"""
+import argparse
+import io
+import os
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from openpyxl import Workbook  # noqa: E402
+
+from engine import MULT, SCO_TXT_POS, TXT_POS  # noqa: E402
+
+REJECT_RATE = 0.02
+PDF_LINES_PER_PAGE = 60
+SIZES = [1_000, 100_000, 1_000_000]
+
+NOMBRES = ["PEREZ GOMEZ JUAN", "QUISPE MAMANI ROSA", "TORRES DIAZ LUIS", "ÑAHUI HUAMÁN JOSÉ", "GARCIA LOPEZ MARIA"]
+OBS_SCO = ["Verificar cuenta y/o documento", "Cancelada", "Verificar cuenta.", "Abono AFP no permitido", "Cuenta bloqueada"]
+OBS_IBK = ["Cliente no titular de la cuenta", "Cuenta inválida", "Si deseas, puedes continuar", "Cuenta cerrada"]
+
+
+def _rng(seed: int) -> np.random.Generator:
+    return np.random.default_rng(seed)
+
+
+def _fixed_width(fields: dict, positions: dict, width: int) -> str:
+    """Arma una línea posicional a partir de {campo: texto} con posiciones 1-based (inicio, fin)."""
+    line = [" "] * width
+    for name, (start, end) in positions.items():
+        text = str(fields.get(name, ""))[: end - start + 1]
+        line[start - 1:start - 1 + len(text)] = text
+    return "".join(line)
+
+
+def _pdf(lines: list, header: str = "", footer: str = "") -> bytes:
+    """PDF de texto plano; cada página recibe un bloque de líneas con insert_textbox (rápido)."""
+    doc = fitz.open()
+    chunks = [lines[i:i + PDF_LINES_PER_PAGE] for i in range(0, len(lines), PDF_LINES_PER_PAGE)] or [[]]
+    for n, chunk in enumerate(chunks):
+        page = doc.new_page()
+        text = "\n".join(([header] if n == 0 and header else []) + chunk + ([footer] if n == len(chunks) - 1 and footer else []))
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=7)
+    return doc.tobytes()
+
+
+def _xlsx(rows, header: list = None, preamble: int = 0) -> bytes:
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Hoja1")
+    for i in range(preamble):
+        ws.append([f"Reporte de pagos - línea {i + 1}"])
+    if header: ws.append(header)
+    for r in rows:
+        ws.append(r)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def _amounts(rng, n: int) -> np.ndarray:
+    # Pocos importes distintos, como en planillas reales
+    return rng.choice(np.round(rng.uniform(10, 5000, 2000), 2), n)
+
+
+def _rejected(rng, n: int) -> np.ndarray:
+    k = max(1, int(n * REJECT_RATE))
+    return np.sort(rng.choice(np.arange(1, n + 1), k, replace=False))
+
+
+# -------------- BCP --------------
+def gen_bcp(rows: int, seed: int = 0) -> dict:
+    """TXT posicional (TXT_POS, un registro cada MULT líneas) + PDF con 'Registro N' de los rechazados."""
+    rng = _rng(seed)
+    width = max(end for _, end in TXT_POS.values()) + 5
+    dnis = rng.integers(10_000_000, 99_999_999, rows)
+    refs = rng.integers(10**10, 10**11, rows)
+    imps = _amounts(rng, rows)
+    nombres = rng.choice(NOMBRES, rows)
+    out = io.StringIO()
+    for i in range(rows):
+        for _ in range(MULT - 1):
+            out.write(f"CAB{i:08d}\n")  # línea de cabecera/abono que acompaña a cada registro
+        out.write(_fixed_width({"dni": dnis[i], "nombre": nombres[i], "referencia": refs[i], "importe": f"{imps[i]:.2f}"}, TXT_POS, width) + "\n")
+    # El reporte BCP numera con hasta 5 dígitos (RE_REGISTRO_TXT); más allá no hay 'Registro N' válido
+    regs = _rejected(rng, rows)
+    regs = regs[regs <= 99_999]
+    pdf = _pdf([f"Registro {r:>6}   Cuenta no existe" for r in regs], header="RELACIÓN DE REGISTROS RECHAZADOS")
+    return {"txt": out.getvalue().encode("utf-8"), "pdf": pdf}
+
+
+# -------------- SCO --------------
+def gen_sco(rows: int, seed: int = 0) -> dict:
+    """TXT posicional (SCO_TXT_POS) + PDF con 'O.K.' por registro aceptado + XLS de errores (header=6)."""
+    rng = _rng(seed)
+    width = max(end for _, end in SCO_TXT_POS.values()) + 3
+    dnis = rng.integers(10_000_000, 99_999_999, rows)
+    refs = rng.integers(10**10, 10**11, rows)
+    cents = (_amounts(rng, rows) * 100).astype(np.int64)
+    nombres = rng.choice(NOMBRES, rows)
+    txt = "".join(
+        _fixed_width({"dni": dnis[i], "nombre": nombres[i], "importe": f"{cents[i]:010d}", "referencia": refs[i]}, SCO_TXT_POS, width) + "\n"
+        for i in range(rows)
+    )
+    bad = set(_rejected(rng, rows).tolist())
+    ok_lines = [f"{i:>7}  {dnis[i - 1]}  {cents[i - 1] / 100:>10.2f}  O.K." for i in range(1, rows + 1) if i not in bad]
+    total = cents.sum() / 100
+    pdf = _pdf(ok_lines, header="Detalle de orden No.\n4821", footer=f"Total de la orden: S/ {total:,.2f}")
+    xls = _xlsx(([i, rng.choice(OBS_SCO)] for i in sorted(bad)), header=["Linea", "Observación:"], preamble=6)
+    return {"txt": txt.encode("utf-8"), "pdf": pdf, "xls": xls}
+
+
+# -------------- IBK --------------
+def gen_ibk(rows: int, seed: int = 0) -> dict:
+    """ZIP con el Excel de IBK: encabezado + 11 filas de preámbulo, observación en la columna 15."""
+    rng = _rng(seed)
+    dnis = rng.integers(10_000_000, 99_999_999, rows)
+    refs = rng.integers(10**10, 10**11, rows)
+    imps = _amounts(rng, rows)
+    nombres = rng.choice(NOMBRES, rows)
+    bad = set(_rejected(rng, rows).tolist())
+    obs = rng.choice(OBS_IBK, rows)
+
+    def data():
+        for _ in range(11):
+            yield ["Interbank - Detalle de pagos masivos"]
+        for i in range(rows):
+            yield [i + 1, "PEN", "01/10/2026", "Ahorros", str(dnis[i]), nombres[i], f"200-{i:010d}", str(refs[i]),
+                   None, None, None, None, "Procesado", f"{imps[i]:,.2f}", obs[i] if i + 1 in bad else None]
+
+    xlsx = _xlsx(data(), header=[f"Col{c}" for c in range(1, 16)])
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("rechazos_ibk.xlsx", xlsx)
+    return {"zip": buf.getvalue()}
+
+
+# -------------- BBVA --------------
+MASIVO_HEADERS = ["DNI", "Tipo", "Cuenta", "Nombre", "Moneda", "Banco", "Fecha", "Referencia",
+                  "Concepto", "Estado", "Canal", "Lote", "Importe", "Observación"]
+
+
+def masivo_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Excel masivo (formato POST BCP-xlsx): DNI col 1, nombre col 4, referencia col 8, importe col 13."""
+    rng = _rng(seed)
+    return pd.DataFrame({
+        "DNI": rng.integers(10_000_000, 99_999_999, rows).astype(str),
+        "Tipo": rng.choice(["DNI", "CE"], rows),
+        "Cuenta": [f"0011-0814-{i % 100:02d}-{i:010d}" for i in range(rows)],
+        "Nombre": rng.choice(NOMBRES, rows),
+        "Moneda": "PEN",
+        "Banco": "BBVA",
+        "Fecha": "2026-10-01",
+        "Referencia": rng.integers(10**10, 10**11, rows).astype(str),
+        "Concepto": rng.choice(["PAGO", "ABONO", None], rows),
+        "Estado": "pendiente",
+        "Canal": rng.choice(["web", "app"], rows),
+        "Lote": rng.integers(1, 50, rows),
+        "Importe": [f"{v:,.2f}" for v in _amounts(rng, rows)],
+        "Observación": None,
+    })
+
+
+def gen_bbva(rows: int, seed: int = 0) -> dict:
+    """Excel masivo + PDF de DNIs rechazados (más algunos IDs que no están en el Excel)."""
+    rng = _rng(seed)
+    df = masivo_frame(rows, seed)
+    picked = df["DNI"].to_numpy()[_rejected(rng, rows) - 1]
+    # IDs ausentes del Excel: carnés de extranjería de 9 dígitos (no chocan con los DNI de 8)
+    extra = [str(v) for v in rng.integers(100_000_000, 999_999_999, max(1, len(picked) // 10))]
+    lines = [f"{i:>6}  DNI {d}  OBSERVADO - DOCUMENTO NO COINCIDE" for i, d in enumerate(list(picked) + extra, 1)]
+    excel = _xlsx((list(r) for r in df.itertuples(index=False, name=None)), header=MASIVO_HEADERS)
+    return {"pdf": _pdf(lines, header="BBVA - RELACIÓN DE OBSERVADOS"), "excel": excel}
+
+
+# Tabla BBVA de rechazos con columnas reales (para bench_bbva_table.py): celdas partidas en
+# varias líneas y cabecera repetida en cada página
+BBVA_TABLE_COLS = [("No.", 36), ("Cuenta", 62), ("Titular", 160), ("Doc.Identidad", 262), ("Moneda", 322),
+                   ("Importe", 362), ("Situación", 432)]
+BBVA_TABLE_WIDTH = {"Titular": 96, "Situación": 140}  # ancho máximo antes de partir la celda
+SITUACIONES = ["DOC NO CORRESPONDE", "CUENTA INEXISTENTE", "CUENTA CANCELADA",
+               "CTA C/ERR NO IDENTIF REVISAR DATOS DEL BENEFICIARIO", "REGISTRO CON ERRORES EN CUENTA DESTINO INFORMADA"]
+TITULARES = NOMBRES + ["DE LA CRUZ VILLANUEVA MARIA DEL CARMEN", "RODRIGUEZ PALOMINO JUAN CARLOS ALBERTO"]
+
+
+def _wrap(text: str, width: float, fontsize: float) -> list:
+    lines, cur = [], ""
+    for word in text.split():
+        cand = f"{cur} {word}".strip()
+        if cur and fitz.get_text_length(cand, fontsize=fontsize) > width:
+            lines.append(cur)
+            cur = word
+        else:
+            cur = cand
+    return lines + [cur]
+
+
+def gen_bbva_table(rows: int, seed: int = 0, fontsize: float = 7) -> tuple[bytes, list]:
+    """PDF con la tabla No. / Cuenta / Titular / Doc.Identidad / Moneda / Importe / Situación y las filas esperadas."""
+    rng = _rng(seed)
+    dnis = rng.integers(10_000_000, 99_999_999, rows)
+    imps = _amounts(rng, rows)
+    titulares = rng.choice(TITULARES, rows)
+    situs = rng.choice(SITUACIONES, rows)
+    lh = fontsize + 2
+    doc = fitz.open()
+    truth, page, y = [], None, 0.0
+    for i in range(rows):
+        cells = {"No.": [str(i + 1)], "Cuenta": [f"0011-0814-{i % 100:02d}-{i:010d}"],
+                 "Titular": _wrap(str(titulares[i]), BBVA_TABLE_WIDTH["Titular"], fontsize),
+                 "Doc.Identidad": [f"L.E. {dnis[i]}"], "Moneda": ["PEN"], "Importe": [f"{imps[i]:,.2f}"],
+                 "Situación": _wrap(str(situs[i]), BBVA_TABLE_WIDTH["Situación"], fontsize)}
+        height = max(len(v) for v in cells.values()) * lh + 3
+        if page is None or y + height > 760:
+            page = doc.new_page()
+            page.insert_text((36, 40), "BBVA - RELACIÓN DE PAGOS RECHAZADOS", fontsize=9)
+            for name, x in BBVA_TABLE_COLS: page.insert_text((x, 62), name, fontsize=fontsize)
+            page.insert_text((36, 780), f"Página {len(doc)}", fontsize=fontsize)
+            y = 76.0
+        for name, x in BBVA_TABLE_COLS:
+            for k, text in enumerate(cells[name]):
+                if name == "Importe":  # alineado a la derecha, puede empezar antes del título
+                    x = 420 - fitz.get_text_length(text, fontsize=fontsize)
+                page.insert_text((x, y + k * lh), text, fontsize=fontsize)
+        y += height
+        truth.append({"docident": str(dnis[i]), "importe": f"{imps[i]:,.2f}", "situacion": str(situs[i])})
+    return doc.tobytes(), truth
+
+
+GENERATORS = {"bcp": gen_bcp, "sco": gen_sco, "ibk": gen_ibk, "bbva": gen_bbva}
+# extensión con la que se guarda cada rol
+EXT = {"txt": ".txt", "pdf": ".pdf", "xls": ".xlsx", "zip": ".zip", "excel": ".xlsx"}
+
+
+def write_inputs(flow: str, rows: int, out_dir: str, seed: int = 0) -> dict:
+    """Genera (o reutiliza si ya existen) los archivos del flujo; devuelve {rol: ruta}."""
+    paths = {}
+    base = os.path.join(out_dir, f"{flow}_{rows}")
+    os.makedirs(out_dir, exist_ok=True)
+    files = None
+    for role in {"bcp": ("txt", "pdf"), "sco": ("txt", "pdf", "xls"), "ibk": ("zip",), "bbva": ("pdf", "excel")}[flow]:
+        path = base + EXT[role]
+        if not os.path.exists(path):
+            files = files or GENERATORS[flow](rows, seed)
+            with open(path, "wb") as f:
+                f.write(files[role])
+        paths[role] = path
+    return paths
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--flows", nargs="+", default=list(GENERATORS), choices=list(GENERATORS))
+    ap.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    ap.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    for rows in args.sizes:
+        for flow in args.flows:
+            paths = write_inputs(flow, rows, args.out, args.seed)
+            print(f"{flow:<5} {rows:>9}: " + ", ".join(f"{os.path.basename(p)} ({os.path.getsize(p) / 1e6:.1f} MB)" for p in paths.values()))
+
+
+if __name__ == "__main__":
+    main()
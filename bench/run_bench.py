@@ -0,0 +1,179 @@
+"""Benchmark por flujo y por etapa sobre archivos sintéticos (ver generators.py).
+
+Cada etapa se mide en frío (cachés de PDF, lectura e índice vaciadas) y se guarda el mejor de
+--repeat corridas en bench/results.jsonl con una etiqueta (por defecto el commit actual), para
+comparar antes/después de un cambio.
+
+Uso:
+    python bench/run_bench.py --sizes 1000 100000
+    python bench/run_bench.py --sizes 100000 --flows bbva --compare 61662f8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import engine  # noqa: E402
+import io_utils  # noqa: E402
+import pdf_utils  # noqa: E402
+from generators import GENERATORS, write_inputs  # noqa: E402
+from matching import build_id_index, match_id_rows  # noqa: E402
+
+RESULTS = os.path.join(HERE, "results.jsonl")
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _clear_caches():
+    pdf_utils.clear_pdf_cache()
+    io_utils.clear_load_cache()
+    engine._ID_INDEX_CACHE.clear()
+
+
+# -------------- Etapas por flujo --------------
+# Cada etapa es (nombre, fn(paths, ctx)); se ejecutan en orden y ctx lleva los resultados
+# intermedios que usan las etapas siguientes.
+def _bcp_stages():
+    def txt_all(p, ctx):
+        with open(p["txt"], "rb") as f:
+            ctx["imp"] = [r["importe"] for c in engine.iter_txt_records(f, engine.TXT_POS) for r in c]
+    return [
+        ("pdf_registros", lambda p, ctx: engine.findall_pdf(_read(p["pdf"]), engine.RE_REGISTRO_TXT)),
+        ("txt_slice_fixed", txt_all),
+        ("parse_amount", lambda p, ctx: [engine.parse_amount(v) for v in ctx["imp"]]),
+        ("parse_amount_series", lambda p, ctx: engine.parse_amount_series(ctx["imp"])),
+        ("flujo", lambda p, ctx: ctx.__setitem__("df", _with_txt(p, lambda f: engine.process_pre_bcp_txt(_read(p["pdf"]), f)))),
+        ("excel", lambda p, ctx: io_utils.df_to_excel_bytes(engine.finalize_output(ctx["df"], "R002"))),
+    ]
+
+
+def _sco_stages():
+    return [
+        ("auditoria", lambda p, ctx: ctx.__setitem__("audit", _with_txt(p, lambda f: engine.sco_audit(_read(p["pdf"]), f)))),
+        ("flujo", lambda p, ctx: ctx.__setitem__("df", _with_txt(p, lambda f: engine.process_sco(f, _read(p["xls"]), os.path.basename(p["xls"]))))),
+        ("excel", lambda p, ctx: io_utils.df_to_excel_bytes(engine.finalize_output(ctx["df"]))),
+    ]
+
+
+def _ibk_stages():
+    return [
+        ("flujo", lambda p, ctx: ctx.__setitem__("df", engine.process_ibk(_read(p["zip"])))),
+        ("excel", lambda p, ctx: io_utils.df_to_excel_bytes(engine.finalize_output(ctx["df"]))),
+    ]
+
+
+def _bbva_stages():
+    def read_excel(p, ctx):
+        ctx["df_raw"] = io_utils.read_table(_read(p["excel"]), os.path.basename(p["excel"]))
+
+    def index(p, ctx):
+        ctx["index"] = build_id_index(ctx["df_raw"], engine.BBVA_ID_COLS)
+
+    def match(p, ctx):
+        match_id_rows(ctx["index"], ctx["docs"])
+
+    return [
+        ("pdf_ids", lambda p, ctx: ctx.__setitem__("docs", set(engine.findall_pdf(_read(p["pdf"]), engine.RE_DOC_ID)))),
+        ("leer_excel", read_excel),
+        ("indice_ids", index),
+        ("cruce", match),
+        ("flujo", lambda p, ctx: engine.process_bbva(_read(p["pdf"]), _read(p["excel"]), os.path.basename(p["excel"]))),
+    ]
+
+
+def _with_txt(paths: dict, fn):
+    with open(paths["txt"], "rb") as f:
+        return fn(f)
+
+
+STAGES = {"bcp": _bcp_stages, "sco": _sco_stages, "ibk": _ibk_stages, "bbva": _bbva_stages}
+
+
+# -------------- Ejecución y resultados --------------
+def git_label() -> str:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=HERE, capture_output=True, text=True).stdout.strip()
+        return (rev or "sin-git") + ("-dirty" if dirty else "")
+    except OSError:
+        return "sin-git"
+
+
+def run(flow: str, rows: int, data_dir: str, repeat: int) -> list:
+    paths = write_inputs(flow, rows, data_dir)
+    out, ctx = [], {}
+    for stage, fn in STAGES[flow]():
+        best = float("inf")
+        for _ in range(repeat):
+            _clear_caches()
+            t = time.perf_counter()
+            fn(paths, ctx)
+            best = min(best, time.perf_counter() - t)
+        out.append({"flow": flow, "rows": rows, "stage": stage, "seconds": round(best, 4)})
+        print(f"  {flow:<5} {rows:>9} {stage:<20} {best:>9.3f}s", flush=True)
+    return out
+
+
+def load_results(label: str) -> dict:
+    """Última medición de cada (flujo, filas, etapa) con esa etiqueta."""
+    found = {}
+    if not os.path.exists(RESULTS): return found
+    with open(RESULTS, encoding="utf-8") as f:
+        for line in f:
+            r = json.loads(line)
+            if r["label"] == label:
+                found[(r["flow"], r["rows"], r["stage"])] = r["seconds"]
+    return found
+
+
+def compare(current: list, baseline_label: str):
+    base = load_results(baseline_label)
+    if not base:
+        print(f"\nNo hay resultados con la etiqueta {baseline_label!r} en {RESULTS}")
+        return
+    print(f"\n{'flujo':<5} {'filas':>9} {'etapa':<20} {'actual':>9} {baseline_label:>12} {'x':>7}")
+    for r in current:
+        old = base.get((r["flow"], r["rows"], r["stage"]))
+        ratio = f"{old / r['seconds']:.2f}" if old and r["seconds"] else "-"
+        old_s = f"{old:.3f}s" if old is not None else "-"
+        print(f"{r['flow']:<5} {r['rows']:>9} {r['stage']:<20} {r['seconds']:>8.3f}s {old_s:>12} {ratio:>7}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--flows", nargs="+", default=list(GENERATORS), choices=list(GENERATORS))
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000])
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--data", default=os.path.join(HERE, "data"), help="Carpeta de archivos generados (se reutilizan)")
+    ap.add_argument("--label", default=None, help="Etiqueta de la corrida (por defecto el commit)")
+    ap.add_argument("--compare", default=None, help="Etiqueta contra la que comparar")
+    ap.add_argument("--no-save", action="store_true")
+    args = ap.parse_args()
+    pdf_utils.use_processes()  # mismas condiciones que la CLI
+
+    label = args.label or git_label()
+    print(f"Etiqueta: {label}  cpu_count={os.cpu_count()}")
+    current = []
+    for rows in args.sizes:
+        for flow in args.flows:
+            current.extend(run(flow, rows, args.data, args.repeat))
+
+    if not args.no_save:
+        ts = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with open(RESULTS, "a", encoding="utf-8") as f:
+            for r in current:
+                f.write(json.dumps({"label": label, "ts": ts, **r}) + "\n")
+    if args.compare: compare(current, args.compare)
+
+
+if __name__ == "__main__":
+    main()
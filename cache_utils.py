@@ -0,0 +1,84 @@
+"""Caché LRU en memoria del proceso, acotada por entradas y por bytes.
+
+Streamlit vuelve a ejecutar Main.py en cada interacción, así que cualquier caché
+definida ahí se pierde; los módulos importados sí sobreviven entre reruns y sesiones.
+"""
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+
+def content_key(data: bytes, *extra) -> str:
+    """Hash del contenido (más opciones de lectura, si las hay) para usar como llave."""
+    h = hashlib.blake2b(data, digest_size=16)
+    for e in extra:
+        h.update(repr(e).encode())
+    return h.hexdigest()
+
+
+def file_key(fobj, *extra, chunk_size: int = 1 << 20) -> str:
+    """content_key de un archivo binario con seek() (TXT subidos), leído por bloques sin cargarlo entero."""
+    h = hashlib.blake2b(digest_size=16)
+    fobj.seek(0)
+    while chunk := fobj.read(chunk_size):
+        h.update(chunk)
+    fobj.seek(0)
+    for e in extra:
+        h.update(repr(e).encode())
+    return h.hexdigest()
+
+
+class LRUCache:
+    """LRU thread-safe con contabilidad de bytes por entrada y contadores de aciertos."""
+
+    def __init__(self, max_entries: int = 32, max_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (value, nbytes)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value, nbytes: int = None):
+        nbytes = sys.getsizeof(value) if nbytes is None else nbytes
+        if nbytes > self.max_bytes: return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None: self.bytes -= old[1]
+            self._data[key] = (value, nbytes)
+            self.bytes += nbytes
+            while self._data and (len(self._data) > self.max_entries or self.bytes > self.max_bytes):
+                _, (_, freed) = self._data.popitem(last=False)
+                self.bytes -= freed
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._data),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "entry_bytes": {k: n for k, (_, n) in self._data.items()},
+            }
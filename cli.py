@@ -0,0 +1,97 @@
+"""Procesamiento de rechazos por línea de comandos (sin Streamlit).
+
+Ejemplos:
+    python cli.py pre-bcp-txt --pdf rechazos.pdf --txt masivo.txt -o pre_bcp_txt.xlsx
+    python cli.py bbva --pdf dnis.pdf --excel masivo.xlsx --code R001 --submit
+    python cli.py sco --pdf detalle.pdf --txt masivo.txt --xls errores.xls
+
+Con --submit se omiten las referencias que ya figuran como enviadas en el registro local
+(ledger.py); --resend las envía igual.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from api_client import POST_BATCH_ROWS, post_in_batches
+from batch import FLOW_BANK, FLOW_ROLES, process_files
+from engine import CODE_DESC, ENDPOINT, SUBSET_COLS, EngineError, NoRecords, finalize_output
+from io_utils import EXPORT_FORMATS, export_format
+from ledger import SubmissionInProgress, SubmissionLedger
+from pdf_utils import use_processes
+
+# flujo -> archivo de salida por defecto (los archivos requeridos están en batch.FLOW_ROLES)
+DEFAULT_OUT = {
+    "pre-bcp-xlsx": "pre_bcp_xlsx.xlsx",
+    "pre-bcp-txt": "pre_bcp_txt.xlsx",
+    "bcp": "rechazo_bcp_prueba.xlsx",
+    "ibk": "rechazo_ibk.xlsx",
+    "bbva": "rechazos_bbva.xlsx",
+    "sco": "rechazos_sco.xlsx",
+    "total": "rechazo_total_inoperativo.xlsx",
+}
+FLOWS = {flow: (FLOW_ROLES[flow], out) for flow, out in DEFAULT_OUT.items()}
+
+
+def run_flow(flow: str, files: dict, code: str = None) -> tuple:
+    """Ejecuta un flujo con rutas de archivo; devuelve (df OUT_COLS, info extra para el resumen)."""
+    df, default, info = process_files(flow, {k: (Path(p).name, Path(p)) for k, p in files.items()})
+    return finalize_output(df, code or default), info
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="Rechazos masivos sin interfaz: genera el Excel OUT_COLS y opcionalmente lo envía.")
+    sub = ap.add_subparsers(dest="flow", required=True)
+    for flow, (inputs, default_out) in FLOWS.items():
+        p = sub.add_parser(flow)
+        for k in inputs:
+            p.add_argument(f"--{k}", required=True)
+        p.add_argument("--code", choices=sorted(CODE_DESC), help="Código de rechazo por defecto (si el banco no lo da por fila)")
+        p.add_argument("-o", "--out", default=default_out, help="Salida .xlsx, .parquet o .arrow (según la extensión)")
+        p.add_argument("--submit", action="store_true", help="Enviar al endpoint por lotes")
+        p.add_argument("--resend", action="store_true", help="Con --submit, enviar también referencias ya enviadas")
+        p.add_argument("--endpoint", default=ENDPOINT)
+        p.add_argument("--batch-rows", type=int, default=POST_BATCH_ROWS)
+        p.add_argument("--retry-unsafe", action="store_true",
+                       help="Reintentar también 500/502/504 y timeouts de lectura (el endpoint puede recibir el lote dos veces)")
+    return ap
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    use_processes()  # fuera de Streamlit: PDFs grandes por procesos (fork)
+    inputs, _ = FLOWS[args.flow]
+    try:
+        df, info = run_flow(args.flow, {k: getattr(args, k) for k in inputs}, args.code)
+    except NoRecords as e:
+        print(f"Sin registros: {e}", file=sys.stderr)
+        return 0
+    except EngineError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    if info: print(" | ".join(f"{k}: {v}" for k, v in info.items()))
+    Path(args.out).write_bytes(EXPORT_FORMATS[export_format(args.out)][0](df))
+    print(f"{args.out}: {len(df)} transacciones, importe total {df['importe'].sum():,.2f}")
+
+    if args.submit and len(df):
+        payload, ledger = df[SUBSET_COLS], SubmissionLedger()
+        dup = ledger.submitted(payload["Referencia"])
+        if dup.any():
+            print(f"{int(dup.sum())} referencias ya enviadas" + ("; se reenvían" if args.resend else "; se omiten"))
+            if not args.resend: payload = payload[~dup]
+        if payload.empty: return 0
+        try:
+            ledger.reserve(payload, FLOW_BANK[args.flow], resend=args.resend)
+        except SubmissionInProgress as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        report = post_in_batches(payload, args.endpoint, batch_rows=args.batch_rows, retry_unsafe=args.retry_unsafe)
+        ledger.record_batches(payload, report, FLOW_BANK[args.flow])
+        for r in report:
+            print(f"lote {r['lote']} filas {r['desde']}-{r['hasta']}: {r['status']} ({r['intentos']} intentos) {r['respuesta'][:120]}")
+        if not all(r["ok"] for r in report): return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""Modo daemon: vigila una carpeta compartida y procesa los archivos de respuesta de los bancos.
+
+Estructura esperada (una subcarpeta por banco; los archivos de un mismo job comparten nombre base):
+
+    entrada/BCP/lote_0412.pdf + lote_0412.txt      -> pre-bcp-txt
+    entrada/BCP/lote_0412.pdf + lote_0412.xlsx     -> pre-bcp-xlsx
+    entrada/BCP/observados.xlsx                    -> bcp
+    entrada/IBK/rechazos.zip                       -> ibk
+    entrada/BBVA/dnis.pdf + dnis.xlsx              -> bbva
+    entrada/SCO/orden.pdf + orden.txt + orden.xls  -> sco
+    entrada/TOTAL/masivo.xlsx                      -> total
+
+Cada job pasa por el mismo motor que la pestaña correspondiente (cli.run_flow) en un pool de
+procesos y deja en la carpeta de salida el Excel OUT_COLS, el mismo resultado en Parquet y un
+resumen.json en salida/<banco>_<nombre>_<huella>/: la huella del contenido evita que una
+entrega con el mismo nombre (el rechazos.zip de cada día) pise la anterior. Los archivos ya
+procesados se recuerdan por hash de contenido en un registro persistente, así que no se vuelven
+a procesar aunque el daemon se reinicie (ni aunque se copien con otro nombre).
+
+Uso: python daemon.py entrada/ salida/ --workers 4
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from batch import init_worker
+from cache_utils import content_key
+from pdf_utils import mp_context, use_processes
+
+DAEMON_POLL_SECONDS = 5.0
+DAEMON_SETTLE_SECONDS = 10.0  # un job se toma cuando sus archivos no cambian durante este tiempo
+DAEMON_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+DAEMON_MAX_PENDING_PER_WORKER = 2  # backpressure: jobs en cola por worker antes de dejar de tomar más
+STATE_FILE = ".rechazos_procesados.jsonl"
+
+# rol de cada extensión; en SCO el Excel es el "XLS de errores"
+ROLE_BY_EXT = {".pdf": "pdf", ".txt": "txt", ".zip": "zip", ".xlsx": "excel", ".xls": "excel", ".csv": "excel",
+               ".parquet": "excel", ".arrow": "excel", ".feather": "excel"}
+
+# banco -> [(flujo, roles requeridos)], del más específico al más general
+BANK_FLOWS = {
+    "BCP": [("pre-bcp-txt", {"pdf", "txt"}), ("pre-bcp-xlsx", {"pdf", "excel"}), ("bcp", {"excel"})],
+    "IBK": [("ibk", {"zip"})],
+    "BBVA": [("bbva", {"pdf", "excel"})],
+    "SCO": [("sco", {"pdf", "txt", "xls"})],
+    "TOTAL": [("total", {"excel"})],
+}
+
+
+def _role(bank: str, path: Path) -> str:
+    role = ROLE_BY_EXT.get(path.suffix.lower())
+    return "xls" if bank == "SCO" and role == "excel" else role
+
+
+def match_flow(bank: str, roles: set) -> str:
+    """Flujo cuyos roles coinciden exactamente con los archivos del grupo (None si aún falta alguno)."""
+    for flow, needed in BANK_FLOWS.get(bank, []):
+        if roles == needed: return flow
+    return None
+
+
+# -------------- Registro persistente --------------
+class ProcessedLedger:
+    """
+    Registro append-only (JSON lines) de archivos tomados, por banco y hash de contenido.
+    Un archivo se marca al tomarse el job (antes de procesarlo): si el daemon cae a mitad
+    de un job, al reiniciar ese archivo figura como interrumpido y no se reprocesa solo.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.status = {}  # llave -> último estado
+        self.jobs = {}  # llave -> job que la tomó
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try: rec = json.loads(line)
+                    except ValueError: continue  # última línea truncada por una caída
+                    for k in rec["keys"]: self.status[k], self.jobs[k] = rec["estado"], rec["job"]
+
+    def seen(self, key: str) -> bool:
+        return key in self.status
+
+    def interrupted(self) -> list:
+        return sorted({self.jobs[k] for k, st in self.status.items() if st == "en_curso"})
+
+    def record(self, keys: list, job: str, estado: str, **extra):
+        rec = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "job": job, "estado": estado, "keys": keys, **extra}
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            for k in keys: self.status[k], self.jobs[k] = estado, job
+
+
+# -------------- Descubrimiento de jobs --------------
+_key_cache = {}  # (ruta, tamaño, mtime) -> hash; evita re-hashear archivos grandes en cada sondeo
+
+
+def file_key(path: Path, stat) -> str:
+    sig = (str(path), stat.st_size, stat.st_mtime_ns)
+    key = _key_cache.get(sig)
+    if key is None:
+        key = content_key(path.read_bytes())
+        _key_cache[sig] = key
+    return key
+
+
+def _group_flow(bank: str, members: list) -> str:
+    roles = [r for r, _ in members]
+    return match_flow(bank, set(roles)) if len(roles) == len(set(roles)) else None
+
+
+def discover_jobs(watch_dir: Path, ledger: ProcessedLedger, busy: set, settle: float,
+                  warned: set = None, log=None) -> list:
+    """
+    Grupos listos: archivos estables cuyo conjunto de roles forma un flujo. El job se arma con
+    los archivos no vistos del nombre base; si solos no forman un flujo (ej. llega solo un XLS
+    SCO nuevo), con todo el grupo. Un grupo con archivos nuevos que no forma ningún flujo se
+    avisa una vez por `log` (queda en la carpeta hasta que un operador lo complete o lo mueva).
+    """
+    now = time.time()
+    jobs = []
+    for bank in BANK_FLOWS:
+        folder = watch_dir / bank
+        if not folder.is_dir(): continue
+        groups = {}
+        for p in folder.iterdir():
+            if not p.is_file() or p.name.startswith("."): continue
+            role = _role(bank, p)
+            if role: groups.setdefault(p.stem, []).append((role, p))
+        for stem, members in sorted(groups.items()):
+            stats = [p.stat() for _, p in members]
+            if now - max(s.st_mtime for s in stats) < settle: continue  # aún se está copiando
+            # El mismo archivo dejado en otro banco es otro proceso: la llave lleva el banco
+            keys = [f"{bank}:{file_key(p, s)}" for (_, p), s in zip(members, stats)]
+            fresh = [(m, k) for m, k in zip(members, keys) if not ledger.seen(k)]
+            if not fresh: continue
+            group = [m for m, _ in fresh]
+            flow = _group_flow(bank, group)
+            if flow is None:
+                group = members
+                flow = _group_flow(bank, group)
+            if flow is None:
+                sig = tuple(sorted(k for _, k in fresh))
+                if warned is not None and sig not in warned:
+                    warned.add(sig)
+                    if log: log(f"[sin_flujo] {bank}/{stem}: {', '.join(sorted(p.name for _, p in members))} "
+                                "no forman un flujo; se ignoran hasta completarlos")
+                continue
+            job_keys = [k for (m, k) in zip(members, keys) if m in group]
+            # Un nombre que se repite (rechazos.zip de cada día) no pisa la salida anterior:
+            # el job lleva la huella de su contenido
+            name = f"{bank}_{stem}_{content_key(' '.join(sorted(job_keys)).encode())[:10]}"
+            if name in busy: continue
+            jobs.append({"name": name, "bank": bank, "flow": flow, "keys": job_keys,
+                         "files": {r: str(p) for r, p in group}})
+    return jobs
+
+
+# -------------- Ejecución --------------
+def _write_atomic(path: Path, data: bytes):
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def run_job(job: dict, out_dir: str, submit: bool = False, endpoint: str = None) -> dict:
+    """
+    Se ejecuta en un worker: motor -> Excel y Parquet OUT_COLS + resumen.json en
+    out_dir/<banco>_<nombre>_<huella>/ (la huella del contenido separa entregas con el mismo nombre).
+    """
+    from api_client import post_in_batches
+    from batch import FLOW_BANK
+    from cli import run_flow
+    from engine import ENDPOINT, SUBSET_COLS, EngineError, NoRecords
+    from io_utils import df_to_excel_bytes, df_to_parquet_bytes
+    from ledger import SubmissionLedger
+
+    t = time.perf_counter()
+    dest = Path(out_dir) / job["name"]
+    dest.mkdir(parents=True, exist_ok=True)
+    summary = {"job": job["name"], "flujo": job["flow"], "archivos": job["files"]}
+    try:
+        df, info = run_flow(job["flow"], job["files"])
+        _write_atomic(dest / "rechazos.xlsx", df_to_excel_bytes(df))
+        _write_atomic(dest / "rechazos.parquet", df_to_parquet_bytes(df))  # para conciliaciones sin parsear XLSX
+        summary.update(estado="ok", transacciones=len(df), importe_total=round(float(df["importe"].sum()), 2), **info)
+        if submit and len(df):
+            # Lo que ya figura como enviado en el registro (otro job, la UI o la CLI) no se reenvía
+            payload, ledger = df[SUBSET_COLS], SubmissionLedger()
+            dup = ledger.submitted(payload["Referencia"])
+            payload = payload[~dup]
+            summary["ya_enviadas"] = int(dup.sum())
+            if len(payload): ledger.reserve(payload, FLOW_BANK[job["flow"]])  # SubmissionInProgress -> estado error
+            report = post_in_batches(payload, endpoint or ENDPOINT) if len(payload) else []
+            ledger.record_batches(payload, report, FLOW_BANK[job["flow"]])
+            summary["envio"] = report
+            if not all(r["ok"] for r in report): summary["estado"] = "envio_fallido"
+    except NoRecords as e:
+        summary.update(estado="sin_registros", mensaje=str(e), transacciones=0)
+    except EngineError as e:
+        summary.update(estado="error", mensaje=str(e))
+    except Exception as e:  # archivo corrupto, formato inesperado, etc.: se registra y el daemon sigue
+        summary.update(estado="error", mensaje=f"{type(e).__name__}: {e}")
+    summary["segundos"] = round(time.perf_counter() - t, 2)
+    _write_atomic(dest / "resumen.json", json.dumps(summary, ensure_ascii=False, indent=2, default=str).encode("utf-8"))
+    return summary
+
+
+def serve(watch_dir, out_dir, workers: int = DAEMON_WORKERS, max_pending: int = None,
+          poll: float = DAEMON_POLL_SECONDS, settle: float = DAEMON_SETTLE_SECONDS,
+          state_file=None, submit: bool = False, endpoint: str = None, once: bool = False, log=None):
+    """
+    Bucle principal. Con `once` procesa lo que haya listo y termina (útil para cron / pruebas).
+    Backpressure: como máximo `max_pending` jobs en vuelo; mientras el pool esté lleno no se
+    toman jobs nuevos (los archivos siguen en la carpeta hasta que haya capacidad).
+    """
+    log = log or (lambda msg: print(msg, flush=True))
+    watch_dir, out_dir = Path(watch_dir), Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    max_pending = max_pending or workers * DAEMON_MAX_PENDING_PER_WORKER
+    ledger = ProcessedLedger(state_file or watch_dir / STATE_FILE)
+    for name in ledger.interrupted():
+        log(f"[aviso] {name} quedó en curso en una ejecución anterior; no se reprocesa")
+
+    in_flight = {}  # future -> job
+    warned = set()  # grupos sin flujo ya avisados
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context(), initializer=init_worker) as pool:
+        while True:
+            busy = {j["name"] for j in in_flight.values()}
+            for job in discover_jobs(watch_dir, ledger, busy, settle, warned, log):
+                if len(in_flight) >= max_pending: break
+                ledger.record(job["keys"], job["name"], "en_curso", flujo=job["flow"])
+                in_flight[pool.submit(run_job, job, str(out_dir), submit, endpoint)] = job
+                log(f"[tomado] {job['name']} ({job['flow']})")
+
+            if once and not in_flight: break
+            if in_flight:
+                done, _ = wait(list(in_flight), timeout=None if once else poll, return_when=FIRST_COMPLETED)
+            else:
+                done = ()
+                time.sleep(poll)
+            for fut in done:
+                job = in_flight.pop(fut)
+                try: summary = fut.result()
+                except Exception as e:  # el worker murió (memoria, señal)
+                    summary = {"estado": "error", "mensaje": f"{type(e).__name__}: {e}"}
+                ledger.record(job["keys"], job["name"], summary["estado"])
+                log(f"[{summary['estado']}] {job['name']}: {summary.get('transacciones', '-')} transacciones")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Vigila una carpeta y procesa los archivos de rechazo por banco.")
+    ap.add_argument("watch_dir")
+    ap.add_argument("out_dir")
+    ap.add_argument("--workers", type=int, default=DAEMON_WORKERS)
+    ap.add_argument("--max-pending", type=int, default=None, help="Jobs en vuelo como máximo (por defecto 2 por worker)")
+    ap.add_argument("--poll", type=float, default=DAEMON_POLL_SECONDS)
+    ap.add_argument("--settle", type=float, default=DAEMON_SETTLE_SECONDS)
+    ap.add_argument("--state", default=None, help=f"Registro de procesados (por defecto <watch_dir>/{STATE_FILE})")
+    ap.add_argument("--submit", action="store_true")
+    ap.add_argument("--endpoint", default=None)
+    ap.add_argument("--once", action="store_true", help="Procesar lo pendiente y salir")
+    args = ap.parse_args(argv)
+    use_processes()  # proceso propio, fuera de Streamlit: el pool de jobs puede usar fork
+    try:
+        serve(args.watch_dir, args.out_dir, args.workers, args.max_pending, args.poll, args.settle,
+              args.state, args.submit, args.endpoint, args.once)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
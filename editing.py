@@ -0,0 +1,189 @@
+"""Edición paginada de la tabla de rechazos (sin Streamlit).
+
+Con 100k+ filas el data_editor no puede recibir la tabla completa: se filtra del lado del
+servidor (motivo, DNI, referencia), se envía solo la página visible y los cambios quedan como
+deltas (celdas editadas, filas borradas y añadidas) sobre la tabla base, que no se copia. La
+tabla final se arma recién cuando hace falta (Excel, envío); los totales salen de la base
+más los deltas.
+
+La página se entrega al editor con un RangeIndex (posición 0..n-1) y las etiquetas reales se
+guardan aparte; las filas añadidas reciben etiquetas nuevas a partir de len(base), así nunca
+chocan con filas de otras páginas.
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+EDITOR_PAGE_ROWS = 1_000
+EDITOR_PAGE_OPTIONS = [100, 500, 1_000, 5_000]
+EDITOR_FULL_MAX_ROWS = 5_000  # hasta este tamaño la tabla se edita completa, sin paginar
+
+MOTIVO_COL = "Motivo de Rechazo"
+DNI_COL = "dni/cex"
+REF_COL = "Referencia"
+AMOUNT_COL = "importe"
+
+
+def filter_labels(df: pd.DataFrame, motivos=None, dni: str = "", ref: str = "") -> np.ndarray:
+    """Etiquetas de las filas que cumplen los filtros (vacíos = sin filtro), en el orden de df."""
+    mask = np.ones(len(df), dtype=bool)
+    if motivos and MOTIVO_COL in df.columns:
+        mask &= df[MOTIVO_COL].isin(motivos).to_numpy()
+    for col, text in ((DNI_COL, dni), (REF_COL, ref)):
+        text = (text or "").strip()
+        if text and col in df.columns:
+            mask &= df[col].astype(str).str.contains(text, regex=False, na=False).to_numpy()
+    return df.index.to_numpy()[mask]
+
+
+def page_count(n_rows: int, page_rows: int) -> int:
+    return max(1, -(-n_rows // page_rows))
+
+
+def _same(a, b) -> bool:
+    if pd.isna(a) and pd.isna(b): return True
+    return a == b
+
+
+def _num(v) -> float:
+    return 0.0 if pd.isna(v) else float(v)
+
+
+class EditDeltas:
+    """
+    Cambios del editor sobre una tabla base inmutable (etiquetas 0..n-1).
+    Solo se guardan las celdas que difieren de la base, las etiquetas borradas y las filas
+    añadidas; la memoria y el costo por rerun dependen de la cantidad de cambios.
+    Cada página editada produce una instancia nueva (with_page) sin tocar la anterior.
+    """
+
+    def __init__(self, base: pd.DataFrame):
+        self.base = base
+        self.cells = {}  # etiqueta base -> {columna: valor}
+        self.deleted = set()  # etiquetas base borradas
+        self.added = {}  # etiqueta nueva -> {columna: valor}
+        self.next_label = len(base)
+        self._base_sum = float(base[AMOUNT_COL].sum()) if AMOUNT_COL in base.columns else 0.0
+
+    def _copy(self) -> "EditDeltas":
+        new = object.__new__(EditDeltas)
+        new.base, new._base_sum, new.next_label = self.base, self._base_sum, self.next_label
+        new.cells = {k: dict(v) for k, v in self.cells.items()}
+        new.deleted = set(self.deleted)
+        new.added = {k: dict(v) for k, v in self.added.items()}
+        return new
+
+    # -------------- Lectura --------------
+    def labels(self) -> np.ndarray:
+        """Etiquetas vigentes: base sin las borradas + añadidas, en orden."""
+        base = self.base.index.to_numpy()
+        if self.deleted: base = base[~np.isin(base, list(self.deleted))]
+        return np.concatenate([base, np.fromiter(self.added, dtype=base.dtype, count=len(self.added))])
+
+    def __len__(self) -> int:
+        return len(self.base) - len(self.deleted) + len(self.added)
+
+    def total(self) -> float:
+        """Suma de importes vigente, sin armar la tabla: base + diferencias de los deltas."""
+        if AMOUNT_COL not in self.base.columns: return 0.0
+        amounts = self.base[AMOUNT_COL]
+        total = self._base_sum - sum(_num(amounts.at[k]) for k in self.deleted)
+        for k, row in self.cells.items():
+            if AMOUNT_COL in row: total += _num(row[AMOUNT_COL]) - _num(amounts.at[k])
+        return total + sum(_num(row.get(AMOUNT_COL)) for row in self.added.values())
+
+    def _added_frame(self, labels) -> pd.DataFrame:
+        df = pd.DataFrame([self.added[k] for k in labels], index=pd.Index(labels, dtype="int64"), columns=self.base.columns)
+        return df.astype(self.base.dtypes.to_dict(), errors="ignore")
+
+    def _overlay(self, df: pd.DataFrame, cols=None) -> pd.DataFrame:
+        """Aplica las celdas editadas que caen en df (una asignación por columna)."""
+        by_col = {}
+        for k, row in self.cells.items():
+            if k not in df.index: continue
+            for col, v in row.items():
+                if cols is not None and col not in cols: continue
+                ks, vs = by_col.setdefault(col, ([], []))
+                ks.append(k)
+                vs.append(v)
+        for col, (ks, vs) in by_col.items():
+            df.loc[ks, col] = vs
+        return df
+
+    def frame(self, labels=None, cols=None) -> pd.DataFrame:
+        """Tabla vigente (o solo esas etiquetas / columnas) con los deltas aplicados."""
+        labels = self.labels() if labels is None else np.asarray(labels)
+        cols = list(self.base.columns) if cols is None else list(cols)
+        is_new = labels >= len(self.base)
+        parts = [self.base.loc[labels[~is_new], cols]]
+        if is_new.any(): parts.append(self._added_frame(labels[is_new].tolist())[cols])
+        df = pd.concat(parts).loc[labels] if len(parts) > 1 else parts[0].copy()
+        return self._overlay(df, cols)
+
+    def page(self, labels: np.ndarray) -> pd.DataFrame:
+        """Página para el editor, con RangeIndex."""
+        return self.frame(labels).reset_index(drop=True)
+
+    # -------------- Escritura --------------
+    def with_page(self, labels: np.ndarray, state: dict, edited: pd.DataFrame) -> "EditDeltas":
+        """
+        Deltas resultantes de editar la página `labels`. `state` es el estado del data_editor
+        (posiciones de edited_rows / deleted_rows / added_rows) y `edited` la página que devolvió,
+        de donde se toman los valores ya convertidos al tipo de cada columna.
+        """
+        state = state or {}
+        if not (state.get("edited_rows") or state.get("deleted_rows") or state.get("added_rows")): return self
+        new = self._copy()
+        deleted = {int(pos) for pos in state.get("deleted_rows") or []}
+        for pos, changes in (state.get("edited_rows") or {}).items():
+            pos = int(pos)
+            if pos in deleted: continue  # editada y luego borrada
+            k = int(labels[pos])
+            if k in new.added:
+                new.added[k].update({c: edited.at[pos, c] for c in changes})
+                continue
+            row = new.cells.setdefault(k, {})
+            for c in changes:
+                v = edited.at[pos, c]
+                if _same(v, self.base.at[k, c]): row.pop(c, None)
+                else: row[c] = v
+            if not row: del new.cells[k]
+        for pos in sorted(deleted):
+            k = int(labels[pos])
+            if new.added.pop(k, None) is None:
+                new.deleted.add(k)
+                new.cells.pop(k, None)
+        # Las añadidas van al final de `edited`; su índice no sirve para reconocerlas: si se
+        # borraron las últimas filas, el RangeIndex se acorta y las nuevas reusan esas posiciones
+        n_added = len(state.get("added_rows") or [])
+        if n_added:
+            for _, row in edited.iloc[-n_added:].iterrows():
+                new.added[new.next_label] = row.to_dict()
+                new.next_label += 1
+        return new
+
+    # -------------- Auditoría --------------
+    def audit(self) -> pd.DataFrame:
+        """Cambios vigentes respecto de la base: acción, fila, DNI/referencia, columna, antes, después."""
+        def ident(row):
+            return {DNI_COL: row.get(DNI_COL), REF_COL: row.get(REF_COL)}
+
+        recs = []
+        for k, row in sorted(self.cells.items()):
+            base_row = self.base.loc[k]
+            for col, v in row.items():
+                recs.append({"accion": "editada", "fila": k, **ident(base_row), "columna": col, "antes": base_row[col], "despues": v})
+        for k in sorted(self.deleted):
+            recs.append({"accion": "borrada", "fila": k, **ident(self.base.loc[k]), "columna": None, "antes": None, "despues": None})
+        for k, row in self.added.items():
+            recs.append({"accion": "añadida", "fila": k, **ident(row), "columna": None, "antes": None, "despues": None})
+        cols = ["accion", "fila", DNI_COL, REF_COL, "columna", "antes", "despues"]
+        return pd.DataFrame(recs, columns=cols).astype({"antes": str, "despues": str})
+
+    def fingerprint(self) -> str:
+        """Huella de los deltas (para cachear el Excel junto con la huella de la base)."""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(repr((sorted((k, sorted(r.items(), key=str)) for k, r in self.cells.items()),
+                       sorted(self.deleted), sorted((k, sorted(r.items(), key=str)) for k, r in self.added.items()))).encode())
+        return h.hexdigest()
@@ -0,0 +1,750 @@
+"""Motor de rechazos sin interfaz: parseo, cruce y mapeo de códigos por banco.
+
+Main.py (Streamlit) y cli.py usan las mismas funciones; aquí no hay llamadas a st.*.
+"""
+import io
+import itertools
+import re
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from cache_utils import LRUCache, content_key, file_key
+from io_utils import read_table, read_table_file
+from matching import build_id_index, match_id_rows
+from rules import Rule, RuleMatcher
+import pdf_utils
+from pdf_utils import SCAN_FIRST, extract_pdf_pages, findall_pdf, mp_context, scan_pdf
+from timing import stage
+
+# -------------- Configuración --------------
+ENDPOINT = "https://q6caqnpy09.execute-api.us-east-1.amazonaws.com/OPS/kpayout/v1/payout_process/reject_invoices_batch"
+
+TXT_POS = {
+    "dni": (25, 33),
+    "nombre": (40, 85),
+    "referencia": (115, 126),
+    "importe": (186, 195),
+}
+
+ESTADO = "rechazada"
+MULT = 2
+TXT_CHUNK_ROWS = 50_000  # registros por bloque al leer TXT masivos
+TXT_READ_CHARS = 1 << 20  # caracteres por lectura al recorrer un TXT
+
+# Tipos globales
+CODE_DESC = {
+    "R001": "DOCUMENTO ERRADO",
+    "R002": "CUENTA INVALIDA",
+    "R007": "RECHAZO POR CCI",
+    "R016": "CLIENTE NO TITULAR DE LA CUENTA",
+    "R017": "CUENTA DE AFP / CTS",
+    "R020": "CUENTA BANCARIA INOPERATIVA",
+}
+
+SCO_TXT_POS = {
+    "dni": (2, 9),
+    "nombre": (14, 73),
+    "importe": (105, 115),
+    "referencia": (116, 127),
+}
+
+KEYWORDS_NO_TIT = [
+    "no es titular",
+    "beneficiario no",
+    "cliente no titular",
+    "no titular",
+    "continuar",
+    "puedes continuar",
+    "si deseas, puedes continuar",
+]
+
+# -------------- Reglas de códigos (rules.RuleMatcher) --------------
+# IBK: observación en minúsculas; cualquier palabra clave de no titular -> R016
+IBK_RULES = [Rule("R016", tuple(KEYWORDS_NO_TIT))]
+IBK_DEFAULT_CODE = "R002"
+IBK_PREAMBLE_ROWS = 11  # filas bajo el encabezado del Excel IBK que no son registros
+# Excels de un mismo ZIP leídos en procesos (openpyxl no suelta el GIL: los hilos no paralelizan).
+# Como la extracción de PDFs, solo con pdf_utils.PDF_WORKERS > 1 (CLI, daemon, benchmarks)
+IBK_MAX_WORKERS = 4
+IBK_PARALLEL_MIN_BYTES = 32 * 1024 * 1024  # total descomprimido; por debajo no compensa levantar procesos
+IBK_SPOOL_MAX_BYTES = 8 * 1024 * 1024  # miembros más grandes se descomprimen a disco, no a memoria
+
+# SCO: "Observación:" del XLS de errores, sin espacios alrededor y respetando mayúsculas
+SCO_RULES = [
+    Rule("R001", ("Verificar cuenta y/o documento",), priority=1),
+    Rule("R002", ("Cancelada", "Verificar cuenta."), priority=2, mode="exact"),
+    Rule("R017", ("Abono AFP",), priority=3),
+]
+SCO_DEFAULT_CODE = "R002"
+
+# BBVA: "Situación" del PDF normalizada con normalize_situacion (alias incluidos).
+# Prioridad R001 -> R007 -> R002; luego palabras sueltas DOC/DNI -> R001 y CUENTA -> R002
+BBVA_SITUACION_RULES = [
+    Rule("R001", ("DOC NO CORRESPONDE", "DOCUMENTO NO CORRESPONDE", "DOCUMENTO ERRADO",
+                  "DOC NO CORRESPONDE REVISAR", "DNI NO COINCIDE"), priority=1),
+    Rule("R007", ("REGISTRO CON ERRORES", "CUENTA NO ENCONTRADA", "RECHAZO POR CCI",
+                  "CCI INVALIDA", "CCI INCORRECTA"), priority=2),
+    Rule("R002", ("CUENTA INEXISTENTE", "CTA C/ERR NO IDENTIF", "CUENTA CANCELADA",
+                  "CUENTA NO EXISTE", "INEXISTENTE"), priority=3),
+    Rule("R001", ("DOC", "DNI"), priority=4),
+    Rule("R002", ("CUENTA",), priority=5),
+]
+BBVA_SITUACION_DEFAULT = "R002"
+
+OUT_COLS = [
+    "dni/cex",
+    "nombre",
+    "importe",
+    "Referencia",
+    "Estado",
+    "Codigo de Rechazo",
+    "Descripcion de Rechazo",
+]
+
+# Tipos de la salida (Parquet / Arrow los conservan): texto salvo el importe
+OUT_DTYPES = {c: ("float64" if c == "importe" else "str") for c in OUT_COLS}
+
+SUBSET_COLS = [
+    "Referencia",
+    "Estado",
+    "Codigo de Rechazo",
+    "Descripcion de Rechazo",
+]
+
+SOURCE_COL = "Archivo"  # archivo (o miembro del ZIP) del que sale cada fila; no va en OUT_COLS
+
+# Columnas del Excel masivo BBVA donde buscar los IDs del PDF (None = autodetectar)
+BBVA_ID_COLS = None
+
+# Patrones de PDF, precompilados para el escaneo página a página
+RE_REGISTRO = re.compile(r"Registro\s+(\d+)")
+RE_REGISTRO_TXT = re.compile(r"Registro\s+(\d{1,5})")
+RE_DOC_ID = re.compile(r"\b\d{6,}\b")
+RE_SCO_ORDEN = re.compile(r"Detalle de orden No\.?[\s\r\n]*(\d{4})", re.IGNORECASE)
+RE_SCO_TOTAL = re.compile(r"Total de la orden[\s\r\n:]*(.*)", re.IGNORECASE | re.DOTALL)
+# Equivale a upper() + reemplazar la Ο/Κ griegas antes de contar "O.K."
+RE_SCO_OK = re.compile(r"[OΟ]\.[KΚ]\.", re.IGNORECASE)
+RE_SITU_QUOTES = re.compile(r"[\u2018\u2019\u201C\u201D]")
+RE_SITU_PUNCT = re.compile(r"[\,\.\:\;\(\)\[\]\"]+")
+RE_SPACES = re.compile(r"\s+")
+# Números junto a cada "O.K.": DNI (8 dígitos), referencia (10+ dígitos) e importe con 2 decimales
+RE_SCO_NUM = re.compile(r"\d(?:[\d.,]*\d)?")
+RE_SCO_AMOUNT = re.compile(r"\d{1,3}(?:[.,]\d{3})*[.,]\d{2}|\d+[.,]\d{2}")
+SCO_DNI_LEN = 8
+SCO_REF_MIN_LEN = 10
+SCO_OK_CONTEXT = 200  # caracteres previos a cada "O.K." (desde el "O.K." anterior) donde buscar sus datos
+SCO_AUDIT_CACHE_MAX_ENTRIES = 8  # auditorías (PDF + TXT) recordadas entre reruns
+SCO_AUDIT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# -------------- Utilidades --------------
+def parse_amount(raw) -> float:
+    if pd.isna(raw) or raw is None: return 0.0
+    s = str(raw).strip()
+    # Mantiene solo números, comas, puntos y el signo negativo
+    s = re.sub(r"[^\d,.-]", "", s)
+    if not s: return 0.0
+    
+    last_comma = s.rfind(',')
+    last_dot = s.rfind('.')
+    
+    if last_comma > last_dot:
+        # La coma está al final: formato europeo (ej. 1.234,56 o 1234,56)
+        # Excepción: si hay exactamente 3 dígitos después de la coma y no hay punto (ej. 1,000)
+        if last_dot == -1 and len(s) - last_comma - 1 == 3:
+            s = s.replace(',', '') # Es un separador de miles
+        else:
+            s = s.replace('.', '').replace(',', '.')
+    else:
+        # El punto está al final: formato estándar/US (ej. 1,234.56 o 1234.56)
+        s = s.replace(',', '')
+        
+    try: return float(s)
+    except ValueError: return 0.0
+
+def _float_or_zero(s: str) -> float:
+    try: return float(s)
+    except ValueError: return 0.0
+
+def parse_amount_series(values) -> pd.Series:
+    """
+    Versión por columna de parse_amount: mismas reglas, pero aplicadas con operaciones
+    vectorizadas solo sobre los valores únicos (los importes se repiten mucho).
+    """
+    values = values if isinstance(values, pd.Series) else pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    if len(uniques) == 0:
+        return pd.Series(0.0, index=values.index, dtype="float64")
+
+    # dtype object: mismas reglas de `re` que parse_amount (\d Unicode, strip de Python)
+    s = pd.Series(uniques.astype(str), dtype=object).str.strip().str.replace(r"[^\d,.-]", "", regex=True)
+    last_comma = s.str.rfind(",")
+    last_dot = s.str.rfind(".")
+    europeo = last_comma > last_dot
+    miles = europeo & (last_dot == -1) & (s.str.len() - last_comma - 1 == 3)
+
+    sin_comas = s.str.replace(",", "", regex=False)
+    decimal_coma = s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    s = sin_comas.where(~europeo | miles, decimal_coma)
+
+    parsed = pd.to_numeric(s, errors="coerce").astype("float64")
+    # Lo que to_numeric no entiende (ej. dígitos no ASCII) pasa por float() como en parse_amount
+    retry = parsed.isna() & (s != "")
+    if retry.any():
+        parsed[retry] = s[retry].map(_float_or_zero)
+    parsed = parsed.fillna(0.0).to_numpy()
+    # factorize marca los nulos con -1 -> 0.0 como en parse_amount
+    out = parsed[codes]
+    out[codes == -1] = 0.0
+    return pd.Series(out, index=values.index, dtype="float64")
+
+def slice_fixed(line: str, start: int, end: int) -> str:
+    if not line: return ""
+    idx = max(0, start - 1)
+    return line[idx:end].strip() if idx < len(line) else ""
+
+def iter_txt_lines(txt_file, skip_blank: bool = False):
+    """
+    Recorre el TXT línea a línea sin decodificarlo ni partirlo completo en memoria.
+    Devuelve pares (nro_linea, linea) 1-based; con skip_blank las líneas en blanco
+    no se numeran (mismo criterio que la auditoría SCO).
+    Los cortes son los de str.splitlines (además de \n, \r y \r\n: \v, \f, \x1c-\x1e,
+    \x85, \u2028 y \u2029), así la numeración coincide con la del texto completo partido.
+    """
+    txt_file.seek(0)
+    # newline="": el texto llega sin traducir los fines de línea y splitlines corta cada bloque
+    reader = io.TextIOWrapper(txt_file, encoding="utf-8", errors="ignore", newline="")
+    try:
+        n, carry = 0, ""
+        while True:
+            chunk = reader.read(TXT_READ_CHARS)
+            text = carry + chunk
+            if not text: break
+            lines = text.splitlines()
+            # La última línea (o un "\r" de un "\r\n" partido) puede seguir en el próximo bloque
+            carry = text.splitlines(keepends=True)[-1] if chunk else ""
+            if chunk: lines.pop()
+            for line in lines:
+                if skip_blank and not line.strip(): continue
+                n += 1
+                yield n, line
+    finally:
+        # Evita que el wrapper cierre el archivo subido al liberarse
+        reader.detach()
+
+def count_txt_lines(txt_file, skip_blank: bool = True) -> int:
+    with stage("txt_conteo") as s:
+        s.rows = n = sum(1 for _ in iter_txt_lines(txt_file, skip_blank))
+    return n
+
+def iter_txt_records(txt_file, positions: dict, wanted: set = None, skip_blank: bool = False, chunk_rows: int = TXT_CHUNK_ROWS):
+    """
+    Lee el TXT en streaming y entrega bloques de registros posicionales (listas de dicts).
+    Cada registro trae "linea" y los campos de `positions` (TXT_POS / SCO_TXT_POS) como texto.
+    Si se indica `wanted`, solo se parsean esas líneas y la lectura se corta tras la última.
+    """
+    if wanted is not None and not wanted: return
+    last = max(wanted) if wanted is not None else None
+    chunk = []
+    for n, line in iter_txt_lines(txt_file, skip_blank):
+        if last is not None:
+            if n > last: break
+            if n not in wanted: continue
+        rec = {"linea": n}
+        for field, (start, end) in positions.items():
+            rec[field] = slice_fixed(line, start, end)
+        chunk.append(rec)
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk: yield chunk
+
+def read_txt_records(txt_file, positions: dict, wanted: set, skip_blank: bool = False) -> dict:
+    """Devuelve {nro_linea: registro} solo para las líneas pedidas."""
+    with stage("txt_lectura") as s:
+        records = {rec["linea"]: rec for chunk in iter_txt_records(txt_file, positions, wanted, skip_blank) for rec in chunk}
+        s.rows = len(records)
+    return records
+
+
+def read_txt_lines(txt_file, wanted: set, skip_blank: bool = False) -> tuple[np.ndarray, np.ndarray]:
+    """Números de línea pedidos (ordenados) y su texto, como arreglos paralelos para indexar."""
+    nums, lines = [], []
+    if wanted:
+        last = max(wanted)
+        for n, line in iter_txt_lines(txt_file, skip_blank):
+            if n > last: break
+            if n in wanted:
+                nums.append(n)
+                lines.append(line)
+    return np.array(nums, dtype="int64"), np.array(lines, dtype=object)
+
+def slice_fixed_series(lines: pd.Series, start: int, end: int) -> pd.Series:
+    """slice_fixed aplicado a toda una columna de líneas."""
+    return lines.str.slice(max(0, start - 1), end).str.strip()
+
+def parse_sco_importe(raw: str) -> float:
+    try: return float(raw) / 100.0
+    except ValueError: return 0.0
+
+def parse_sco_importe_series(values: pd.Series) -> pd.Series:
+    """Versión por columna de parse_sco_importe (importe en céntimos)."""
+    values = values.astype(object)
+    parsed = pd.to_numeric(values, errors="coerce").astype("float64")
+    # Lo que to_numeric no entiende pasa por float() como en parse_sco_importe
+    retry = parsed.isna()
+    if retry.any():
+        parsed[retry] = values[retry].map(_float_or_zero)
+    return parsed / 100.0
+
+def _line_numbers(values: pd.Series) -> pd.Series:
+    """int(float(v)) por columna; NaN donde la conversión falla (esas filas se omiten)."""
+    values = values.astype(object)
+    nums = pd.to_numeric(values, errors="coerce").astype("float64")
+    retry = nums.isna() & values.notna()
+    if retry.any():
+        # float() como en el flujo original; lo que no convierte vale 0 y queda fuera de rango
+        nums[retry] = values[retry].map(_float_or_zero)
+    return np.trunc(nums.where(np.isfinite(nums)))
+
+def normalize_situacion(s: str) -> str:
+    """Texto de 'Situación' BBVA en mayúsculas, sin puntuación ni confusiones OCR O/0, espacios colapsados."""
+    if not s: return ""
+    t = str(s).upper().strip()
+    t = t.replace("\ufffd", " ").replace("·", " ")
+    t = RE_SITU_QUOTES.sub('"', t)
+    # normalizaciones OCR comunes
+    t = t.replace(" O ", " 0 ").replace("O ", "0 ").replace(" O", " 0")
+    # signos de puntuación salvo barra y guion (que a veces separan campos)
+    t = RE_SITU_PUNCT.sub(" ", t)
+    return RE_SPACES.sub(" ", t).strip()
+
+IBK_MATCHER = RuleMatcher(IBK_RULES, IBK_DEFAULT_CODE)
+SCO_MATCHER = RuleMatcher(SCO_RULES, SCO_DEFAULT_CODE, normalize=str.strip)
+BBVA_SITUACION_MATCHER = RuleMatcher(BBVA_SITUACION_RULES, BBVA_SITUACION_DEFAULT, normalize=normalize_situacion)
+
+def map_sco_xls_error_to_code(observation: str) -> tuple[str, str]:
+    code = SCO_MATCHER.classify(str(observation))
+    return code, CODE_DESC[code]
+
+def map_sco_xls_error_series(observations: pd.Series) -> pd.Series:
+    """map_sco_xls_error_to_code por columna; las observaciones nulas quedan con el código por defecto."""
+    obs = observations.astype(object).where(observations.notna(), "")
+    return SCO_MATCHER.classify_series(obs)
+
+def map_situacion_to_code_bbva(situacion: str) -> tuple[str, str]:
+    """'Situación' del PDF BBVA -> (código, descripción)."""
+    code = BBVA_SITUACION_MATCHER.classify(situacion)
+    return code, CODE_DESC[code]
+
+def default_code_bbva(excel_name: str) -> str:
+    """Los masivos BBVA de 'OTROS' bancos se rechazan por CCI; el resto por documento."""
+    return "R007" if "OTROS" in excel_name.upper() else "R001"
+
+# Código por defecto de cada flujo (el mismo que preselecciona la UI)
+DEFAULT_CODES = {
+    "pre_bcp_xlsx": "R002",
+    "pre_bcp_txt": "R002",
+    "bcp": "R001",
+    "bbva": "R001",
+    "total": "R020",
+}
+
+class EngineError(ValueError):
+    """Entrada inválida para el flujo (formato o columnas inesperadas)."""
+
+class NoRecords(EngineError):
+    """La entrada es válida pero no hay registros que rechazar."""
+
+BASE_COLS = ["dni/cex", "nombre", "importe", "Referencia"]
+
+def _empty_out() -> pd.DataFrame:
+    return pd.DataFrame(columns=BASE_COLS)
+
+def _col(df: pd.DataFrame, i: int, fallback: int = None) -> pd.Series:
+    """Columna por posición; la alternativa (o vacío) si el archivo trae menos columnas."""
+    if df.shape[1] > i: return df.iloc[:, i]
+    if fallback is not None: return _col(df, fallback)
+    return pd.Series([""] * len(df), index=df.index)
+
+def _masivo_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Formato del Excel masivo BCP/BBVA: DNI col 1, nombre col 4 (o 2), referencia col 8, monto col 13."""
+    return pd.DataFrame({
+        "dni/cex": df.iloc[:, 0],
+        "nombre": _col(df, 3, 1),
+        "importe": parse_amount_series(df.iloc[:, 12]) if df.shape[1] > 12 else pd.Series([0.0] * len(df), index=df.index),
+        "Referencia": _col(df, 7),
+    })
+
+_ID_INDEX_CACHE = LRUCache(8, 256 * 1024 * 1024)
+
+def get_id_index(excel_bytes: bytes, df: pd.DataFrame, id_cols: list = None) -> pd.Series:
+    """Índice ID -> fila del Excel, construido una vez por contenido de archivo."""
+    key = content_key(excel_bytes, tuple(id_cols or ()))
+    index = _ID_INDEX_CACHE.get(key)
+    if index is None:
+        index = build_id_index(df, id_cols)
+        _ID_INDEX_CACHE.put(key, index, int(index.memory_usage(index=True, deep=True)))
+    return index
+
+# -------------- Flujos --------------
+# Cada flujo recibe el contenido de los archivos (bytes, o binario con seek() para los TXT)
+# y devuelve las columnas base más "Codigo de Rechazo" cuando el banco lo determina por fila.
+
+def process_pre_bcp_xlsx(pdf_bytes: bytes, excel_bytes: bytes, excel_name: str) -> pd.DataFrame:
+    filas = sorted({int(n) + 1 for n in findall_pdf(pdf_bytes, RE_REGISTRO)})
+    if not filas: raise NoRecords("No se detectaron filas en el PDF.")
+    df_raw = read_table(excel_bytes, excel_name)
+    filas_valid = [i for i in filas if 0 <= i - 1 < len(df_raw)]
+    return _masivo_rows(df_raw.iloc[[i - 1 for i in filas_valid]].reset_index(drop=True))
+
+def process_pre_bcp_txt(pdf_bytes: bytes, txt_file) -> pd.DataFrame:
+    regs = sorted({int(m) for m in findall_pdf(pdf_bytes, RE_REGISTRO_TXT)})
+    indices = sorted({r * MULT for r in regs})
+    records = read_txt_records(txt_file, TXT_POS, set(indices))
+
+    rows = []
+    for i in indices:
+        rec = records.get(i)
+        if rec:
+            rows.append({
+                "dni/cex": rec["dni"],
+                "nombre": rec["nombre"],
+                "importe": parse_amount(rec["importe"]),
+                "Referencia": rec["referencia"],
+            })
+        else:
+            rows.append({"dni/cex": "", "nombre": "", "importe": 0.0, "Referencia": ""})
+    return pd.DataFrame(rows) if rows else _empty_out()
+
+def process_bcp(excel_bytes: bytes, excel_name: str) -> pd.DataFrame:
+    df_raw = read_table(excel_bytes, excel_name)
+    if "Observación" not in df_raw.columns: raise EngineError("No se encontró la columna 'Observación' en el archivo.")
+
+    mask = df_raw["Observación"].notna() & (df_raw["Observación"].str.strip().str.lower() != "ninguna")
+    df_valid = df_raw.loc[mask].reset_index(drop=True)
+    if df_valid.empty: raise NoRecords("No se encontraron registros.")
+
+    nombre_out = df_valid["Beneficiario - Nombre"] if "Beneficiario - Nombre" in df_valid.columns else pd.Series([""] * len(df_valid))
+    importe_out = parse_amount_series(df_valid["Monto"]) if "Monto" in df_valid.columns else pd.Series([0.0] * len(df_valid))
+    return pd.DataFrame({
+        "dni/cex": _col(df_valid, 3),
+        "nombre": nombre_out,
+        "importe": importe_out,
+        "Referencia": strip_ref_prefix(_col(df_valid, 5)),
+    })
+
+def ibk_members(zip_bytes: bytes) -> list[str]:
+    """Excels del ZIP, en orden; se ignoran carpetas, temporales de Office y metadatos de macOS."""
+    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zf:
+        names = [i.filename for i in zf.infolist() if not i.is_dir()]
+    return [n for n in names if n.lower().endswith((".xlsx", ".xls"))
+            and not n.startswith("__MACOSX/") and not n.rsplit("/", 1)[-1].startswith(("~$", "._"))]
+
+def _read_ibk_member(zip_bytes: bytes, name: str) -> pd.DataFrame:
+    # Cada worker abre su propio ZipFile y pasa el miembro al lector como archivo: se descomprime
+    # a un temporal (en memoria solo si es chico) que openpyxl recorre con seek, sin armar sus
+    # bytes completos; el preámbulo se salta al leer en vez de recortarlo después
+    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zf, zf.open(name) as f, \
+            tempfile.SpooledTemporaryFile(IBK_SPOOL_MAX_BYTES) as spool:
+        shutil.copyfileobj(f, spool)
+        spool.seek(0)
+        return read_table_file(spool, name, zf.getinfo(name).file_size,
+                               skiprows=range(1, 1 + IBK_PREAMBLE_ROWS))
+
+# Bytes del ZIP enviados una vez por worker (no en cada tarea)
+_worker_zip = None
+
+def _init_ibk_worker(zip_bytes: bytes):
+    global _worker_zip
+    _worker_zip = zip_bytes
+
+def _read_ibk_worker_member(name: str) -> pd.DataFrame:
+    return _read_ibk_member(_worker_zip, name)
+
+def _read_ibk_members(zip_bytes: bytes, names: list) -> list:
+    """Miembros en orden; en procesos si hay varios, workers disponibles y bastante volumen."""
+    workers = min(IBK_MAX_WORKERS, pdf_utils.PDF_WORKERS, len(names))
+    if workers > 1:
+        with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zf:
+            total = sum(zf.getinfo(n).file_size for n in names)
+        if total >= IBK_PARALLEL_MIN_BYTES:
+            try:
+                with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context(),
+                                         initializer=_init_ibk_worker, initargs=(zip_bytes,)) as ex:
+                    return list(ex.map(_read_ibk_worker_member, names))
+            except (OSError, BrokenProcessPool):
+                pass  # sin procesos disponibles: se sigue en serie
+    return [_read_ibk_member(zip_bytes, n) for n in names]
+
+def _ibk_rows(df2: pd.DataFrame) -> pd.DataFrame:
+    col_o = df2.iloc[:, 14]
+    mask = col_o.notna() & (col_o.astype(str).str.strip() != "")
+    df_valid = df2.loc[mask].reset_index(drop=True)
+
+    df_out = pd.DataFrame({
+        "dni/cex": df_valid.iloc[:, 4],
+        "nombre": df_valid.iloc[:, 5],
+        "importe": parse_amount_series(df_valid.iloc[:, 13]),
+        "Referencia": df_valid.iloc[:, 7],
+    })
+    # Lógica propia de IBK para código de rechazo por palabras clave
+    df_out["Codigo de Rechazo"] = IBK_MATCHER.classify_series(df_valid.iloc[:, 14]).to_numpy()
+    return df_out
+
+def process_ibk(zip_bytes: bytes) -> pd.DataFrame:
+    """Todos los Excels del ZIP unidos en orden (en procesos si es grande), con el miembro de origen por fila."""
+    names = ibk_members(zip_bytes)
+    if not names: raise EngineError("El ZIP no contiene ningún Excel.")
+    with stage("ibk_miembros", note=f"{len(names)} archivos") as s:
+        frames = _read_ibk_members(zip_bytes, names)
+        s.rows = sum(len(f) for f in frames)
+    parts = []
+    for name, df in zip(names, frames):
+        # Sin ninguna observación la columna 15 viene vacía y el lector la recorta
+        if df.shape[1] == 14: df = df.assign(**{"Unnamed: 14": np.nan})
+        if df.shape[1] < 14: raise EngineError(f"{name}: el Excel no tiene el formato IBK (se esperan 15 columnas).")
+        parts.append(_ibk_rows(df).assign(**{SOURCE_COL: name}))
+    return pd.concat(parts, ignore_index=True)
+
+def process_bbva(pdf_bytes: bytes, excel_bytes: bytes, excel_name: str, id_cols: list = BBVA_ID_COLS) -> pd.DataFrame:
+    docs = set(findall_pdf(pdf_bytes, RE_DOC_ID))
+    if not docs: raise EngineError("No se detectaron identificadores en el PDF.")
+    df_raw = read_table(excel_bytes, excel_name)
+    index = get_id_index(excel_bytes, df_raw, id_cols)
+    return _masivo_rows(df_raw.iloc[match_id_rows(index, docs)].reset_index(drop=True))
+
+def _sco_ok_keys(segment: str) -> tuple:
+    """(dni, importe, referencia) del texto que precede a un "O.K."; None si no aparece."""
+    dni = amount = ref = None
+    for tok in RE_SCO_NUM.findall(segment):
+        if tok.isdigit():
+            if len(tok) == SCO_DNI_LEN:
+                if dni is None: dni = tok
+            elif len(tok) >= SCO_REF_MIN_LEN and (ref is None or len(tok) > len(ref)): ref = tok
+        elif RE_SCO_AMOUNT.fullmatch(tok): amount = tok
+    return dni, amount, ref
+
+def scan_sco_confirmations(pdf_bytes: bytes) -> tuple[list, pd.DataFrame]:
+    """
+    Recorre el PDF página a página una sola vez: cuenta los "O.K." de cada página y toma el
+    DNI, importe y referencia que aparecen antes de cada uno (en su fila). Devuelve
+    (conteo por página, confirmaciones con pagina / dni / importe / referencia).
+    """
+    per_page, rows = [], []
+    with stage("sco_confirmaciones", nbytes=len(pdf_bytes)) as s:
+        for page, text in enumerate(extract_pdf_pages(pdf_bytes), 1):
+            prev = n = 0
+            for m in RE_SCO_OK.finditer(text):
+                rows.append((page, *_sco_ok_keys(text[max(prev, m.start() - SCO_OK_CONTEXT):m.start()])))
+                prev = m.end()
+                n += 1
+            per_page.append(n)
+        s.rows = len(rows)
+    return per_page, pd.DataFrame(rows, columns=["pagina", "dni", "importe", "referencia"])
+
+def _sco_key(values: pd.Series) -> pd.Series:
+    """Documento / referencia comparable: solo dígitos, sin ceros a la izquierda; vacío -> NaN."""
+    out = values.astype(object).str.replace(r"\D", "", regex=True).str.lstrip("0")
+    return out.where(out.notna() & (out != ""))
+
+def _sco_cents(values: pd.Series, parse) -> pd.Series:
+    cents = (parse(values) * 100).round().astype("Int64")
+    return cents.where(values.notna())
+
+def _multiset_join(left: pd.DataFrame, right: pd.DataFrame, keys: list) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Cruce por hash de `keys` donde cada fila se usa una sola vez: la k-ésima aparición de una
+    clave a la izquierda se empareja con la k-ésima a la derecha. Devuelve las etiquetas
+    emparejadas de cada lado.
+    """
+    left, right = left.dropna(subset=keys), right.dropna(subset=keys)
+    if left.empty or right.empty: return np.array([], dtype="int64"), np.array([], dtype="int64")
+    l = left[keys].assign(_n=left.groupby(keys, sort=False).cumcount(), _l=left.index)
+    r = right[keys].assign(_n=right.groupby(keys, sort=False).cumcount(), _r=right.index)
+    m = l.merge(r, on=keys + ["_n"])
+    return m["_l"].to_numpy(), m["_r"].to_numpy()
+
+def _sco_ok_keys_frame(oks: pd.DataFrame) -> pd.DataFrame:
+    """Llaves de cruce (referencia, dni, céntimos) de cada confirmación del PDF."""
+    return pd.DataFrame({"referencia": _sco_key(oks["referencia"]), "dni": _sco_key(oks["dni"]),
+                         "cents": _sco_cents(oks["importe"], parse_amount_series)}, index=oks.index)
+
+def scan_sco_txt(txt_file, refs: set, dnis: set, chunk_rows: int = TXT_CHUNK_ROWS) -> tuple[int, pd.DataFrame, np.ndarray]:
+    """
+    Recorre el TXT SCO en bloques y guarda, con sus llaves de cruce, solo las líneas cuya
+    referencia o DNI figura en alguna confirmación; las demás no pueden cruzar con ningún
+    "O.K." y de ellas basta el número de línea. Devuelve (líneas del TXT, candidatas
+    indexadas por línea, líneas sin confirmación posible).
+    """
+    total, parts, orphans = 0, [], []
+    with stage("txt_lectura") as s:
+        it = iter_txt_lines(txt_file, skip_blank=True)
+        while chunk := list(itertools.islice(it, chunk_rows)):
+            nums = np.fromiter((n for n, _ in chunk), dtype="int64", count=len(chunk))
+            lines = pd.Series([line for _, line in chunk], dtype=object)
+            ref = _sco_key(slice_fixed_series(lines, *SCO_TXT_POS["referencia"]))
+            dni = _sco_key(slice_fixed_series(lines, *SCO_TXT_POS["dni"]))
+            keep = (ref.isin(refs) | dni.isin(dnis)).to_numpy()
+            orphans.append(nums[~keep])
+            if keep.any():
+                cents = _sco_cents(slice_fixed_series(lines[keep], *SCO_TXT_POS["importe"]), parse_sco_importe_series)
+                parts.append(pd.DataFrame({"referencia": ref[keep].to_numpy(), "dni": dni[keep].to_numpy(),
+                                           "cents": cents.to_numpy()}, index=nums[keep]))
+            total += len(chunk)
+        s.rows = total
+    candidates = pd.concat(parts) if parts else pd.DataFrame({"referencia": [], "dni": [], "cents": pd.array([], dtype="Int64")}, index=np.array([], dtype="int64"))
+    return total, candidates, np.concatenate(orphans) if orphans else np.array([], dtype="int64")
+
+def match_sco_confirmations(txt: pd.DataFrame, oks: pd.DataFrame) -> tuple[pd.Index, pd.Index]:
+    """
+    Asigna cada "O.K." a una línea del TXT (ambos ya con llaves referencia / dni / cents):
+    primero por referencia, luego por DNI + importe y al final solo por DNI, siempre entre las
+    que siguen libres. Devuelve (índice de las líneas sin confirmación, de las confirmaciones
+    sin línea).
+    """
+    with stage("sco_cruce", rows=len(txt)):
+        left, right = txt, oks
+        for keys in (["referencia"], ["dni", "cents"], ["dni"]):
+            li, ri = _multiset_join(left, right, keys)
+            left, right = left.drop(li), right.drop(ri)
+    return left.index, right.index
+
+def read_sco_txt_lines(txt_file, wanted) -> pd.DataFrame:
+    """Líneas pedidas del TXT SCO con sus campos SCO_TXT_POS; "linea" numera sin contar las líneas en blanco."""
+    nums, lines = read_txt_lines(txt_file, set(wanted), skip_blank=True)
+    lines = pd.Series(lines, dtype=object)
+    fields = {f: slice_fixed_series(lines, a, b) for f, (a, b) in SCO_TXT_POS.items()}
+    return pd.DataFrame({"linea": nums, **fields})
+
+_SCO_AUDIT_CACHE = LRUCache(SCO_AUDIT_CACHE_MAX_ENTRIES, SCO_AUDIT_CACHE_MAX_BYTES)
+
+def sco_audit(pdf_bytes: bytes, txt_file) -> dict:
+    """
+    Cuadratura SCO: líneas del TXT contra confirmaciones 'O.K.' del PDF, más orden e importe total.
+    Además del total, cruza cada "O.K." con su línea del TXT: "sin_confirmar" son las líneas
+    del TXT sin "O.K." y "ok_sin_linea" las confirmaciones que no se pudieron asignar.
+    El resultado se recuerda por contenido de ambos archivos (los reruns no lo recalculan).
+    """
+    key = content_key(pdf_bytes, file_key(txt_file))
+    audit = _SCO_AUDIT_CACHE.get(key)
+    if audit is not None: return dict(audit)
+
+    per_page, oks = scan_sco_confirmations(pdf_bytes)
+    right = _sco_ok_keys_frame(oks)
+    # Primero las llaves de las confirmaciones: del TXT solo se retienen las líneas que pueden cruzar
+    txt_count, left, orphans = scan_sco_txt(txt_file, set(right["referencia"].dropna()), set(right["dni"].dropna()))
+    # El PDF ya quedó en caché: orden y total no lo vuelven a parsear. El total es el primer
+    # "Total de la orden" y se extiende hasta el final del documento, como el re.search original
+    scan = scan_pdf(pdf_bytes, {
+        "orden": (RE_SCO_ORDEN, SCAN_FIRST),
+        "total": (RE_SCO_TOTAL, SCAN_FIRST),
+    })
+    missing, unmatched = match_sco_confirmations(left, right)
+    # Segunda lectura solo hasta la última línea sin confirmación, para mostrar sus campos
+    missing = read_sco_txt_lines(txt_file, np.union1d(orphans, missing.to_numpy(dtype="int64")).tolist())
+    # "Detalle de orden No." seguido de 4 dígitos; "Total de la orden" con todo lo que le sigue
+    match_orden, match_total = scan["orden"], scan["total"]
+    ok_count = len(oks)
+    audit = {
+        "txt_count": txt_count,
+        "ok_count": ok_count,
+        "diff": txt_count - ok_count,
+        "num_op": f"9242{match_orden.group(1)}" if match_orden else None,
+        "total": match_total.group(1).strip() if match_total else None,
+        "ok_por_pagina": per_page,
+        "sin_confirmar": missing.assign(importe=parse_sco_importe_series(missing["importe"])),
+        "ok_sin_linea": oks.loc[unmatched],
+    }
+    nbytes = sum(int(audit[k].memory_usage(deep=True).sum()) for k in ("sin_confirmar", "ok_sin_linea"))
+    _SCO_AUDIT_CACHE.put(key, audit, nbytes)
+    return dict(audit)
+
+def process_sco(txt_file, xls_bytes: bytes, xls_name: str, txt_count: int = None) -> pd.DataFrame:
+    txt_count = count_txt_lines(txt_file) if txt_count is None else txt_count
+    df_xls = read_table(xls_bytes, xls_name, header=6)
+    if "Linea" not in df_xls.columns: raise EngineError("El Excel no tiene la columna 'Linea'. Verifique el formato (header=6).")
+
+    # Número de línea en una pasada; se omiten vacíos, no numéricos y fuera de rango
+    nums = _line_numbers(df_xls["Linea"])
+    valid = (nums >= 1) & (nums <= txt_count)
+    if not valid.any(): raise NoRecords("El XLS no contenía líneas válidas.")
+    line_idx = nums[valid].astype("int64").to_numpy()
+    obs = df_xls["Observación:"][valid] if "Observación:" in df_xls.columns else pd.Series(None, index=nums.index[valid], dtype=object)
+
+    # Solo se leen del TXT las líneas que el XLS reporta con error; luego se indexan por posición
+    with stage("txt_lectura") as s:
+        txt_nums, txt_lines = read_txt_lines(txt_file, set(line_idx.tolist()), skip_blank=True)
+        s.rows = len(txt_nums)
+    lines = pd.Series(txt_lines[np.searchsorted(txt_nums, line_idx)].tolist())
+    fields = {f: slice_fixed_series(lines, a, b) for f, (a, b) in SCO_TXT_POS.items()}
+
+    return pd.DataFrame({
+        "dni/cex": fields["dni"],
+        "nombre": fields["nombre"],
+        "importe": parse_sco_importe_series(fields["importe"]),
+        "Referencia": fields["referencia"],
+        "Codigo de Rechazo": map_sco_xls_error_series(obs).to_numpy(),
+    })
+
+def process_total(excel_bytes: bytes, excel_name: str) -> pd.DataFrame:
+    df_raw = read_table(excel_bytes, excel_name)
+    if df_raw.shape[1] <= 7: raise EngineError("El archivo no tiene las columnas necesarias (se espera el formato POST BCP-xlsx).")
+
+    col_ref_name = df_raw.columns[7]
+    df_valid = df_raw.dropna(subset=[col_ref_name]).copy()
+    df_valid[col_ref_name] = df_valid[col_ref_name].astype(str).str.strip()
+    df_valid = df_valid[df_valid[col_ref_name] != ""]
+    df_valid = df_valid[df_valid[col_ref_name].str.lower() != "nan"]
+    df_valid = df_valid.reset_index(drop=True)
+    if df_valid.empty: raise NoRecords("No se detectaron registros válidos en la columna de Referencia (columna 8).")
+    return _masivo_rows(df_valid)
+
+# -------------- Salida --------------
+# Opciones "CÓDIGO - DESCRIPCIÓN" del selector de motivo: son las categorías de la columna
+MOTIVO_OPTIONS = [f"{k} - {v}" for k, v in CODE_DESC.items()]
+
+def motivo_column(codes: pd.Series) -> pd.Categorical:
+    """Código -> 'CÓDIGO - DESCRIPCIÓN' como categórica; códigos fuera de CODE_DESC quedan nulos."""
+    return pd.Categorical.from_codes(pd.Index(list(CODE_DESC)).get_indexer(codes), categories=MOTIVO_OPTIONS)
+
+def _decode_motivo(value) -> tuple[str, str]:
+    if pd.isna(value): return "", ""
+    s = str(value)
+    code = s.split(" - ")[0]
+    return code.strip(), (s.split(" - ", 1)[1].strip() if " - " in s else CODE_DESC.get(code, ""))
+
+def split_motivo(motivo: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """
+    Inversa de motivo_column: (código, descripción) por fila. Se decodifica una tabla con los
+    valores distintos (las categorías) y se indexa con los códigos enteros de cada fila.
+    """
+    if isinstance(motivo.dtype, pd.CategoricalDtype):
+        idx, values = motivo.cat.codes.to_numpy(), motivo.cat.categories
+    else:
+        idx, values = pd.factorize(motivo)
+    # El último elemento de la tabla corresponde a los nulos (código -1)
+    table = [_decode_motivo(v) for v in values] + [("", "")]
+    codes = np.array([c for c, _ in table], dtype=object)[idx]
+    descs = np.array([d for _, d in table], dtype=object)[idx]
+    return pd.Series(codes, index=motivo.index).astype(str), pd.Series(descs, index=motivo.index).astype(str)
+
+def strip_ref_prefix(refs: pd.Series, prefix: str = "000") -> pd.Series:
+    """Quita el prefijo '000' que BCP antepone a las referencias (los nulos se mantienen)."""
+    s = refs.astype(str)
+    return s.where(~s.str.startswith(prefix, na=False), s.str.slice(len(prefix)))
+
+def finalize_output(df: pd.DataFrame, default_code: str = None) -> pd.DataFrame:
+    """Columnas OUT_COLS listas para exportar/enviar (lo que arma la tabla editable sin ediciones)."""
+    out = df.copy()
+    out["Estado"] = ESTADO
+    if "Codigo de Rechazo" not in out.columns: out["Codigo de Rechazo"] = default_code or ""
+    out["Descripcion de Rechazo"] = out["Codigo de Rechazo"].map(CODE_DESC).fillna("")
+    for col in OUT_COLS:
+        if col not in out.columns: out[col] = ""
+    return out[OUT_COLS].astype(OUT_DTYPES)
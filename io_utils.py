@@ -0,0 +1,345 @@
+"""Lectura y escritura de archivos tabulares (CSV / Excel / Parquet / Arrow IPC) con caché por contenido."""
+import hashlib
+import importlib.util
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from cache_utils import LRUCache, content_key
+from timing import stage
+
+LOAD_CACHE_MAX_ENTRIES = 8
+LOAD_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+EXCEL_STREAM_MIN_BYTES = 5 * 1024 * 1024  # desde aquí el xlsx se lee en streaming por bloques
+EXCEL_STREAM_CHUNK_ROWS = 50_000
+CSV_ARROW_MIN_BYTES = 64 * 1024 * 1024  # pyarrow solo compensa en CSV grandes y con varios núcleos
+# Formatos columnares (requieren pyarrow): extensión -> backend
+COLUMNAR_EXTS = {".parquet": "parquet", ".pq": "parquet", ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+
+EXCEL_WRITE_ONLY_MIN_ROWS = 20_000  # desde aquí se escribe con openpyxl write-only (memoria constante)
+EXPORT_CACHE_MAX_ENTRIES = 16
+EXPORT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Marcadores de nulo por defecto de read_csv / read_excel (documentados en `na_values`): las
+# rutas que arman el texto a mano (streaming, Parquet / Arrow) los tratan igual que los lectores
+NA_STRINGS = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+})
+
+# Misma caché para las cuatro pestañas; sobrevive a los reruns de Streamlit
+_FRAME_CACHE = LRUCache(LOAD_CACHE_MAX_ENTRIES, LOAD_CACHE_MAX_BYTES)
+_EXPORT_CACHE = LRUCache(EXPORT_CACHE_MAX_ENTRIES, EXPORT_CACHE_MAX_BYTES)
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+# -------------- Backends --------------
+# Cada backend recibe los bytes o un archivo binario abierto con seek (ver read_table_file)
+def _source(data):
+    return data if hasattr(data, "read") else io.BytesIO(data)
+
+
+def _read_csv(data: bytes, **kwargs) -> pd.DataFrame:
+    return pd.read_csv(_source(data), dtype=str, **kwargs)
+
+
+def _read_csv_pyarrow(data: bytes, **kwargs) -> pd.DataFrame:
+    return pd.read_csv(_source(data), dtype=str, engine="pyarrow", **kwargs)
+
+
+def _read_excel_openpyxl(data: bytes, **kwargs) -> pd.DataFrame:
+    return pd.read_excel(_source(data), dtype=str, engine="openpyxl", **kwargs)
+
+
+def _read_excel_calamine(data: bytes, **kwargs) -> pd.DataFrame:
+    return pd.read_excel(_source(data), dtype=str, engine="calamine", **kwargs)
+
+
+def _read_excel_xlrd(data: bytes, **kwargs) -> pd.DataFrame:
+    return pd.read_excel(_source(data), dtype=str, engine="xlrd", **kwargs)
+
+
+# dtype de texto que usa read_excel(dtype=str) en esta versión de pandas (conserva NaN)
+_STR_DTYPE = pd.Series(["x"], dtype=str).dtype
+
+
+def _as_text(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Columnas tipadas -> texto con el mismo criterio que los lectores CSV/Excel: floats enteros
+    sin '.0' y vacíos / marcadores de nulo como NaN. Así los flujos no distinguen el formato.
+    """
+    out = {}
+    for c in df.columns:
+        col = df[c]
+        s = col.astype(_STR_DTYPE)
+        if pd.api.types.is_float_dtype(col.dtype):
+            v = col.to_numpy(dtype=float, na_value=np.nan)
+            whole = np.isfinite(v) & (v == np.floor(v)) & (np.abs(v) < 2**63)
+            if whole.any(): s[whole] = v[whole].astype(np.int64).astype(str)
+        out[c] = s.where(s.notna() & (s != "") & ~s.isin(NA_STRINGS), np.nan).astype(_STR_DTYPE)
+    return pd.DataFrame(out, columns=df.columns)
+
+
+# Parquet / Arrow traen encabezados y tipos propios: las opciones de planilla (header, skiprows)
+# no aplican y se ignoran
+def _read_parquet(data: bytes, **kwargs) -> pd.DataFrame:
+    return _as_text(pd.read_parquet(_source(data), engine="pyarrow"))
+
+
+def _read_arrow(data: bytes, **kwargs) -> pd.DataFrame:
+    import pyarrow as pa
+
+    if hasattr(data, "read"): data = data.read()
+    try:
+        table = pa.ipc.open_file(pa.BufferReader(data)).read_all()
+    except pa.ArrowInvalid:  # formato stream (sin pie de archivo)
+        table = pa.ipc.open_stream(pa.BufferReader(data)).read_all()
+    return _as_text(table.to_pandas())
+
+
+def _convert_cell(v):
+    # Igual que pandas: enteros guardados como float vuelven a int antes de pasar a texto
+    if isinstance(v, float) and v.is_integer(): return int(v)
+    return v
+
+
+def _row_width(row: tuple) -> int:
+    """Ancho útil de la fila (pandas recorta las celdas vacías del final)."""
+    w = len(row)
+    while w and (row[w - 1] is None or row[w - 1] == ""): w -= 1
+    return w
+
+
+def _header_labels(row: tuple, width: int) -> list:
+    labels, seen = [], {}
+    for i in range(width):
+        v = _convert_cell(row[i]) if i < len(row) else None
+        label = f"Unnamed: {i}" if v is None or v == "" else v
+        n = seen.get(label, 0)
+        seen[label] = n + 1
+        labels.append(f"{label}.{n}" if n else label)
+    return labels
+
+
+def _rows_to_frame(rows: list, width: int) -> pd.DataFrame:
+    df = pd.DataFrame.from_records([r[:width] + (None,) * (width - len(r)) for r in rows], columns=range(width))
+    out = {}
+    for c in df.columns:
+        s = df[c].map(lambda v: str(_convert_cell(v)), na_action="ignore")
+        out[c] = s.where(s.notna() & (s != "") & ~s.isin(NA_STRINGS), np.nan).astype(_STR_DTYPE)
+    return pd.DataFrame(out)
+
+
+def _read_excel_stream(data: bytes, **kwargs) -> pd.DataFrame:
+    """
+    openpyxl en modo read-only recorriendo filas en bloques: evita la lista de listas completa
+    que arma pandas antes de construir el DataFrame. Solo para la lectura por defecto (header=0).
+    """
+    if kwargs: return _read_excel_openpyxl(data, **kwargs)
+    from openpyxl import load_workbook
+
+    wb = load_workbook(_source(data), read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.worksheets[0]
+        ws.reset_dimensions()
+        head, width, blanks = None, 0, 0
+        frames, buf, buf_width = [], [], 0
+        for r in ws.iter_rows(values_only=True):
+            w = _row_width(r)
+            if head is None:
+                head, width = r, w  # como pandas, la primera fila es el encabezado aunque esté en blanco
+                continue
+            # Filas en blanco intermedias quedan como filas de NaN (pandas solo recorta las del final)
+            if not w:
+                blanks += 1
+                continue
+            buf.extend([()] * blanks)
+            blanks = 0
+            buf.append(r)
+            buf_width = max(buf_width, w)
+            if len(buf) >= EXCEL_STREAM_CHUNK_ROWS:
+                frames.append((buf, buf_width))
+                buf, buf_width = [], 0
+        if buf: frames.append((buf, buf_width))
+    finally:
+        wb.close()
+    if head is None or not (width or frames): return pd.DataFrame()
+
+    width = max([width] + [w for _, w in frames])
+    df = pd.concat([_rows_to_frame(rows, width) for rows, _ in frames], ignore_index=True) if frames else _rows_to_frame([], width)
+    df.columns = _header_labels(head, width)
+    return df
+
+
+BACKENDS = {
+    "csv": _read_csv,
+    "csv_pyarrow": _read_csv_pyarrow,
+    "openpyxl": _read_excel_openpyxl,
+    "openpyxl_stream": _read_excel_stream,
+    "calamine": _read_excel_calamine,
+    "xlrd": _read_excel_xlrd,
+    "parquet": _read_parquet,
+    "arrow": _read_arrow,
+}
+
+
+def available_backends() -> list:
+    out = ["csv", "openpyxl", "openpyxl_stream"]
+    if _installed("pyarrow"): out += ["csv_pyarrow", "parquet", "arrow"]
+    if _installed("python_calamine"): out.append("calamine")
+    if _installed("xlrd"): out.append("xlrd")
+    return out
+
+
+def pick_backend(name: str, size: int, kwargs: dict = None) -> str:
+    """
+    Elige el lector según formato y tamaño (y lo que esté instalado). calamine no entra en la
+    selección automática: no está en requirements.txt y convierte en NaN las celdas con solo
+    espacios, que openpyxl / xlrd conservan; queda disponible pidiéndolo con `backend`.
+    """
+    ext = os.path.splitext(name.lower())[1]
+    if ext in COLUMNAR_EXTS: return COLUMNAR_EXTS[ext]
+    if ext == ".csv":
+        return "csv_pyarrow" if size >= CSV_ARROW_MIN_BYTES and not kwargs and _installed("pyarrow") else "csv"
+    if ext == ".xls": return "xlrd"
+    return "openpyxl_stream" if size >= EXCEL_STREAM_MIN_BYTES and not kwargs else "openpyxl"
+
+
+def read_table(data: bytes, name: str, backend: str = None, **kwargs) -> pd.DataFrame:
+    """
+    Lee CSV/Excel como texto (dtype=str). El DataFrame se cachea por hash del contenido
+    más las opciones de lectura; se devuelve una copia superficial (copy-on-write).
+    """
+    backend = backend or pick_backend(name, len(data), kwargs)
+    with stage("carga", nbytes=len(data), note=backend) as s:
+        key = content_key(data, backend, sorted(kwargs.items()))
+        df = _FRAME_CACHE.get(key)
+        if df is None:
+            df = BACKENDS[backend](data, **kwargs)
+            _FRAME_CACHE.put(key, df, int(df.memory_usage(index=True, deep=True).sum()))
+        else:
+            s.note = f"{backend} (caché)"
+        s.rows = len(df)
+    return df.copy(deep=False)
+
+
+def read_table_file(f, name: str, size: int, backend: str = None, **kwargs) -> pd.DataFrame:
+    """
+    Como read_table pero desde un archivo binario abierto (con seek) de `size` bytes, sin
+    pasarlo antes a bytes en memoria. No usa la caché: no hay bytes de los que sacar la llave.
+    """
+    backend = backend or pick_backend(name, size, kwargs)
+    with stage("carga", nbytes=size, note=backend) as s:
+        df = BACKENDS[backend](f, **kwargs)
+        s.rows = len(df)
+    return df
+
+
+def load_cache_stats() -> dict:
+    return _FRAME_CACHE.stats()
+
+
+def clear_load_cache():
+    _FRAME_CACHE.clear()
+
+
+# -------------- Exportación --------------
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Huella del contenido del DataFrame (encabezados + valores), vectorizada."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(list(df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _excel_write_only(df: pd.DataFrame, sheet_name: str) -> bytes:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    header = []
+    for c in df.columns:
+        cell = WriteOnlyCell(ws, value=str(c))
+        cell.font = Font(bold=True)
+        header.append(cell)
+    ws.append(header)
+    # Las filas se escriben a disco temporal a medida que se agregan; solo se itera el DataFrame
+    for row in df.astype(object).itertuples(index=False, name=None):
+        ws.append([None if v is None or v != v else v for v in row])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def df_to_excel_bytes(df: pd.DataFrame, sheet_name: str = "Rechazos") -> bytes:
+    if len(df) >= EXCEL_WRITE_ONLY_MIN_ROWS:
+        return _excel_write_only(df, sheet_name)
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, sheet_name=sheet_name)
+    return buf.getvalue()
+
+
+def df_to_parquet_bytes(df: pd.DataFrame) -> bytes:
+    buf = io.BytesIO()
+    df.to_parquet(buf, index=False, engine="pyarrow")
+    return buf.getvalue()
+
+
+def df_to_arrow_bytes(df: pd.DataFrame) -> bytes:
+    """Arrow IPC en formato archivo (lo que lee pyarrow.ipc.open_file / pandas.read_feather)."""
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+# formato -> (escritor, mime)
+EXPORT_FORMATS = {
+    "xlsx": (df_to_excel_bytes, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "parquet": (df_to_parquet_bytes, "application/vnd.apache.parquet"),
+    "arrow": (df_to_arrow_bytes, "application/vnd.apache.arrow.file"),
+}
+
+
+def export_format(path: str) -> str:
+    """Formato de salida según la extensión del archivo (Excel por defecto)."""
+    return COLUMNAR_EXTS.get(os.path.splitext(str(path).lower())[1], "xlsx")
+
+
+def export_bytes_cached(df, fmt: str = "xlsx", fingerprint: str = None) -> bytes:
+    """
+    Exportación (xlsx / parquet / arrow) cacheada por la huella del DataFrame. `df` puede ser
+    una función que arma la tabla: con `fingerprint` solo se llama si la huella no está en caché.
+    """
+    with stage("excel" if fmt == "xlsx" else fmt) as s:
+        if fingerprint is None:
+            df = df() if callable(df) else df
+            fingerprint = frame_fingerprint(df)
+        key = f"{fingerprint}:{fmt}"
+        data = _EXPORT_CACHE.get(key)
+        if data is None:
+            df = df() if callable(df) else df
+            s.rows = len(df)
+            data = EXPORT_FORMATS[fmt][0](df)
+            _EXPORT_CACHE.put(key, data, len(data))
+        else:
+            s.note = "caché"
+        s.nbytes = len(data)
+    return data
+
+
+def excel_bytes_cached(df, fingerprint: str = None) -> bytes:
+    """df_to_excel_bytes cacheado por la huella del DataFrame (o de la función que lo arma)."""
+    return export_bytes_cached(df, "xlsx", fingerprint)
@@ -0,0 +1,218 @@
+"""Registro local (SQLite) de referencias enviadas al endpoint, para no rechazar dos veces.
+
+Cada envío queda como una fila (referencia, código, banco, fecha, HTTP status) en una tabla
+indexada por referencia; el historial es también la auditoría de envíos. Antes de enviar se
+buscan todas las referencias del payload de una vez: el proceso guarda un arreglo ordenado con
+el hash de 64 bits de las referencias ya aceptadas (2xx), que se completa de forma incremental
+con lo que otras sesiones/procesos hayan registrado (id > último leído). Así la consulta de
+100k referencias contra millones de envíos es un searchsorted en memoria, no 100k lecturas
+del índice.
+
+Para que dos sesiones no envíen lo mismo a la vez, el payload se reserva antes del POST: sus
+referencias entran como pendientes en una sola transacción (clave única: la sesión que pierde
+la carrera recibe SubmissionInProgress sin haber enviado nada; si otra ya terminó de enviar
+alguna, AlreadySubmitted) y record() las pasa al historial con el status del reporte. Una reserva sin registrar (proceso caído a mitad del
+envío) vence a las LEDGER_PENDING_TTL segundos y queda en el historial sin status.
+
+    ledger = SubmissionLedger()
+    dup = ledger.submitted(payload["Referencia"])   # máscara booleana (aceptadas o en curso)
+    ledger.reserve(payload[~dup], "BCP")            # SubmissionInProgress / AlreadySubmitted
+    status, resp = post_to_endpoint(...)
+    ledger.record(payload[~dup], "BCP", status)
+"""
+import os
+import sqlite3
+from contextlib import closing
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+LEDGER_PATH = os.environ.get("RECHAZOS_LEDGER") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "rechazos_enviados.sqlite3")
+LEDGER_DETAIL_ROWS = 1_000  # envíos previos que se muestran al detectar duplicados
+LEDGER_PENDING_TTL = 3_600  # segundos que una reserva sin registrar bloquea sus referencias
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS envios (
+    id INTEGER PRIMARY KEY,
+    ref_hash INTEGER NOT NULL,
+    referencia TEXT NOT NULL,
+    codigo TEXT,
+    banco TEXT,
+    ts TEXT NOT NULL,
+    status INTEGER
+);
+CREATE INDEX IF NOT EXISTS envios_referencia ON envios (referencia);
+CREATE TABLE IF NOT EXISTS pendientes (
+    referencia TEXT PRIMARY KEY,
+    ref_hash INTEGER NOT NULL,
+    codigo TEXT,
+    banco TEXT,
+    ts TEXT NOT NULL
+);
+"""
+
+_TS_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+# ruta -> [último id leído, hashes ordenados de referencias aceptadas]; compartido entre sesiones
+_ACCEPTED = {}
+_ACCEPTED_LOCK = threading.Lock()
+
+
+def _clean_refs(refs) -> pd.Series:
+    """Referencias como texto sin espacios; vacías / nulas quedan como NaN (no se registran ni bloquean)."""
+    s = pd.Series(refs, dtype=object).astype(str).str.strip()
+    return s.where(pd.Series(refs, dtype=object).notna().to_numpy() & (s != "").to_numpy())
+
+
+def ref_hashes(refs: pd.Series) -> np.ndarray:
+    """Hash de 64 bits (con signo, como lo guarda SQLite) de cada referencia, vectorizado."""
+    h = pd.util.hash_pandas_object(pd.Series(refs, dtype=object), index=False, categorize=False)
+    return h.to_numpy().view(np.int64)
+
+
+class SubmissionInProgress(RuntimeError):
+    """Otra sesión / proceso tiene reservadas (enviando) referencias del payload."""
+
+
+class AlreadySubmitted(SubmissionInProgress):
+    """Otra sesión / proceso terminó de enviar referencias del payload después de revisarlas."""
+
+
+class SubmissionLedger:
+    """
+    Historial de envíos en SQLite (WAL, una conexión por operación que se cierra al terminar:
+    seguro entre hilos y procesos).
+    """
+
+    def __init__(self, path: str = LEDGER_PATH):
+        self.path = str(path)
+        with closing(self._connect()) as con, con:
+            con.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.path, timeout=30)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    def _expire(self, con: sqlite3.Connection):
+        """Reservas vencidas pasan al historial sin status (no se sabe si el endpoint las recibió)."""
+        cutoff = time.strftime(_TS_FORMAT, time.localtime(time.time() - LEDGER_PENDING_TTL))
+        con.execute("INSERT INTO envios (ref_hash, referencia, codigo, banco, ts, status) "
+                    "SELECT ref_hash, referencia, codigo, banco, ts, NULL FROM pendientes WHERE ts < ?", (cutoff,))
+        con.execute("DELETE FROM pendientes WHERE ts < ?", (cutoff,))
+
+    def _accepted(self) -> np.ndarray:
+        """Hashes de referencias aceptadas, al día con lo registrado por otros procesos."""
+        with _ACCEPTED_LOCK:
+            last_id, hashes = _ACCEPTED.get(self.path, (0, np.empty(0, dtype=np.int64)))
+            with closing(self._connect()) as con, con:
+                max_id = con.execute("SELECT COALESCE(MAX(id), 0) FROM envios").fetchone()[0]
+                rows = con.execute("SELECT ref_hash FROM envios WHERE id > ? AND id <= ? AND status BETWEEN 200 AND 299", (last_id, max_id)).fetchall()
+            if rows:
+                hashes = np.union1d(hashes, np.fromiter((h for (h,) in rows), dtype=np.int64, count=len(rows)))
+            _ACCEPTED[self.path] = (max(last_id, max_id), hashes)
+            return hashes
+
+    def _pending(self) -> list:
+        with closing(self._connect()) as con, con:
+            self._expire(con)
+            return [r for (r,) in con.execute("SELECT referencia FROM pendientes")]
+
+    def submitted(self, refs) -> np.ndarray:
+        """Máscara de las referencias ya enviadas con éxito o reservadas por un envío en curso."""
+        refs = _clean_refs(refs)
+        # Las pendientes son solo los envíos en vuelo: pocas filas, se cruzan con isin
+        out = refs.isin(self._pending()).to_numpy(copy=True)
+        valid = refs.notna().to_numpy() & ~out
+        accepted = self._accepted()
+        if not valid.any() or not len(accepted): return out
+        h = ref_hashes(refs[valid])
+        # Consultas ordenadas: searchsorted recorre el historial en orden y aprovecha la caché
+        order = np.argsort(h)
+        pos = np.searchsorted(accepted, h[order])
+        pos[pos == len(accepted)] = 0
+        hit = np.empty(len(h), dtype=bool)
+        hit[order] = accepted[pos] == h[order]
+        out[valid] = hit
+        return out
+
+    def details(self, refs, limit: int = LEDGER_DETAIL_ROWS) -> pd.DataFrame:
+        """Último envío aceptado (o reserva en curso, sin status) de cada referencia (hasta `limit`)."""
+        refs = _clean_refs(refs).dropna().drop_duplicates().head(limit).tolist()
+        cols = ["referencia", "codigo", "banco", "ts", "status"]
+        if not refs: return pd.DataFrame(columns=cols)
+        with closing(self._connect()) as con, con:
+            rows = con.execute(
+                "SELECT referencia, codigo, banco, MAX(ts), status FROM envios "
+                "WHERE referencia IN (SELECT value FROM json_each(?1)) AND status BETWEEN 200 AND 299 "
+                "GROUP BY referencia UNION ALL "
+                "SELECT referencia, codigo, banco, ts, NULL FROM pendientes "
+                "WHERE referencia IN (SELECT value FROM json_each(?1))", (pd.Series(refs).to_json(orient="values"),)).fetchall()
+        return pd.DataFrame(rows, columns=cols)
+
+    @staticmethod
+    def _rows(payload: pd.DataFrame):
+        """(hashes, referencias, códigos) de las filas con referencia, y la máscara de esas filas."""
+        refs = _clean_refs(payload["Referencia"])
+        codes = payload["Codigo de Rechazo"] if "Codigo de Rechazo" in payload.columns else pd.Series([None] * len(payload))
+        valid = refs.notna().to_numpy()
+        return ref_hashes(refs[valid]).tolist(), refs[valid].tolist(), pd.Series(codes).to_numpy()[valid].tolist(), valid
+
+    def reserve(self, payload: pd.DataFrame, bank: str, resend: bool = False) -> int:
+        """
+        Reserva las referencias del payload antes de enviarlo, todas o ninguna. Si otra sesión
+        ya reservó alguna lanza SubmissionInProgress, y si alguna ya fue aceptada (otra sesión
+        terminó su envío después de submitted()) AlreadySubmitted, salvo con `resend`; en ambos
+        casos no deja nada reservado.
+        """
+        hashes, refs, codes, _ = self._rows(payload)
+        ts = time.strftime(_TS_FORMAT)
+        seen, rows = set(), []
+        for h, r, c in zip(hashes, refs, codes):
+            if r not in seen: seen.add(r); rows.append((h, r, c, bank, ts))
+        refs_json = pd.Series(refs, dtype=object).to_json(orient="values")
+        con = self._connect()
+        try:
+            with con:
+                self._expire(con)
+                con.executemany("INSERT INTO pendientes (ref_hash, referencia, codigo, banco, ts) VALUES (?, ?, ?, ?, ?)", rows)
+                # La transacción ya tiene el bloqueo de escritura: ningún record() se cuela entre
+                # esta consulta y el commit
+                done = 0 if resend else con.execute(
+                    "SELECT COUNT(DISTINCT referencia) FROM envios WHERE referencia IN (SELECT value FROM json_each(?)) "
+                    "AND status BETWEEN 200 AND 299", (refs_json,)).fetchone()[0]
+                if done: raise AlreadySubmitted(f"{done} referencias ya se enviaron desde otra sesión; revise el payload.")
+        except sqlite3.IntegrityError:
+            busy = con.execute("SELECT COUNT(*) FROM pendientes WHERE referencia IN (SELECT value FROM json_each(?))",
+                               (refs_json,)).fetchone()[0]
+            raise SubmissionInProgress(f"{busy} referencias se están enviando desde otra sesión; reintente cuando termine.") from None
+        finally:
+            con.close()
+        return len(rows)
+
+    def record(self, payload: pd.DataFrame, bank: str, status) -> int:
+        """
+        Registra un envío: `status` es un HTTP status para todo el payload o uno por fila. En la
+        misma transacción libera la reserva de esas referencias. Devuelve las filas registradas
+        (las referencias vacías se omiten).
+        """
+        hashes, refs, codes, valid = self._rows(payload)
+        statuses = pd.Series(status if np.ndim(status) else [status] * len(payload), dtype=object)
+        ts = time.strftime(_TS_FORMAT)
+        rows = zip(hashes, refs, codes, [bank] * len(refs), [ts] * len(refs),
+                   [None if s is None or s != s else int(s) for s in statuses.to_numpy()[valid]])
+        with closing(self._connect()) as con, con:
+            con.executemany("INSERT INTO envios (ref_hash, referencia, codigo, banco, ts, status) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            con.execute("DELETE FROM pendientes WHERE referencia IN (SELECT value FROM json_each(?))",
+                        (pd.Series(refs, dtype=object).to_json(orient="values"),))
+        return len(refs)
+
+    def record_batches(self, payload: pd.DataFrame, report: list, bank: str) -> int:
+        """Registra un envío por lotes (post_in_batches): cada fila con el status de su lote."""
+        statuses = np.empty(len(payload), dtype=object)
+        for r in report:
+            statuses[r["desde"] - 1:r["hasta"]] = r["status"]
+        return self.record(payload, bank, statuses)
@@ -0,0 +1,57 @@
+"""Cruce de identificadores (DNI/CE) del PDF contra el Excel maestro mediante un índice invertido."""
+import numpy as np
+import pandas as pd
+
+from timing import stage
+
+ID_MIN_DIGITS = 6
+
+
+def detect_id_columns(df: pd.DataFrame, pattern=None) -> list:
+    """
+    Columnas candidatas a contener IDs. Sin `pattern`: las que tienen al menos un valor
+    formado solo por 6+ dígitos (el resto nunca coincide con un ID del PDF).
+    Con `pattern`: las que tienen algún valor donde el patrón aparece.
+    """
+    cols = []
+    for c in df.columns:
+        s = df[c].dropna().astype(str)
+        hit = s.str.contains(pattern) if pattern is not None else (s.str.len() >= ID_MIN_DIGITS) & s.str.isdigit()
+        if hit.any(): cols.append(c)
+    return cols
+
+
+def id_long_table(df: pd.DataFrame, id_cols: list = None, pattern=None) -> pd.DataFrame:
+    """
+    Formato largo (id, fila, col) de las columnas de ID, en orden de columna.
+    Sin `pattern` el ID es el valor completo de la celda; con `pattern` se extraen
+    todos los IDs que aparezcan dentro de cada celda.
+    """
+    cols = id_cols if id_cols is not None else detect_id_columns(df, pattern)
+    parts = []
+    for order, c in enumerate(cols):
+        s = df[c].dropna().astype(str)
+        if pattern is None:
+            ids, filas = s.to_numpy(), s.index.to_numpy()
+        else:
+            found = s.str.extractall(f"({pattern.pattern if hasattr(pattern, 'pattern') else pattern})")[0]
+            ids, filas = found.to_numpy(), found.index.get_level_values(0).to_numpy()
+        parts.append(pd.DataFrame({"id": ids, "fila": df.index.get_indexer(filas), "col": order}))
+    if not parts:
+        return pd.DataFrame({"id": pd.Series(dtype=object), "fila": pd.Series(dtype="int64"), "col": pd.Series(dtype="int64")})
+    return pd.concat(parts, ignore_index=True)
+
+
+def build_id_index(df: pd.DataFrame, id_cols: list = None, pattern=None) -> pd.Series:
+    """Índice invertido: Serie de posiciones de fila indexada por ID (construir una vez por archivo)."""
+    with stage("indice_ids", rows=len(df)):
+        long = id_long_table(df, id_cols, pattern)
+        return pd.Series(long["fila"].to_numpy(), index=pd.Index(long["id"].to_numpy(dtype=object)))
+
+
+def match_id_rows(index: pd.Series, ids) -> np.ndarray:
+    """Hash join del conjunto de IDs contra el índice; posiciones de fila únicas y ordenadas."""
+    if index.empty or not ids: return np.empty(0, dtype="int64")
+    with stage("cruce", rows=len(ids)):
+        indexer, _ = index.index.get_indexer_non_unique(pd.Index(list(ids), dtype=object))
+        return np.unique(index.to_numpy()[indexer[indexer >= 0]])
@@ -0,0 +1,313 @@
+"""Tablas de PDFs bancarios reconstruidas con coordenadas (palabras de PyMuPDF), sin Streamlit.
+
+En vez de adivinar filas a partir del texto plano, cada página se lee como palabras con su
+caja (x0, y0, x1, y1): la cabecera de la tabla fija dónde empieza cada columna y los números
+de la columna "No." marcan dónde empieza cada fila. Una celda que ocupa varias líneas
+(Situación o Titular partidos) queda en su columna y en la fila de arriba, porque se asigna
+por posición y no por orden de lectura. Las páginas se procesan de a una; una página sin
+cabecera (continuación) usa las columnas de la anterior.
+
+    for row in iter_table_rows(pdf_bytes, BBVA_COLUMNS):
+        row["docident"], row["situacion"], ...
+
+Para PDFs sin cabecera reconocible queda la heurística de texto de siempre
+(rows_from_text / id_situ_pairs_from_text).
+"""
+import re
+import unicodedata
+
+import numpy as np
+
+from pdf_utils import fitz
+from timing import stage
+
+# columna -> textos de cabecera aceptados (normalizados: sin tildes ni signos, en minúsculas)
+BBVA_COLUMNS = {
+    "no": ("no", "nro", "n"),
+    "cuenta": ("cuenta",),
+    "titular": ("titular", "nombre"),
+    "docident": ("docidentidad", "documento", "docident"),
+    "moneda": ("moneda",),
+    "importe": ("importe", "monto"),
+    "situacion": ("situacion",),
+}
+BBVA_REQUIRED = ("docident", "situacion")  # una línea es cabecera si tiene estas columnas
+HEADER_MAX_WORDS = 2  # "Doc. Identidad" puede venir en dos palabras
+ROW_TOLERANCE = 0.6  # fracción del alto de línea que una palabra puede quedar sobre el inicio de su fila
+ROW_MAX_LINES = 4  # líneas que puede ocupar la última fila de la página (corta pies y totales)
+
+ID_RE_PATTERN = re.compile(r"\b\d{6,9}\b")
+IMPORTE_RE = re.compile(r"\b\d{1,3}(?:[\.,]\d{3})*(?:[\.,]\d{2})\b")  # 1.234,56 ó 1234.56 ó 30.00
+RE_ROW_NO = re.compile(r"\d{1,6}")
+
+
+def _norm(s: str) -> str:
+    s = unicodedata.normalize("NFKD", s)
+    return re.sub(r"[^0-9a-z]", "", "".join(c for c in s if not unicodedata.combining(c)).lower())
+
+
+# -------------- Coordenadas --------------
+def _lines(words: list) -> list:
+    """Agrupa palabras en líneas visuales (centro vertical cercano), cada una ordenada por x."""
+    if not words: return []
+    words = sorted(words, key=lambda w: ((w[1] + w[3]) / 2, w[0]))
+    tol = 0.5 * float(np.median([w[3] - w[1] for w in words]))
+    lines, cur, cur_y = [], [words[0]], (words[0][1] + words[0][3]) / 2
+    for w in words[1:]:
+        y = (w[1] + w[3]) / 2
+        if y - cur_y > tol:
+            lines.append(sorted(cur, key=lambda w: w[0]))
+            cur, cur_y = [], y
+        cur.append(w)
+    lines.append(sorted(cur, key=lambda w: w[0]))
+    return lines
+
+
+def _header(line: list, columns: dict) -> dict:
+    """{columna: (x0, x1)} de los títulos de columna que aparecen en la línea."""
+    found = {}
+    i = 0
+    while i < len(line):
+        for n in range(min(HEADER_MAX_WORDS, len(line) - i), 0, -1):
+            text = _norm("".join(w[4] for w in line[i:i + n]))
+            col = next((c for c, labels in columns.items() if c not in found and text in labels), None)
+            if col:
+                found[col] = (line[i][0], line[i + n - 1][2])
+                i += n
+                break
+        else:
+            i += 1
+    return found
+
+
+def _layout(words: list, columns: dict, required: tuple):
+    """(límites entre columnas, nombres en orden, borde inferior de la cabecera) o None."""
+    for line in _lines(words):
+        found = _header(line, columns)
+        if len(found) >= 3 and all(c in found for c in required):
+            names = sorted(found, key=lambda c: found[c][0])
+            # Cada columna va desde el inicio de su título hasta el inicio del siguiente; las
+            # palabras se ubican por su centro, así un importe alineado a la derecha que empieza
+            # antes de su título sigue cayendo en su columna
+            bounds = np.array([found[c][0] for c in names[1:]])
+            return bounds, names, max(w[3] for w in line)
+    return None
+
+
+def _page_rows(words: list, bounds: np.ndarray, names: list, top: float, required: tuple) -> list:
+    """Filas de una página: cada palabra va a la columna de su centro y a la fila que empieza sobre ella."""
+    body = [w for w in words if w[1] >= top - 1]
+    if not body: return []
+    xs = np.array([(w[0] + w[2]) / 2 for w in body])
+    cols = np.searchsorted(bounds, xs)
+    height = float(np.median([w[3] - w[1] for w in body]))
+    # Cada fila empieza en un número de la columna "No." (sin ella, en un ID de Doc.Identidad)
+    anchor_col, anchor_re = (names.index("no"), RE_ROW_NO.fullmatch) if "no" in names else (names.index("docident"), ID_RE_PATTERN.search)
+    anchors = sorted({round(w[1], 1) for w, c in zip(body, cols) if c == anchor_col and anchor_re(w[4])})
+    if not anchors: return []
+    starts = np.array(anchors)
+    ys = np.array([w[1] for w in body])
+    idx = np.searchsorted(starts, ys + ROW_TOLERANCE * height, side="right") - 1
+    cells = [{} for _ in anchors]
+    for w, c, r, y in zip(body, cols, idx, ys):
+        if r < 0: continue
+        if r == len(anchors) - 1 and y > starts[-1] + ROW_MAX_LINES * height: continue
+        cells[r].setdefault(names[c], []).append(w)
+    # Dentro de la celda: por línea y luego por x. Una "fila" sin ninguna columna obligatoria
+    # es un número suelto fuera de la tabla (pie "Página 2", totales)
+    return [{c: " ".join(w[4] for w in sorted(ws, key=lambda w: (round(w[1]), w[0]))) for c, ws in cell.items()}
+            for cell in cells if any(c in cell for c in required)]
+
+
+def iter_table_rows(pdf_bytes: bytes, columns: dict = BBVA_COLUMNS, required: tuple = BBVA_REQUIRED):
+    """
+    Filas de la tabla, página por página: dicts {columna: texto de la celda, "pagina": n}.
+    Las páginas antes de la primera cabecera se saltan.
+    """
+    layout = None
+    with stage("pdf_tabla", nbytes=len(pdf_bytes)) as s, fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        n = 0
+        for page_no, page in enumerate(doc, 1):
+            words = page.get_text("words")
+            found = _layout(words, columns, required)
+            if found: layout = found
+            elif layout: layout = (layout[0], layout[1], 0.0)  # continuación: mismas columnas desde arriba
+            else: continue
+            for row in _page_rows(words, *layout, required):
+                row["pagina"] = page_no
+                n += 1
+                yield row
+        s.rows = n
+
+
+def bbva_table_rows(pdf_bytes: bytes) -> list:
+    """
+    Filas de la tabla BBVA con las claves de siempre (no, docident, importe, situacion, raw):
+    docident es el primer ID de su celda e importe el último importe de la suya.
+    """
+    out = []
+    for row in iter_table_rows(pdf_bytes):
+        ids = ID_RE_PATTERN.findall(row.get("docident", ""))
+        imps = IMPORTE_RE.findall(row.get("importe", ""))
+        out.append({
+            "no": row.get("no", ""),
+            "docident": ids[0] if ids else "",
+            "importe": imps[-1] if imps else "",
+            "situacion": " ".join(row.get("situacion", "").split()),
+            "raw": " | ".join(f"{c}: {v}" for c, v in row.items() if c != "pagina"),
+            "pagina": row["pagina"],
+        })
+    return out
+
+
+# -------------- Heurística de texto (respaldo) --------------
+def rows_from_text(text: str) -> list[dict]:
+    """
+    Heurística para reconstruir filas tabulares desde el texto extraído del PDF.
+    Devuelve una lista de dicts con posibles campos: { 'no', 'docident', 'importe', 'situacion', 'raw' }.
+    La función:
+    - localiza la línea de cabecera (contiene 'Cuenta' y 'Situación' o 'Doc.Identidad'),
+    - agrupa líneas siguientes en bloques por detección de índice secuencial o patrón de cuenta/ID/importe,
+    - intenta extraer dni/identificador e importe y la última columna como 'situacion'.
+    """
+    rows = []
+    if not text:
+        return rows
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+
+    # localizar índice de cabecera
+    header_idx = None
+    for i, ln in enumerate(lines):
+        low = ln.lower()
+        if ("cuenta" in low and "situac" in low) or ("doc.identidad" in low) or ("doc.identidad" in low.replace(" ", "")):
+            header_idx = i
+            break
+    if header_idx is None:
+        # fallback: buscar la primera línea con 'Situación' sola
+        for i, ln in enumerate(lines):
+            if re.search(r"situa", ln, flags=re.IGNORECASE):
+                header_idx = i
+                break
+    if header_idx is None:
+        return rows
+
+    # considerar las líneas que siguen a la cabecera como cuerpo de tabla
+    body = lines[header_idx + 1 :]
+
+    # heurística de agrupamiento: cada fila suele contener un número de registro al inicio
+    buffer = []
+    def flush_buffer(buf):
+        if not buf:
+            return None
+        text_block = " ".join(buf)
+        # extraer campos
+        no_match = re.search(r"\b(\d{1,4})\b", buf[0])  # primer token posible es No.
+        no = no_match.group(1) if no_match else ""
+        # dni/identificador
+        ids = ID_RE_PATTERN.findall(text_block)
+        docident = ids[0] if ids else ""
+        # importe: buscar última ocurrencia
+        imps = IMPORTE_RE.findall(text_block)
+        importe = imps[-1] if imps else ""
+        # situacion: tomar la última token en mayúsculas o palabras conocidas tras importe
+        situ = ""
+        # intentar tomar lo que viene después del importe en el bloque
+        if importe:
+            parts = re.split(re.escape(importe), text_block, maxsplit=1)
+            situ_candidate = parts[1].strip() if len(parts) > 1 else ""
+            # limpiar posibles separadores
+            situ = situ_candidate.split()[:8]  # límite longitud
+            situ = " ".join(situ).strip()
+        # si no hay importe, intentar detectar palabra clave situacion al final
+        if not situ:
+            # heurística simple: últimas palabras en mayúsculas
+            tail = text_block.split()[-6:]
+            tail_join = " ".join(tail)
+            if any(k.lower() in tail_join.lower() for k in ["DOCUMENTO", "CUENTA", "DOC.", "CANCELADA", "ERRADO", "INEXISTENTE", "REGISTRO"]):
+                situ = tail_join
+        return {
+            "no": no,
+            "docident": docident,
+            "importe": importe,
+            "situacion": situ,
+            "raw": text_block,
+        }
+
+    # agrupar líneas en bloques: si la línea comienza con número de fila -> nuevo bloque
+    for ln in body:
+        if re.match(r"^\d+\s*$", ln):  # línea que es solo número -> inicio de nuevo bloque
+            if buffer:
+                rec = flush_buffer(buffer)
+                if rec:
+                    rows.append(rec)
+                buffer = [ln]
+            else:
+                buffer = [ln]
+            continue
+        # línea que parece inicio de cuenta: contiene guiones tipo 0011-0814-02
+        if re.search(r"\d{4}-\d{4}-\d{2}", ln):
+            if buffer:
+                rec = flush_buffer(buffer)
+                if rec:
+                    rows.append(rec)
+                buffer = [ln]
+                continue
+        # si la línea contiene patrón de importe y buffer no vacío -> probablemente fin de fila
+        if IMPORTE_RE.search(ln) and buffer:
+            buffer.append(ln)
+            rec = flush_buffer(buffer)
+            if rec:
+                rows.append(rec)
+            buffer = []
+            continue
+        # agregar línea al buffer
+        buffer.append(ln)
+    # flush final
+    if buffer:
+        rec = flush_buffer(buffer)
+        if rec:
+            rows.append(rec)
+    return rows
+
+
+def id_situ_pairs_from_text(text: str) -> dict:
+    """
+    Heurística mejorada:
+    - buscar líneas que contengan 'situaci' (tolerante)
+    - buscar ids con el patrón ID_RE_PATTERN en la misma línea o en líneas adyacentes (-2..+2)
+    - devolver map id -> situacion_text (limpio)
+    """
+    pairs = {}
+    if not text:
+        return pairs
+    lines = [ln.rstrip() for ln in text.splitlines() if ln.strip()]
+    situ_pattern = re.compile(r"\bsituaci", flags=re.IGNORECASE)
+    for idx, ln in enumerate(lines):
+        if situ_pattern.search(ln):
+            # tomar parte después de ":" si existe
+            parts = re.split(r":", ln, maxsplit=1)
+            situ_val = parts[1].strip() if len(parts) > 1 else ln.strip()
+            ids_here = ID_RE_PATTERN.findall(ln)
+            if ids_here:
+                for i in ids_here:
+                    pairs[i] = situ_val
+                continue
+            # buscar ids en líneas cercanas
+            found = False
+            for rel in (-2, -1, 1, 2):
+                ni = idx + rel
+                if 0 <= ni < len(lines):
+                    ids_near = ID_RE_PATTERN.findall(lines[ni])
+                    if ids_near:
+                        for i in ids_near:
+                            pairs[i] = situ_val
+                        found = True
+                        break
+            if not found:
+                # intentar extraer id dentro de situ_val
+                ids_in_situ = ID_RE_PATTERN.findall(situ_val)
+                if ids_in_situ:
+                    for i in ids_in_situ:
+                        cleaned = re.sub(ID_RE_PATTERN, "", situ_val).strip()
+                        pairs[i] = cleaned
+    return pairs
@@ -0,0 +1,207 @@
+"""Extracción de texto de PDFs bancarios con PyMuPDF, cacheada por contenido."""
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+from cache_utils import LRUCache, content_key
+from timing import stage
+
+PDF_CACHE_MAX_ENTRIES = 16
+PDF_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Extracción por páginas en paralelo (PDF Detalle SCO / rechazos BCP de miles de páginas).
+# En serie salvo que PDF_WORKERS lo pida: la app corre dentro del servidor de Streamlit y un
+# fork ahí copia sus hilos y sockets a cada worker. CLI, daemon y benchmarks llaman a use_processes().
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", 0)) or 1
+PDF_PARALLEL_MIN_PAGES = 200  # por debajo de esto no compensa levantar procesos
+PDF_SHARDS_PER_WORKER = 4
+
+# Los pools arrancan workers limpios (forkserver / spawn): sus funciones son importables de este módulo
+_START_METHODS = multiprocessing.get_all_start_methods()
+PDF_START_METHOD = "forkserver" if "forkserver" in _START_METHODS else "spawn"
+
+
+def mp_context(method: str = None):
+    """Contexto de multiprocessing para los pools de extracción y de lotes."""
+    return multiprocessing.get_context(method or PDF_START_METHOD)
+
+
+def use_processes(workers: int = None, start_method: str = "fork"):
+    """
+    Para procesos sin Streamlit (CLI, daemon, benchmarks): extracción con `workers` procesos
+    (por defecto PDF_WORKERS del entorno o los núcleos) y pools arrancados con `start_method`.
+    """
+    global PDF_WORKERS, PDF_START_METHOD
+    PDF_WORKERS = workers or int(os.environ.get("PDF_WORKERS", 0)) or os.cpu_count() or 1
+    if start_method in _START_METHODS: PDF_START_METHOD = start_method
+
+# Un mismo PDF subido en BCP, BBVA o SCO (o en cada rerun) se parsea una sola vez por proceso
+_PAGES_CACHE = LRUCache(PDF_CACHE_MAX_ENTRIES, PDF_CACHE_MAX_BYTES)
+
+
+def _pages_nbytes(pages: tuple) -> int:
+    return sys.getsizeof(pages) + sum(sys.getsizeof(p) for p in pages)
+
+
+# Documento abierto una vez por worker a partir de los bytes compartidos
+_worker_doc = None
+
+
+def _init_worker(pdf_bytes: bytes):
+    global _worker_doc
+    _worker_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+
+
+def _extract_range(start: int, stop: int) -> list[str]:
+    return [_worker_doc[i].get_text() or "" for i in range(start, stop)]
+
+
+def _extract_parallel(pdf_bytes: bytes, page_count: int, workers: int) -> tuple[str, ...]:
+    step = max(1, -(-page_count // (workers * PDF_SHARDS_PER_WORKER)))
+    starts = list(range(0, page_count, step))
+    stops = [min(s + step, page_count) for s in starts]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context(),
+                             initializer=_init_worker, initargs=(pdf_bytes,)) as ex:
+        # map conserva el orden de los rangos -> páginas en orden
+        return tuple(t for part in ex.map(_extract_range, starts, stops) for t in part)
+
+
+def _extract_uncached(pdf_bytes: bytes, workers: int = None, min_pages: int = None) -> tuple[str, ...]:
+    workers = workers or PDF_WORKERS
+    min_pages = PDF_PARALLEL_MIN_PAGES if min_pages is None else min_pages
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        n = doc.page_count
+        if workers > 1 and n >= max(min_pages, 2):
+            try:
+                return _extract_parallel(pdf_bytes, n, min(workers, n))
+            except (OSError, BrokenProcessPool):
+                pass  # sin procesos disponibles: se sigue en serie
+        return tuple(p.get_text() or "" for p in doc)
+
+
+def extract_pdf_pages(pdf_bytes: bytes, workers: int = None, min_pages: int = None) -> tuple[str, ...]:
+    """
+    Devuelve el texto de cada página, en orden.
+    Con `workers` > 1 y al menos `min_pages` páginas, reparte rangos de páginas entre procesos.
+    """
+    with stage("pdf_extraccion", nbytes=len(pdf_bytes)) as s:
+        key = content_key(pdf_bytes)
+        pages = _PAGES_CACHE.get(key)
+        if pages is None:
+            pages = _extract_uncached(pdf_bytes, workers, min_pages)
+            _PAGES_CACHE.put(key, pages, _pages_nbytes(pages))
+        else:
+            s.note = "caché"
+        s.rows = len(pages)
+    return pages
+
+
+def extract_pdf_text(pdf_bytes: bytes) -> str:
+    return "".join(extract_pdf_pages(pdf_bytes))
+
+
+def pdf_cache_stats() -> dict:
+    """Aciertos/fallos y ocupación de la caché de texto de PDFs."""
+    return _PAGES_CACHE.stats()
+
+
+def clear_pdf_cache():
+    _PAGES_CACHE.clear()
+
+
+# -------------- Escaneo por páginas --------------
+SCAN_ALL, SCAN_FIRST = "all", "first"
+SCAN_OVERLAP = 256  # caracteres que se arrastran entre páginas; debe superar el largo de un match
+SCAN_CONTEXT = 16  # caracteres previos que se conservan como contexto (\b, lookbehind)
+
+
+def iter_pdf_pages(pdf_bytes: bytes):
+    """
+    Entrega el texto de las páginas bajo demanda. Si el PDF ya está en caché no se
+    vuelve a parsear; una lectura completa deja el PDF en caché.
+    """
+    key = content_key(pdf_bytes)
+    pages = _PAGES_CACHE.get(key)
+    if pages is not None:
+        yield from pages
+        return
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        read = []
+        for page in doc:
+            text = page.get_text() or ""
+            read.append(text)
+            yield text
+        pages = tuple(read)
+        _PAGES_CACHE.put(key, pages, _pages_nbytes(pages))
+
+
+def _scan_buffer(regex, buf: str, pos: int, final: bool) -> tuple[list, int]:
+    """
+    Matches seguros dentro de `buf` (desde `pos`) y posición desde la que se arrastra
+    texto a la siguiente página. Un match pegado al final (o en la zona de solape) se
+    difiere: podría continuar en la página siguiente (ej. 'Registro' | '123').
+    """
+    found = []
+    cut = len(buf) if final else max(pos, len(buf) - SCAN_OVERLAP)
+    for m in regex.finditer(buf, pos):
+        if not final and (m.start() >= cut or m.end() >= len(buf)):
+            cut = min(cut, m.start())
+            break
+        found.append(m)
+    if found:
+        cut = max(cut, found[-1].end())
+    return found, cut
+
+
+def scan_pdf(pdf_bytes: bytes, patterns: dict) -> dict:
+    """
+    Aplica patrones precompilados página a página sin armar el texto completo.
+    patterns: {nombre: (regex, modo)} con modo SCAN_ALL (lista de matches) o
+    SCAN_FIRST (primer match; deja de leer al encontrarlo).
+    """
+    with stage("pdf_escaneo", nbytes=len(pdf_bytes), note=", ".join(patterns)):
+        return _scan_pdf(pdf_bytes, patterns)
+
+
+def _scan_pdf(pdf_bytes: bytes, patterns: dict) -> dict:
+    result = {name: ([] if mode == SCAN_ALL else None) for name, (_, mode) in patterns.items()}
+    pending = {name: rx for name, (rx, _) in patterns.items()}
+    if not pending: return result
+    needs_all = any(mode == SCAN_ALL for _, mode in patterns.values())
+    # Si hay que leer todo, se usa la extracción cacheada/paralela; si no, lectura perezosa
+    pages = extract_pdf_pages(pdf_bytes) if needs_all else iter_pdf_pages(pdf_bytes)
+    carry = {name: ("", 0) for name in pending}
+    for text in pages:
+        for name in list(pending):
+            prev, pos = carry[name]
+            buf = prev + text
+            found, cut = _scan_buffer(pending[name], buf, pos, final=False)
+            # Se guardan unos caracteres previos al corte para que \b y similares vean su contexto
+            keep = max(0, cut - SCAN_CONTEXT)
+            carry[name] = (buf[keep:], cut - keep)
+            if patterns[name][1] == SCAN_ALL:
+                result[name].extend(found)
+            elif found:
+                result[name] = found[0]
+                del pending[name]
+        if not pending: break
+    for name, rx in pending.items():
+        found, _ = _scan_buffer(rx, *carry[name], final=True)
+        if patterns[name][1] == SCAN_ALL:
+            result[name].extend(found)
+        elif found:
+            result[name] = found[0]
+    if hasattr(pages, "close"): pages.close()
+    return result
+
+
+def findall_pdf(pdf_bytes: bytes, regex) -> list[str]:
+    """Equivalente a re.findall sobre el texto del PDF, recorriéndolo por páginas."""
+    return [m.group(1) if regex.groups else m.group(0) for m in scan_pdf(pdf_bytes, {"m": (regex, SCAN_ALL)})["m"]]
@@ -7,10 +7,10 @@ import requests
 import streamlit as st
 import pandas as pd
 
-try:
-    import fitz  # PyMuPDF
-except ImportError:
-    fitz = None
+from engine import CODE_DESC as ENGINE_CODE_DESC, IBK_MATCHER, map_situacion_to_code_bbva
+from matching import build_id_index, id_long_table, match_id_rows
+from pdf_tables import ID_RE_PATTERN, bbva_table_rows, id_situ_pairs_from_text, rows_from_text
+from pdf_utils import extract_pdf_text, fitz
 
 # -------------- Configuración --------------
 st.set_page_config(layout="centered", page_title="Rechazos MASIVOS Unificado")
@@ -41,16 +41,6 @@ BBVA_KEYWORDS = {
     "R007": ["REGISTRO CON ERRORES", "CUENTA NO ENCONTRADA"],
 }
 
-KEYWORDS_NO_TIT = [
-    "no es titular",
-    "beneficiario no",
-    "cliente no titular",
-    "no titular",
-    "continuar",
-    "puedes continuar",
-    "si deseas, puedes continuar",
-]
-
 OUT_COLS = [
     "dni/cex",
     "nombre",
@@ -152,227 +142,10 @@ def _extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
     if fitz is None:
         return ""
     try:
-        return "".join(p.get_text() or "" for p in fitz.open(stream=io.BytesIO(pdf_bytes), filetype="pdf"))
+        return extract_pdf_text(pdf_bytes)
     except Exception:
         return ""
 
-def _extract_id_situ_pairs_from_pdf_text(text: str) -> dict:
-    """
-    Intenta extraer pares identificador -> situacion desde el texto del PDF.
-    """
-    pairs = {}
-    if not text:
-        return pairs
-
-    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-    id_pattern = re.compile(r"\b\d{6,}\b")
-    situ_pattern = re.compile(r"\bsituaci[oó]n\b", flags=re.IGNORECASE)
-
-    for idx, ln in enumerate(lines):
-        if situ_pattern.search(ln):
-            parts = re.split(r":", ln, maxsplit=1)
-            situ_val = parts[1].strip() if len(parts) > 1 else ln.strip()
-            ids_here = id_pattern.findall(ln)
-            if ids_here:
-                for i in ids_here:
-                    pairs[i] = situ_val
-                continue
-            found = False
-            for rel in (-2, -1, 1, 2):
-                ni = idx + rel
-                if 0 <= ni < len(lines):
-                    ids_near = id_pattern.findall(lines[ni])
-                    if ids_near:
-                        for i in ids_near:
-                            pairs[i] = situ_val
-                        found = True
-                        break
-            if not found:
-                ids_in_situ = id_pattern.findall(situ_val)
-                if ids_in_situ:
-                    for i in ids_in_situ:
-                        pairs[i] = re.sub(r"\b\d{6,}\b", "", situ_val).strip()
-    return pairs
-
-def _normalize_situ_text(s: str) -> str:
-    if not s:
-        return ""
-    t = str(s).upper().strip()
-    # reemplazos simples y limpieza
-    t = t.replace("�", " ")  # caracteres raros
-    t = t.replace("·", " ")
-    t = re.sub(r"[\u2018\u2019\u201C\u201D]", '"', t)
-    # normalizaciones OCR comunes si las necesitas (opcional)
-    t = t.replace(" O ", " 0 ")
-    t = t.replace("O ", "0 ")
-    t = t.replace(" O", " 0")
-    # eliminar signos de puntuación salvo barra y guion (que a veces separan campos)
-    t = re.sub(r"[\,\.\:\;\(\)\[\]\"]+", " ", t)
-    # colapsar espacios y trim
-    t = re.sub(r"\s+", " ", t).strip()
-    return t
-
-# listas ampliadas de alias (puedes añadir variantes reales que observes)
-_BBVA_ALIASES = {
-    "R001": [
-        "DOC NO CORRESPONDE", "DOCUMENTO NO CORRESPONDE", "DOCUMENTO ERRADO",
-        "DOC NO CORRESPONDE REVISAR", "DNI NO COINCIDE", "DOC NO CORRESPONDE"
-    ],
-    "R002": [
-        "CUENTA INEXISTENTE", "CTA C/ERR NO IDENTIF", "CUENTA CANCELADA",
-        "CUENTA NO EXISTE", "INEXISTENTE", "CUENTA NO ENCONTRADA"
-    ],
-    "R007": [
-        "REGISTRO CON ERRORES", "CUENTA NO ENCONTRADA", "RECHAZO POR CCI",
-        "CCI INVALIDA", "CCI INCORRECTA"
-    ],
-}
-
-# precompilar variantes normalizadas para buscar por subcadena
-_BBVA_ALIAS_NORM = {
-    code: [ _normalize_situ_text(a) for a in aliases ]
-    for code, aliases in _BBVA_ALIASES.items()
-}
-
-def _map_situacion_to_code_bbva(s: str, diag: bool = False) -> tuple[str, str]:
-    """
-    Mapea un texto de 'Situación' a (codigo, descripcion) usando aliases tolerantes.
-    Prioridad: R001 -> R007 -> R002. Devuelve pareja canonical definida en CODE_DESC.
-    Si diag=True, devuelve también impresión de diagnóstico a st.write (no usado en producción).
-    """
-    norm = _normalize_situ_text(s)
-    # prioridad R001
-    for alias in _BBVA_ALIAS_NORM["R001"]:
-        if alias in norm:
-            return "R001", CODE_DESC["R001"]
-    # prioridad R007
-    for alias in _BBVA_ALIAS_NORM["R007"]:
-        if alias in norm:
-            return "R007", CODE_DESC["R007"]
-    # prioridad R002
-    for alias in _BBVA_ALIAS_NORM["R002"]:
-        if alias in norm:
-            return "R002", CODE_DESC["R002"]
-    # fallback: si contiene la palabra 'DOC' preferir R001
-    if "DOC" in norm or "DOCUMENTO" in norm or "DNI" in norm:
-        return "R001", CODE_DESC["R001"]
-    # otro fallback: si contiene 'CUENTA' preferir R002
-    if "CUENTA" in norm:
-        return "R002", CODE_DESC["R002"]
-    # por defecto R002
-    return "R002", CODE_DESC["R002"]
-# Helpers añadidos para BBVA (pega junto al resto de utilidades)
-ID_RE_PATTERN = re.compile(r"\b\d{6,9}\b")
-IMPORTE_RE = re.compile(r"\b\d{1,3}(?:[\.,]\d{3})*(?:[\.,]\d{2})\b")  # 1.234,56 ó 1234.56 ó 30.00
-
-def _reconstruct_rows_from_pdf_text(text: str) -> list[dict]:
-    """
-    Heurística para reconstruir filas tabulares desde el texto extraído del PDF.
-    Devuelve una lista de dicts con posibles campos: { 'no', 'cuenta', 'titular', 'docident', 'moneda', 'importe', 'situacion' }.
-    La función:
-    - localiza la línea de cabecera (contiene 'Cuenta' y 'Situación' o 'Doc.Identidad'),
-    - agrupa líneas siguientes en bloques por detección de índice secuencial o patrón de cuenta/ID/importe,
-    - intenta extraer dni/identificador e importe y la última columna como 'situacion'.
-    """
-    rows = []
-    if not text:
-        return rows
-    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-
-    # localizar índice de cabecera
-    header_idx = None
-    for i, ln in enumerate(lines):
-        low = ln.lower()
-        if ("cuenta" in low and "situac" in low) or ("doc.identidad" in low) or ("doc.identidad" in low.replace(" ", "")):
-            header_idx = i
-            break
-    if header_idx is None:
-        # fallback: buscar la primera línea con 'Situación' sola
-        for i, ln in enumerate(lines):
-            if re.search(r"situa", ln, flags=re.IGNORECASE):
-                header_idx = i
-                break
-    if header_idx is None:
-        return rows
-
-    # considerar las líneas que siguen a la cabecera como cuerpo de tabla
-    body = lines[header_idx + 1 :]
-
-    # heurística de agrupamiento: cada fila suele contener un número de registro al inicio
-    buffer = []
-    def flush_buffer(buf):
-        if not buf:
-            return None
-        text_block = " ".join(buf)
-        # extraer campos
-        no_match = re.search(r"\b(\d{1,4})\b", buf[0])  # primer token posible es No.
-        no = no_match.group(1) if no_match else ""
-        # dni/identificador
-        ids = ID_RE_PATTERN.findall(text_block)
-        docident = ids[0] if ids else ""
-        # importe: buscar última ocurrencia
-        imps = IMPORTE_RE.findall(text_block)
-        importe = imps[-1] if imps else ""
-        # situacion: tomar la última token en mayúsculas o palabras conocidas tras importe
-        situ = ""
-        # intentar tomar lo que viene después del importe en el bloque
-        if importe:
-            parts = re.split(re.escape(importe), text_block, maxsplit=1)
-            situ_candidate = parts[1].strip() if len(parts) > 1 else ""
-            # limpiar posibles separadores
-            situ = situ_candidate.split()[:8]  # límite longitud
-            situ = " ".join(situ).strip()
-        # si no hay importe, intentar detectar palabra clave situacion al final
-        if not situ:
-            # heurística simple: últimas palabras en mayúsculas
-            tail = text_block.split()[-6:]
-            tail_join = " ".join(tail)
-            if any(k.lower() in tail_join.lower() for k in ["DOCUMENTO", "CUENTA", "DOC.", "CANCELADA", "ERRADO", "INEXISTENTE", "REGISTRO"]):
-                situ = tail_join
-        return {
-            "no": no,
-            "docident": docident,
-            "importe": importe,
-            "situacion": situ,
-            "raw": text_block,
-        }
-
-    # agrupar líneas en bloques: si la línea comienza con número de fila -> nuevo bloque
-    for ln in body:
-        if re.match(r"^\d+\s*$", ln):  # línea que es solo número -> inicio de nuevo bloque
-            if buffer:
-                rec = flush_buffer(buffer)
-                if rec:
-                    rows.append(rec)
-                buffer = [ln]
-            else:
-                buffer = [ln]
-            continue
-        # línea que parece inicio de cuenta: contiene guiones tipo 0011-0814-02
-        if re.search(r"\d{4}-\d{4}-\d{2}", ln):
-            if buffer:
-                rec = flush_buffer(buffer)
-                if rec:
-                    rows.append(rec)
-                buffer = [ln]
-                continue
-        # si la línea contiene patrón de importe y buffer no vacío -> probablemente fin de fila
-        if IMPORTE_RE.search(ln) and buffer:
-            buffer.append(ln)
-            rec = flush_buffer(buffer)
-            if rec:
-                rows.append(rec)
-            buffer = []
-            continue
-        # agregar línea al buffer
-        buffer.append(ln)
-    # flush final
-    if buffer:
-        rec = flush_buffer(buffer)
-        if rec:
-            rows.append(rec)
-    return rows
-
 # -------------- Flujos --------------
 def tab_pre_bcp_xlsx():
     st.header("Antigua manera de rechazar con PDF")
@@ -507,15 +280,8 @@ def tab_rechazo_ibk():
             })
             df_out["Estado"] = ESTADO
             # Conservador: IBK mantiene R016 para no-titulares; si deseas limitar a los 3 globales, cambia aquí
-            df_out["Codigo de Rechazo"] = [
-                "R016" if any(k in str(o).lower() for k in KEYWORDS_NO_TIT) else "R002"
-                for o in df_valid.iloc[:, 14]
-            ]
-            df_out["Descripcion de Rechazo"] = [
-                "CLIENTE NO TITULAR DE LA CUENTA" if any(k in str(o).lower() for k in KEYWORDS_NO_TIT)
-                else "CUENTA INVALIDA"
-                for o in df_valid.iloc[:, 14]
-            ]
+            df_out["Codigo de Rechazo"] = IBK_MATCHER.classify_series(df_valid.iloc[:, 14]).to_numpy()
+            df_out["Descripcion de Rechazo"] = df_out["Codigo de Rechazo"].map(ENGINE_CODE_DESC)
             df_out = df_out[OUT_COLS]
 
             cnt, total = _count_and_sum(df_out)
@@ -547,8 +313,7 @@ def tab_post_bcp_xlsx():
 
             df_raw = pd.read_excel(ex_file, dtype=str)
             if docs:
-                mask = df_raw.astype(str).apply(lambda col: col.isin(docs)).any(axis=1)
-                df_temp = df_raw.loc[mask].reset_index(drop=True)
+                df_temp = df_raw.iloc[match_id_rows(build_id_index(df_raw), docs)].reset_index(drop=True)
             else:
                 st.error("No se detectaron identificadores en el PDF. Adjunte un PDF válido.")
                 return
@@ -584,9 +349,6 @@ def tab_post_bcp_xlsx():
 
 # --- Reemplazar/insertar en tu streamlit_app.py: funciones utilitarias y tab_bbva actualizado ---
 
-# tolerancia ampliada para ids
-ID_RE_PATTERN = re.compile(r"\b\d{6,9}\b")
-
 def _find_situacion_column_in_df(df: pd.DataFrame) -> str | None:
     """
     Busca variantes comunes del encabezado 'situacion' (tildes, :, paréntesis, sufijos).
@@ -603,48 +365,6 @@ def _find_situacion_column_in_df(df: pd.DataFrame) -> str | None:
             return col
     return None
 
-def _extract_id_situ_pairs_from_pdf_text(text: str) -> dict:
-    """
-    Heurística mejorada:
-    - buscar líneas que contengan 'situaci' (tolerante)
-    - buscar ids con el patrón ID_RE_PATTERN en la misma línea o en líneas adyacentes (-2..+2)
-    - devolver map id -> situacion_text (limpio)
-    """
-    pairs = {}
-    if not text:
-        return pairs
-    lines = [ln.rstrip() for ln in text.splitlines() if ln.strip()]
-    situ_pattern = re.compile(r"\bsituaci", flags=re.IGNORECASE)
-    for idx, ln in enumerate(lines):
-        if situ_pattern.search(ln):
-            # tomar parte después de ":" si existe
-            parts = re.split(r":", ln, maxsplit=1)
-            situ_val = parts[1].strip() if len(parts) > 1 else ln.strip()
-            ids_here = ID_RE_PATTERN.findall(ln)
-            if ids_here:
-                for i in ids_here:
-                    pairs[i] = situ_val
-                continue
-            # buscar ids en líneas cercanas
-            found = False
-            for rel in (-2, -1, 1, 2):
-                ni = idx + rel
-                if 0 <= ni < len(lines):
-                    ids_near = ID_RE_PATTERN.findall(lines[ni])
-                    if ids_near:
-                        for i in ids_near:
-                            pairs[i] = situ_val
-                        found = True
-                        break
-            if not found:
-                # intentar extraer id dentro de situ_val
-                ids_in_situ = ID_RE_PATTERN.findall(situ_val)
-                if ids_in_situ:
-                    for i in ids_in_situ:
-                        cleaned = re.sub(ID_RE_PATTERN, "", situ_val).strip()
-                        pairs[i] = cleaned
-    return pairs
-
 # Tab BBVA con diagnóstico
 def tab_bbva():
     st.header("BBVA")
@@ -663,8 +383,10 @@ def tab_bbva():
                 st.subheader("Diagnóstico: texto extraído (primeros 8000 chars)")
                 st.text(text[:8000])
 
-            # intentar reconstruir filas tabulares desde texto del PDF
-            reconstructed = _reconstruct_rows_from_pdf_text(text)
+            # filas de la tabla por coordenadas (No., Cuenta, Doc.Identidad, Importe, Situación);
+            # si el PDF no trae una cabecera reconocible, heurística sobre el texto
+            reconstructed = bbva_table_rows(pdf_bytes) if fitz is not None else []
+            if not reconstructed: reconstructed = rows_from_text(text)
             if enable_diag:
                 st.subheader("Filas reconstruidas (muestras, primero 20)")
                 st.write(reconstructed[:20])
@@ -684,8 +406,7 @@ def tab_bbva():
                 st.error("No se detectaron identificadores en el PDF tras reconstrucción. Adjunte un PDF válido o habilite OCR.")
                 return
 
-            mask = df_raw.astype(str).apply(lambda col: col.isin(docs)).any(axis=1)
-            df_temp = df_raw.loc[mask].reset_index(drop=True)
+            df_temp = df_raw.iloc[match_id_rows(build_id_index(df_raw), docs)].reset_index(drop=True)
             if df_temp.empty:
                 st.warning("No se encontraron filas en el Excel que coincidan con los identificadores del PDF.")
                 if enable_diag:
@@ -709,7 +430,7 @@ def tab_bbva():
 
             # si no hay id->situacion desde filas reconstruidas, intentar heurística anterior (buscar 'situaci' y id cercanos)
             if not id_situ_map:
-                id_situ_map = _extract_id_situ_pairs_from_pdf_text(text)
+                id_situ_map = id_situ_pairs_from_text(text)
                 if enable_diag:
                     st.subheader("Mapa id -> situacion detectado (fallback heurística)")
                     st.write(id_situ_map)
@@ -722,19 +443,12 @@ def tab_bbva():
             situaciones_alineadas = []
             situ_source = None
             if id_situ_map:
-                for _, row in df_temp.iterrows():
-                    matched = ""
-                    for cell in row.astype(str).values:
-                        ids_here = ID_RE_PATTERN.findall(cell)
-                        found = None
-                        for iid in ids_here:
-                            if iid in id_situ_map:
-                                found = iid
-                                break
-                        if found:
-                            matched = id_situ_map.get(found, "")
-                            break
-                    situaciones_alineadas.append(matched)
+                # primer ID (en orden de columnas y dentro de la celda) de cada fila con situación conocida
+                long = id_long_table(df_temp, pattern=ID_RE_PATTERN)
+                long = long[long["id"].isin(list(id_situ_map))]
+                first = long.sort_values(["fila", "col"], kind="stable").drop_duplicates("fila")
+                situ_by_row = dict(zip(first["fila"], first["id"].map(id_situ_map)))
+                situaciones_alineadas = [situ_by_row.get(i, "") for i in range(len(df_temp))]
                 situ_source = "pdf_reconstructed_pairs"
             elif situ_col:
                 situaciones_alineadas = df_temp[situ_col].astype(str).fillna("").tolist()
@@ -769,7 +483,7 @@ def tab_bbva():
             descs = []
             for s in situaciones_alineadas:
                 if s and s.strip():
-                    code_m, desc_m = _map_situacion_to_code_bbva(s)
+                    code_m, desc_m = map_situacion_to_code_bbva(s)
                 else:
                     code_m, desc_m = code_ui, desc_ui
                 cods.append(code_m)
@@ -0,0 +1,73 @@
+"""Reglas declarativas texto -> código de rechazo (Situación BBVA, errores SCO, observaciones IBK).
+
+Cada banco describe sus reglas como datos (código, alias, prioridad, modo) y RuleMatcher las
+compila en una sola regex: una alternativa por regla, en orden de prioridad, cada una como
+lookahead anclado al inicio. La primera alternativa que encaja es la regla de mayor
+prioridad, así que un solo `match` por texto basta aunque haya decenas de alias.
+
+El resultado se recuerda por texto normalizado (LRU): un reporte trae pocas situaciones
+distintas, y classify_series además evalúa una sola vez cada valor distinto de la columna.
+
+    SCO_MATCHER = RuleMatcher([Rule("R017", ("Abono AFP",))], default="R002", normalize=str.strip)
+    SCO_MATCHER.classify("Abono AFP no permitido")  # -> "R017"
+"""
+import functools
+import re
+from typing import Callable, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+RULE_CACHE_SIZE = 4096  # textos normalizados distintos recordados entre archivos
+MODES = ("exact", "substring", "regex")
+
+
+class Rule(NamedTuple):
+    """`aliases` se comparan contra el texto normalizado; con modo "regex" son patrones."""
+    code: str
+    aliases: tuple
+    priority: int = 0  # menor = se evalúa antes; a igual prioridad, el orden de la lista
+    mode: str = "substring"
+
+
+class RuleMatcher:
+    """Clasificador compilado de una tabla de reglas; textos sin regla -> `default`."""
+
+    def __init__(self, rules: list, default: str, normalize: Callable[[str], str] = str.lower,
+                 cache_size: int = RULE_CACHE_SIZE):
+        self.default = default
+        self.normalize = normalize
+        self.rules = sorted(rules, key=lambda r: r.priority)  # sorted es estable
+        alts = []
+        for i, rule in enumerate(self.rules):
+            if rule.mode not in MODES: raise ValueError(f"Modo de regla desconocido: {rule.mode}")
+            # Alias literales pasan por la misma normalización que el texto; las regex se usan tal cual
+            pats = [a if rule.mode == "regex" else re.escape(normalize(a)) for a in rule.aliases]
+            body = "|".join(f"(?:{p})" for p in pats)
+            alts.append(f"(?=(?P<r{i}>{body})\\Z)" if rule.mode == "exact" else f"(?=.*?(?P<r{i}>{body}))")
+        self._rx = re.compile("|".join(alts), re.DOTALL) if alts else None
+        # Dos niveles: texto crudo (evita normalizar de nuevo) y texto normalizado (variantes
+        # de mayúsculas / puntuación de una misma situación se evalúan una vez)
+        self._by_norm = functools.lru_cache(maxsize=cache_size)(self._classify_norm)
+        self.classify = functools.lru_cache(maxsize=cache_size)(self._classify)
+
+    def _classify_norm(self, norm: str) -> str:
+        m = self._rx.match(norm) if self._rx else None
+        if not m: return self.default
+        # lastgroup es la alternativa que encajó (un grupo sin nombre dentro de una regex la taparía)
+        name = m.lastgroup if m.lastgroup and m.lastgroup[0] == "r" else next(k for k, v in m.groupdict().items() if v is not None)
+        return self.rules[int(name[1:])].code
+
+    def _classify(self, text: str) -> str:
+        return self._by_norm(self.normalize(text))
+
+    def classify_series(self, values: pd.Series) -> pd.Series:
+        """Código por fila; se evalúa una vez por valor distinto."""
+        codes, uniques = pd.factorize(values)
+        # Los nulos (-1) toman el último elemento: str(nan), como el flujo original
+        mapped = np.array([self.classify(str(u)) for u in uniques] + [self.classify(str(np.nan))], dtype=object)
+        return pd.Series(mapped[codes], index=values.index).astype(str)
+
+    def cache_info(self):
+        """Aciertos del caché por texto normalizado."""
+        return self._by_norm.cache_info()
@@ -0,0 +1,125 @@
+"""Política de reintentos del envío contra un endpoint local (http.server en un hilo)."""
+import http.server
+import os
+import socket
+import sys
+import threading
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_client  # noqa: E402
+
+
+class _Endpoint(http.server.ThreadingHTTPServer):
+    """Responde cada POST con la siguiente (status, headers) de `script`; repite la última."""
+
+    def __init__(self, script):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.script = list(script)
+        self.posts = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        srv = self.server
+        status, headers = srv.script[min(srv.posts, len(srv.script) - 1)]
+        srv.posts += 1
+        body = f"respuesta {srv.posts}".encode()
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def endpoint():
+    servers = []
+
+    def start(*script):
+        srv = _Endpoint(script)
+        threading.Thread(target=srv.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        servers.append(srv)
+        return srv
+
+    yield start
+    for srv in servers:
+        srv.shutdown()
+        srv.server_close()
+
+
+def _post(url: str, **kw):
+    return api_client._post_with_retry(api_client.make_session(1), url, b"xlsx", retries=3, backoff=0,
+                                       timeout=(5, 5), **kw)
+
+
+def test_503_with_retry_after_then_200(endpoint):
+    srv = endpoint((503, {"Retry-After": "0"}), (200, {}))
+    r = _post(srv.url)
+    assert (r["status"], r["intentos"], srv.posts) == (200, 2, 2)
+    assert r["respuesta"] == "respuesta 2"
+
+
+def test_429_with_http_date_retry_after(endpoint):
+    srv = endpoint((429, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}), (200, {}))
+    assert _post(srv.url)["status"] == 200
+    assert srv.posts == 2
+
+
+@pytest.mark.parametrize("status", [500, 502, 504])
+def test_server_errors_are_not_retried_by_default(endpoint, status):
+    srv = endpoint((status, {}), (200, {}))
+    r = _post(srv.url)
+    assert (r["status"], r["intentos"], srv.posts) == (status, 1, 1)
+
+
+def test_503_without_retry_after_is_reported(endpoint):
+    srv = endpoint((503, {}), (200, {}))
+    assert _post(srv.url)["status"] == 503
+    assert srv.posts == 1
+
+
+def test_retry_after_above_limit_is_reported(endpoint):
+    srv = endpoint((503, {"Retry-After": str(api_client.POST_RETRY_AFTER_MAX + 1)}), (200, {}))
+    assert _post(srv.url)["status"] == 503
+    assert srv.posts == 1
+
+
+def test_retry_unsafe_opt_in(endpoint):
+    srv = endpoint((500, {}), (502, {}), (200, {}))
+    r = _post(srv.url, retry_unsafe=True)
+    assert (r["status"], r["intentos"], srv.posts) == (200, 3, 3)
+
+
+def test_retries_are_bounded(endpoint):
+    srv = endpoint((503, {"Retry-After": "0"}))
+    r = _post(srv.url)
+    assert (r["status"], r["intentos"], srv.posts) == (503, 4, 4)
+
+
+def test_connection_refused_is_retried():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]  # puerto libre: nadie escucha al cerrarlo
+    r = _post(f"http://127.0.0.1:{port}/")
+    assert r["status"] is None and r["intentos"] == 4
+    assert r["error"]
+
+
+def test_post_in_batches_reports_each_batch(endpoint):
+    srv = endpoint((503, {"Retry-After": "0"}), (200, {}))
+    df = pd.DataFrame({"Referencia": [f"R{i}" for i in range(5)]})
+    report = api_client.post_in_batches(df, srv.url, batch_rows=5, max_workers=1, backoff=0)
+    assert [(r["desde"], r["hasta"], r["status"], r["intentos"], r["ok"]) for r in report] == [(1, 5, 200, 2, True)]
@@ -0,0 +1,37 @@
+"""Emparejado de archivos por nombre en el procesamiento por lotes."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import pair_files  # noqa: E402
+
+
+def _pairs(flow: str, names: list) -> tuple:
+    jobs, left = pair_files(flow, names)
+    return sorted(tuple(sorted(j["files"].values())) for j in jobs), left
+
+
+def test_same_stem_then_unique_prefix():
+    pairs, left = _pairs("pre-bcp-txt", ["lote_0412.pdf", "LOTE-0412_masivo.txt", "B.pdf", "b.TXT", "notas.doc"])
+    assert pairs == [("B.pdf", "b.TXT"), ("LOTE-0412_masivo.txt", "lote_0412.pdf")]
+    assert left == ["notas.doc"]
+
+
+def test_ambiguous_prefix_is_not_paired():
+    pairs, left = _pairs("pre-bcp-txt", ["lote.pdf", "lote_a.txt", "lote_b.txt", "otro.pdf"])
+    assert pairs == [] and left == ["lote.pdf", "lote_a.txt", "lote_b.txt", "otro.pdf"]
+
+
+def test_empty_normalized_stem_pairs_with_nothing():
+    # '___' y '-' quedan vacíos al normalizar: no son prefijo de ningún nombre
+    names = ["lote_0412.pdf", "___.txt", "otro.txt", "-.pdf"]
+    pairs, left = _pairs("pre-bcp-txt", names)
+    assert pairs == [] and left == sorted(names)
+    pairs, left = _pairs("sco", ["dia.pdf", "dia.txt", "__.xls", "errores.xls"])
+    assert pairs == [] and left == ["__.xls", "dia.pdf", "dia.txt", "errores.xls"]
+
+
+def test_single_file_per_role_is_paired():
+    pairs, left = _pairs("bbva", ["reporte.pdf", "___.xlsx"])
+    assert pairs == [("___.xlsx", "reporte.pdf")] and left == []
@@ -0,0 +1,69 @@
+"""Descubrimiento de jobs del daemon: nombres de salida por contenido y grupos incompletos."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import daemon  # noqa: E402
+
+
+def _drop(root, bank: str, name: str, data: bytes):
+    folder = root / bank
+    folder.mkdir(parents=True, exist_ok=True)
+    (folder / name).write_bytes(data)
+
+
+def _take(root, ledger, **kw) -> list:
+    jobs = daemon.discover_jobs(root, ledger, set(), 0, **kw)
+    for job in jobs:
+        ledger.record(job["keys"], job["name"], "ok", flujo=job["flow"])
+    return jobs
+
+
+def test_same_name_new_content_gets_its_own_output(tmp_path):
+    ledger = daemon.ProcessedLedger(tmp_path / "registro.jsonl")
+    _drop(tmp_path, "IBK", "rechazos.zip", b"lunes")
+    first = _take(tmp_path, ledger)
+    _drop(tmp_path, "IBK", "rechazos.zip", b"martes")
+    second = _take(tmp_path, ledger)
+    assert [j["flow"] for j in first + second] == ["ibk", "ibk"]
+    assert first[0]["name"].startswith("IBK_rechazos_") and first[0]["name"] != second[0]["name"]
+    assert _take(tmp_path, ledger) == []
+
+
+def test_new_file_next_to_processed_ones_forms_its_own_job(tmp_path):
+    ledger = daemon.ProcessedLedger(tmp_path / "registro.jsonl")
+    _drop(tmp_path, "BCP", "lote.xlsx", b"masivo")
+    assert [j["flow"] for j in _take(tmp_path, ledger)] == ["bcp"]
+    # Llegan el PDF y el TXT del mismo lote: el Excel ya procesado no entra en el grupo
+    _drop(tmp_path, "BCP", "lote.pdf", b"pdf")
+    _drop(tmp_path, "BCP", "lote.txt", b"txt")
+    (job,) = _take(tmp_path, ledger)
+    assert job["flow"] == "pre-bcp-txt" and set(job["files"]) == {"pdf", "txt"} and len(job["keys"]) == 2
+
+
+def test_new_file_completes_a_group_with_processed_ones(tmp_path):
+    ledger = daemon.ProcessedLedger(tmp_path / "registro.jsonl")
+    for name in ("lote.pdf", "lote.txt", "lote.xls"):
+        _drop(tmp_path, "SCO", name, name.encode())
+    _take(tmp_path, ledger)
+    _drop(tmp_path, "SCO", "lote.xls", b"xls corregido")
+    (job,) = _take(tmp_path, ledger)
+    assert job["flow"] == "sco" and set(job["files"]) == {"pdf", "txt", "xls"}
+
+
+def test_group_without_flow_is_logged_once(tmp_path):
+    ledger = daemon.ProcessedLedger(tmp_path / "registro.jsonl")
+    _drop(tmp_path, "BBVA", "lote.pdf", b"pdf")
+    _drop(tmp_path, "BBVA", "lote.txt", b"txt")
+    warned, msgs = set(), []
+    for _ in range(3):
+        assert _take(tmp_path, ledger, warned=warned, log=msgs.append) == []
+    assert len(msgs) == 1 and msgs[0].startswith("[sin_flujo] BBVA/lote")
+    # Completado el grupo, se toma; un archivo nuevo sin flujo se vuelve a avisar
+    (tmp_path / "BBVA" / "lote.txt").unlink()
+    _drop(tmp_path, "BBVA", "lote.xlsx", b"xlsx")
+    assert [j["flow"] for j in _take(tmp_path, ledger, warned=warned, log=msgs.append)] == ["bbva"]
+    _drop(tmp_path, "BBVA", "lote.txt", b"otro txt")
+    _take(tmp_path, ledger, warned=warned, log=msgs.append)
+    assert len(msgs) == 2
@@ -0,0 +1,149 @@
+"""EditDeltas: editar por páginas debe dar la misma tabla que editar la tabla completa."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from editing import EditDeltas, filter_labels  # noqa: E402
+
+PAGE = 10
+
+
+def _base(n: int = 30) -> pd.DataFrame:
+    return pd.DataFrame({
+        "dni/cex": [f"{40000000 + i}" for i in range(n)],
+        "nombre": [f"Persona {i}" for i in range(n)],
+        "importe": np.round(np.arange(n) * 10.5, 2),
+        "Referencia": [f"REF{i:04d}" for i in range(n)],
+        "Motivo de Rechazo": ["R001 - Cuenta" if i % 3 else "R002 - Cancelada" for i in range(n)],
+        "Estado": "RECHAZADO",
+    })
+
+
+def _editor(page: pd.DataFrame, edits: dict = None, deleted: list = (), added: list = ()) -> tuple:
+    """
+    Lo que deja st.data_editor: el estado (posiciones) y la página con los cambios aplicados;
+    como en Streamlit, las filas añadidas siguen el RangeIndex que queda tras borrar.
+    """
+    edits = edits or {}
+    df = page.copy()
+    for pos, changes in edits.items():
+        for col, v in changes.items(): df.iat[pos, df.columns.get_loc(col)] = v
+    df = df.drop(df.index[list(deleted)])
+    stop = df.index.stop if isinstance(df.index, pd.RangeIndex) else int(df.index.max()) + 1
+    for i, row in enumerate(added):
+        df.loc[stop + i] = pd.Series(row, index=df.columns)
+    state = {"edited_rows": {str(p): dict(c) for p, c in edits.items()}, "deleted_rows": list(deleted),
+             "added_rows": [dict(r) for r in added]}
+    return state, df
+
+
+class _Whole:
+    """Referencia: los mismos cambios aplicados directamente sobre la tabla completa."""
+
+    def __init__(self, base: pd.DataFrame):
+        self.df = base.copy()
+        self.next_label = len(base)
+
+    def apply(self, labels, edits: dict = None, deleted: list = (), added: list = ()):
+        for pos, changes in (edits or {}).items():
+            if pos in deleted: continue
+            for col, v in changes.items(): self.df.loc[labels[pos], col] = v
+        self.df = self.df.drop([labels[p] for p in deleted])
+        for row in added:
+            self.df.loc[self.next_label] = pd.Series(row, index=self.df.columns)
+            self.next_label += 1
+
+
+def _edit(deltas: EditDeltas, whole: _Whole, labels, **changes) -> EditDeltas:
+    labels = np.asarray(labels)
+    state, edited = _editor(deltas.page(labels), **changes)
+    whole.apply(labels, **changes)
+    return deltas.with_page(labels, state, edited)
+
+
+def _check(deltas: EditDeltas, whole: _Whole):
+    got = deltas.frame()
+    pd.testing.assert_frame_equal(got, whole.df, check_dtype=False)
+    assert len(deltas) == len(whole.df)
+    assert deltas.total() == pytest.approx(whole.df["importe"].sum())
+
+
+NEW = {"dni/cex": "70000001", "nombre": "Nueva", "importe": 99.5, "Referencia": "NUEVA1",
+       "Motivo de Rechazo": "R016 - No titular", "Estado": "RECHAZADO"}
+
+
+def test_pages_rebuild_same_frame_as_whole_table():
+    base = _base()
+    deltas, whole = EditDeltas(base), _Whole(base)
+    # Página 1: celdas, borrado de las últimas filas y una fila añadida en el mismo rerun
+    deltas = _edit(deltas, whole, range(0, PAGE), edits={2: {"importe": 1.25}, 5: {"Motivo de Rechazo": "R016 - No titular"}},
+                   deleted=[7, 9], added=[NEW])
+    _check(deltas, whole)
+    # Página 3: una celda editada y después borrada en el mismo rerun no deja delta
+    deltas = _edit(deltas, whole, range(20, 30), edits={0: {"Referencia": "X"}, 3: {"nombre": "Otro"}}, deleted=[0])
+    _check(deltas, whole)
+    assert 20 not in deltas.cells
+    # Vista filtrada que mezcla páginas y la fila añadida: se edita la añadida y se borra una base
+    labels = filter_labels(deltas.frame(), motivos=["R016 - No titular"])
+    assert 30 in labels
+    pos_new = int(np.flatnonzero(labels == 30)[0])
+    deltas = _edit(deltas, whole, labels, edits={pos_new: {"importe": 5.0}}, deleted=[0], added=[dict(NEW, Referencia="NUEVA2")])
+    _check(deltas, whole)
+    # La misma vista otra vez: se borra la fila añadida (deja de existir, no queda como borrada)
+    labels = filter_labels(deltas.frame(), motivos=["R016 - No titular"])
+    deltas = _edit(deltas, whole, labels, deleted=[int(np.flatnonzero(labels == 30)[0])])
+    _check(deltas, whole)
+    assert 30 not in deltas.added and 30 not in deltas.deleted
+    # Volver una celda a su valor base elimina el delta
+    deltas = _edit(deltas, whole, range(0, PAGE - 2), edits={2: {"importe": float(base.at[2, "importe"])}})
+    _check(deltas, whole)
+    assert 2 not in deltas.cells
+
+
+def test_paged_edits_match_single_whole_table_edit():
+    base = _base()
+    paged = EditDeltas(base)
+    for start, pos in ((0, 1), (10, 4), (20, 9)):
+        labels = np.arange(start, start + PAGE)
+        state, edited = _editor(paged.page(labels), edits={pos: {"nombre": f"Editado {start}"}}, deleted=[pos - 1])
+        paged = paged.with_page(labels, state, edited)
+    full = EditDeltas(base)
+    labels = full.labels()
+    state, edited = _editor(full.page(labels), edits={1: {"nombre": "Editado 0"}, 14: {"nombre": "Editado 10"},
+                                                      29: {"nombre": "Editado 20"}}, deleted=[0, 13, 28])
+    full = full.with_page(labels, state, edited)
+    pd.testing.assert_frame_equal(paged.frame(), full.frame())
+    assert paged.fingerprint() == full.fingerprint()
+
+
+def test_fingerprint_changes_on_every_edit():
+    base = _base()
+    deltas = EditDeltas(base)
+    labels = np.arange(PAGE)
+    steps = [
+        {"edits": {0: {"importe": 1.0}}},
+        {"edits": {0: {"importe": 2.0}}},
+        {"edits": {1: {"Motivo de Rechazo": "R016 - No titular"}}},
+        {"deleted": [3]},
+        {"added": [NEW]},
+        {"added": [dict(NEW, nombre="Otra")]},
+    ]
+    prints = [deltas.fingerprint()]
+    for step in steps:
+        page_labels = deltas.labels()[:PAGE]
+        state, edited = _editor(deltas.page(page_labels), **step)
+        deltas = deltas.with_page(page_labels, state, edited)
+        prints.append(deltas.fingerprint())
+    assert len(set(prints)) == len(prints)
+    # Sin cambios en el estado del editor: misma instancia, misma huella
+    state, edited = _editor(deltas.page(labels))
+    assert deltas.with_page(labels, state, edited) is deltas
+    # Editar la fila añadida también cambia la huella
+    page_labels = deltas.labels()[-2:]
+    state, edited = _editor(deltas.page(page_labels), edits={0: {"importe": 7.0}})
+    assert deltas.with_page(page_labels, state, edited).fingerprint() != deltas.fingerprint()
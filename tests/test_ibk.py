@@ -0,0 +1,39 @@
+"""IBK: el ZIP con varios Excels da lo mismo leído en serie que repartido entre procesos."""
+import io
+import os
+import sys
+import zipfile
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+import engine  # noqa: E402
+import pdf_utils  # noqa: E402
+from generators import gen_ibk  # noqa: E402
+
+
+def _bundle(sizes: list) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as out:
+        for i, rows in enumerate(sizes):
+            with zipfile.ZipFile(io.BytesIO(gen_ibk(rows, seed=i)["zip"])) as zf:
+                out.writestr(f"lote_{i}.xlsx", zf.read("rechazos_ibk.xlsx"))
+        out.writestr("__MACOSX/._lote_0.xlsx", b"")
+    return buf.getvalue()
+
+
+def test_members_in_order_with_source():
+    df = engine.process_ibk(_bundle([40, 1, 25]))
+    assert df[engine.SOURCE_COL].unique().tolist() == ["lote_0.xlsx", "lote_1.xlsx", "lote_2.xlsx"]
+
+
+def test_process_pool_matches_serial(monkeypatch):
+    data = _bundle([60, 30, 45])
+    serial = engine.process_ibk(data)
+    monkeypatch.setattr(pdf_utils, "PDF_WORKERS", 2)
+    monkeypatch.setattr(engine, "IBK_PARALLEL_MIN_BYTES", 0)
+    monkeypatch.setattr(engine, "IBK_SPOOL_MAX_BYTES", 1024)  # fuerza el volcado a disco
+    pd.testing.assert_frame_equal(engine.process_ibk(data), serial)
@@ -0,0 +1,102 @@
+"""Registro de envíos: reservas todo-o-nada, liberación al registrar y visibilidad entre procesos."""
+import os
+import sqlite3
+import subprocess
+import sys
+import textwrap
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import ledger as ledger_mod  # noqa: E402
+from ledger import AlreadySubmitted, SubmissionInProgress, SubmissionLedger  # noqa: E402
+
+
+def _payload(*refs) -> pd.DataFrame:
+    return pd.DataFrame({"Referencia": list(refs), "Codigo de Rechazo": ["R001"] * len(refs)})
+
+
+def _pending(path) -> list:
+    con = sqlite3.connect(path)
+    try:
+        return sorted(r for (r,) in con.execute("SELECT referencia FROM pendientes"))
+    finally:
+        con.close()
+
+
+@pytest.fixture
+def path(tmp_path):
+    yield str(tmp_path / "envios.sqlite3")
+    ledger_mod._ACCEPTED.clear()
+
+
+def test_reserve_refuses_pending_refs_all_or_nothing(path):
+    ledger = SubmissionLedger(path)
+    assert ledger.reserve(_payload("A1", "A2", "A1"), "BCP") == 2
+    with pytest.raises(SubmissionInProgress, match="1 referencias"):
+        SubmissionLedger(path).reserve(_payload("B1", "A2"), "BCP")
+    assert _pending(path) == ["A1", "A2"]
+    assert ledger.submitted(["A1", "B1", None, ""]).tolist() == [True, False, False, False]
+
+
+def test_reserve_refuses_already_submitted_refs(path):
+    ledger = SubmissionLedger(path)
+    ledger.record(_payload("A1"), "BCP", 200)
+    with pytest.raises(AlreadySubmitted):
+        ledger.reserve(_payload("B1", "A1"), "BCP")
+    assert _pending(path) == []
+    # Un envío rechazado por el endpoint no bloquea; un reenvío explícito tampoco
+    ledger.record(_payload("C1"), "BCP", 500)
+    assert ledger.reserve(_payload("C1"), "BCP") == 1
+    assert ledger.reserve(_payload("A1"), "BCP", resend=True) == 1
+
+
+def test_record_clears_pending(path):
+    ledger = SubmissionLedger(path)
+    ledger.reserve(_payload("A1", "A2"), "BCP")
+    assert ledger.record(_payload("A1", "A2", None), "BCP", [200, 503, 200]) == 2
+    assert _pending(path) == []
+    assert ledger.submitted(["A1", "A2"]).tolist() == [True, False]
+    assert ledger.reserve(_payload("A2"), "BCP") == 1
+
+
+def test_record_batches_clears_pending(path):
+    ledger = SubmissionLedger(path)
+    payload = _payload(*[f"R{i}" for i in range(5)])
+    ledger.reserve(payload, "IBK")
+    report = [{"desde": 1, "hasta": 3, "status": 200}, {"desde": 4, "hasta": 5, "status": None}]
+    assert ledger.record_batches(payload, report, "IBK") == 5
+    assert _pending(path) == []
+    assert ledger.submitted(payload["Referencia"]).tolist() == [True] * 3 + [False] * 2
+    details = ledger.details(payload["Referencia"])
+    assert sorted(details["referencia"]) == ["R0", "R1", "R2"] and set(details["status"]) == {200}
+
+
+def test_other_instances_and_processes_see_submissions(path):
+    first = SubmissionLedger(path)
+    assert not first.submitted(["A1", "P1"]).any()  # deja cargada la caché de aceptadas
+    SubmissionLedger(path).record(_payload("A1"), "BCP", 201)
+    script = textwrap.dedent(f"""
+        import sys
+        sys.path.insert(0, {ROOT!r})
+        import pandas as pd
+        from ledger import SubmissionLedger
+        ledger = SubmissionLedger({path!r})
+        assert ledger.submitted(["A1"]).tolist() == [True]
+        ledger.record(pd.DataFrame({{"Referencia": ["P1"]}}), "SCO", 200)
+    """)
+    subprocess.run([sys.executable, "-c", script], check=True)
+    assert first.submitted(["A1", "P1", "X"]).tolist() == [True, True, False]
+    with pytest.raises(AlreadySubmitted):
+        first.reserve(_payload("P1"), "SCO")
+
+
+def test_expired_reservation_goes_to_history_without_status(path, monkeypatch):
+    ledger = SubmissionLedger(path)
+    ledger.reserve(_payload("A1"), "BCP")
+    monkeypatch.setattr(ledger_mod, "LEDGER_PENDING_TTL", -1)
+    assert ledger.submitted(["A1"]).tolist() == [False]
+    assert _pending(path) == [] and ledger.reserve(_payload("A1"), "BCP") == 1
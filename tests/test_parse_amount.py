@@ -0,0 +1,49 @@
+"""parse_amount_series debe dar lo mismo que parse_amount aplicado fila por fila."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import parse_amount, parse_amount_series  # noqa: E402
+
+CASES = {
+    "miles_y_decimales": ["1,234.56", "1.234,56", "1234,56", "1234.56", "1,000", "1.000", "12,345,678.90", "0,5"],
+    "moneda": ["S/ 1,234.56", "S/.1.234,56", "$ 99.90", "US$ 1,000", "€12,50", "PEN 350.00"],
+    "negativos": ["-1,234.56", "S/ -45,10", "-0.01", "-1,000", "--5", "1-2"],
+    "vacios": ["", " ", "\t", "S/", "-", ",", "."],
+    "nulos": [None, np.nan, pd.NA, float("nan")],
+    "basura": ["abc", "N/A", "1.2.3", "1,2,3", "١٢٣", "12abc34", "1e5", "..,,"],
+    "numeros": [0, 12, -3.5, 1234.567],
+}
+
+
+def _expected(values) -> list:
+    return [parse_amount(v) for v in values]
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+@pytest.mark.parametrize("dtype", [object, "str"])
+def test_series_matches_scalar(case, dtype):
+    # Con dtype str los nulos quedan como NA y los números como su texto
+    values = pd.Series(CASES[case], dtype=dtype)
+    expected = _expected(values)
+    got = parse_amount_series(values)
+    assert got.dtype == "float64"
+    assert got.index.equals(values.index)
+    np.testing.assert_array_equal(got.to_numpy(), np.array(expected, dtype="float64"))
+
+
+def test_repeated_values_and_index():
+    values = pd.Series(["S/ 1,234.56", None, "1.234,56", "S/ 1,234.56", "abc"] * 3, index=range(10, 25), dtype=object)
+    got = parse_amount_series(values)
+    assert got.index.equals(values.index)
+    assert got.tolist() == _expected(values)
+
+
+def test_empty_and_list_input():
+    assert parse_amount_series(pd.Series([], dtype=object)).empty
+    assert parse_amount_series(["1,5", None, "x"]).tolist() == [1.5, 0.0, 0.0]
@@ -0,0 +1,113 @@
+"""El escaneo por páginas debe dar lo mismo que re.findall / re.search sobre el texto unido."""
+import os
+import random
+import re
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+import pdf_utils  # noqa: E402
+from engine import (RE_DOC_ID, RE_REGISTRO, RE_REGISTRO_TXT, RE_SCO_OK, RE_SCO_ORDEN,  # noqa: E402
+                    RE_SCO_TOTAL)
+from pdf_utils import SCAN_ALL, SCAN_FIRST, SCAN_OVERLAP, _scan_buffer, _scan_pdf  # noqa: E402
+
+FINDALL = {"registro": RE_REGISTRO, "registro_txt": RE_REGISTRO_TXT, "doc_id": RE_DOC_ID, "ok": RE_SCO_OK}
+SEARCH = {"orden": RE_SCO_ORDEN, "total": RE_SCO_TOTAL, "doc_id": RE_DOC_ID}
+
+TOKENS = ["Registro ", "Registro\n", "Registro  ", "123", "4567890", "12345678", "abc", "DNI", " ", "\n", "O.", "K.",
+          "o.k.", "Detalle de orden No. ", "Detalle de orden No\n", "Total de la orden: ", "S/ 1,234.56", "-", "x" * 50]
+PAGE_SIZES = [0, 1, 7, 40, SCAN_OVERLAP - 1, SCAN_OVERLAP, SCAN_OVERLAP + 1, 3 * SCAN_OVERLAP, 2_000]
+
+
+def _pages(seed: int) -> list:
+    """Texto aleatorio cortado en páginas de largo variable: los cortes caen a mitad de los tokens."""
+    rng = random.Random(seed)
+    text = "".join(rng.choice(TOKENS) for _ in range(rng.randint(50, 1_500)))
+    pages, pos = [], 0
+    while pos < len(text):
+        size = rng.choice(PAGE_SIZES)
+        pages.append(text[pos:pos + size])
+        pos += size
+    return pages + [""] * rng.randint(0, 1)
+
+
+@pytest.fixture
+def pdf_pages(monkeypatch):
+    """_scan_pdf sobre páginas dadas, en vez de extraerlas de un PDF."""
+    def use(pages: list):
+        def lazy(pdf_bytes):
+            yield from pages
+        monkeypatch.setattr(pdf_utils, "extract_pdf_pages", lambda pdf_bytes: tuple(pages))
+        monkeypatch.setattr(pdf_utils, "iter_pdf_pages", lazy)
+    return use
+
+
+def _groups(m):
+    return None if m is None else (m.group(0), m.groups())
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_scan_matches_re_on_joined_text(pdf_pages, seed):
+    pages = _pages(seed)
+    text = "".join(pages)
+    pdf_pages(pages)
+    patterns = {f"all_{n}": (rx, SCAN_ALL) for n, rx in FINDALL.items()}
+    patterns.update({f"first_{n}": (rx, SCAN_FIRST) for n, rx in SEARCH.items()})
+    got = _scan_pdf(b"", patterns)
+    for name, rx in FINDALL.items():
+        assert [m.group(0) for m in got[f"all_{name}"]] == [m.group(0) for m in rx.finditer(text)], name
+        assert [m.groups() for m in got[f"all_{name}"]] == [m.groups() for m in rx.finditer(text)], name
+    for name, rx in SEARCH.items():
+        assert _groups(got[f"first_{name}"]) == _groups(rx.search(text)), name
+
+
+@pytest.mark.parametrize("pages, expected", [
+    (["Regis", "tro 123", "45 fin"], ["12345"]),
+    (["Registro 12", "34"], ["1234"]),
+    (["Registro", "\n", "7"], ["7"]),
+    (["x" * 1_000 + "Registro 1", "2" + "y" * 1_000 + "Registro 3"], ["12", "3"]),
+    (["Registro 9" + "z" * (SCAN_OVERLAP + 1), "Registro 8"], ["9", "8"]),
+])
+def test_matches_across_page_breaks(pdf_pages, pages, expected):
+    pdf_pages(pages)
+    assert [m.group(1) for m in _scan_pdf(b"", {"m": (RE_REGISTRO, SCAN_ALL)})["m"]] == expected
+    assert re.findall(RE_REGISTRO, "".join(pages)) == expected
+
+
+@pytest.mark.parametrize("pages", [["abc", "1234567"], ["1234", "567abc"], ["abc1", "234567 ", "9876543"]])
+def test_word_boundary_sees_previous_page(pdf_pages, pages):
+    # \b depende del carácter anterior: el contexto arrastrado evita matches que no lo son
+    pdf_pages(pages)
+    got = [m.group(0) for m in _scan_pdf(b"", {"m": (RE_DOC_ID, SCAN_ALL)})["m"]]
+    assert got == RE_DOC_ID.findall("".join(pages))
+
+
+def test_first_match_extends_to_end_of_document(pdf_pages):
+    pages = ["Total de la orden: ", "S/ 1,234.56\n" + "x" * 2_000, "fin", "Total de la orden: otro"]
+    pdf_pages(pages)
+    m = _scan_pdf(b"", {"t": (RE_SCO_TOTAL, SCAN_FIRST)})["t"]
+    assert m.group(1) == RE_SCO_TOTAL.search("".join(pages)).group(1)
+
+
+def test_scan_buffer_defers_matches_at_the_end():
+    buf = "Registro 5 " + "a" * 1_000 + "Registro 12 b Registro 34"
+    found, cut = _scan_buffer(RE_REGISTRO, buf, 0, final=False)
+    # Los de la zona de solape pueden seguir en la página siguiente: se arrastran desde ahí
+    assert [m.group(1) for m in found] == ["5"] and cut == len(buf) - SCAN_OVERLAP
+    found, cut = _scan_buffer(RE_REGISTRO, buf, cut, final=True)
+    assert [m.group(1) for m in found] == ["12", "34"] and cut == len(buf)
+
+
+def test_findall_pdf_on_real_pdf():
+    from generators import _pdf
+
+    lines = [f"Registro {i} DNI {40000000 + i}" for i in range(150)]
+    data = _pdf(lines)
+    text = pdf_utils.extract_pdf_text(data)
+    assert pdf_utils.findall_pdf(data, RE_REGISTRO) == RE_REGISTRO.findall(text)
+    assert len(pdf_utils.extract_pdf_pages(data)) > 1
+    assert pdf_utils.findall_pdf(data, RE_DOC_ID) == RE_DOC_ID.findall(text)
@@ -0,0 +1,89 @@
+"""Medición de tiempos por etapa (PDF, carga, cruce, editor, Excel, envío) con filas y bytes.
+
+Las etapas solo se registran si hay una corrida activa (start_run); sin ella, stage() devuelve
+un objeto nulo compartido y el costo es una lectura de ContextVar por llamada. La corrida vive
+en un ContextVar, así cada sesión/hilo de Streamlit registra solo lo suyo.
+
+    with stage("carga", nbytes=len(data)) as s:
+        df = leer(data)
+        s.rows = len(df)
+"""
+import json
+import time
+from contextvars import ContextVar
+
+_current = ContextVar("timing_run", default=None)
+
+
+class TimingRun:
+    """Registro plano de etapas de una ejecución; `nivel` indica el anidamiento."""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.started = time.time()
+        self.records = []
+        self._depth = 0
+
+    def to_dict(self) -> dict:
+        return {"corrida": self.label, "inicio": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)), "etapas": self.records}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+
+
+class _Stage:
+    __slots__ = ("run", "name", "rows", "nbytes", "note", "_t", "_rec")
+
+    def __init__(self, run: TimingRun, name: str, rows, nbytes, note):
+        self.run, self.name, self.rows, self.nbytes, self.note = run, name, rows, nbytes, note
+
+    def __enter__(self):
+        # El registro se agrega al entrar para que las etapas anidadas queden después de su padre
+        self._rec = {"etapa": self.name, "nivel": self.run._depth}
+        self.run.records.append(self._rec)
+        self.run._depth += 1
+        self._t = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._rec["segundos"] = round(time.perf_counter() - self._t, 6)
+        self.run._depth -= 1
+        if self.rows is not None: self._rec["filas"] = int(self.rows)
+        if self.nbytes is not None: self._rec["bytes"] = int(self.nbytes)
+        if self.note: self._rec["nota"] = self.note
+        if exc_type is not None: self._rec["error"] = exc_type.__name__
+        return False
+
+
+class _NullStage:
+    """Etapa sin corrida activa: no mide nada y acepta (e ignora) rows/nbytes/note."""
+    __slots__ = ()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+    def __setattr__(self, name, value): pass
+
+
+_NULL = _NullStage()
+
+
+def stage(name: str, rows: int = None, nbytes: int = None, note: str = None):
+    run = _current.get()
+    if run is None: return _NULL
+    return _Stage(run, name, rows, nbytes, note)
+
+
+def start_run(label: str = "") -> TimingRun:
+    run = TimingRun(label)
+    _current.set(run)
+    return run
+
+
+def end_run() -> TimingRun:
+    run = _current.get()
+    _current.set(None)
+    return run
+
+
+def enabled() -> bool:
+    return _current.get() is not None